@@ -1,18 +1,46 @@
 from fastapi import Depends, HTTPException, status
+from fastapi.security.http import HTTPAuthorizationCredentials, HTTPBearer
 from jose import jwt, JWTError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.core.security import ALGO
-from app.db.session import get_db
+from app.core.principal_cache import principal_cache
+from app.db.session import get_db, get_async_db
 from app.db.models.user import User
 
-def get_current_user(token: str, db: Session = Depends(get_db)) -> User:
+def _decode(token: str) -> dict:
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGO])
-        email: str = payload.get("sub")
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGO])
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido")
-    user = db.query(User).filter(User.email == email).first()
+
+def get_current_user(token: str, db: Session = Depends(get_db)) -> User:
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return db.merge(cached, load=False)
+    payload = _decode(token)
+    user = db.query(User).filter(User.email == payload.get("sub")).first()
+    if not user:
+        raise HTTPException(status_code=401, detail="Usuário não encontrado")
+    principal_cache.put(token, user, payload.get("exp"))
+    return user
+
+async def get_current_user_async(token: str, db: AsyncSession = Depends(get_async_db)) -> User:
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return await db.merge(cached, load=False)
+    payload = _decode(token)
+    user = (await db.execute(select(User).where(User.email == payload.get("sub")))).scalars().first()
     if not user:
         raise HTTPException(status_code=401, detail="Usuário não encontrado")
+    principal_cache.put(token, user, payload.get("exp"))
     return user
+
+async def get_bearer_user_async(
+    auth: HTTPAuthorizationCredentials = Depends(HTTPBearer()),
+    db: AsyncSession = Depends(get_async_db),
+) -> User:
+    # token no header Authorization; reaproveita a sessão do request
+    return await get_current_user_async(auth.credentials, db)
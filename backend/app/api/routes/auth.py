@@ -1,36 +1,126 @@
-
-from fastapi import APIRouter, Depends, HTTPException, status
+import uuid
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.session import get_db
+from app.core.config import settings
+from app.db.session import get_async_db, get_db
 from app.db.models.user import User
+from app.db.models.token import RefreshToken
 from app.schemas.user import UserCreate, UserOut
-from app.schemas.auth import Token, LoginInput
-from app.core.security import hash_password, verify_password, create_access_token
+from app.schemas.auth import Token, LoginInput, RefreshInput
+from app.core.security import create_access_token, new_refresh_token, hash_refresh_token
+from app.services.credentials import credentials, CredentialsBusy
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+def _busy(e: CredentialsBusy) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Muitas requisições de login, tente novamente.",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+def _issue_tokens(db: Session | AsyncSession, user: User, familia_id: uuid.UUID | None = None) -> dict:
+    raw, digest = new_refresh_token()
+    now = datetime.now(timezone.utc)
+    db.add(RefreshToken(
+        usuario_id=user.id,
+        token_hash=digest,
+        familia_id=familia_id or uuid.uuid4(),
+        criado_em=now,
+        expira_em=now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return {"access_token": create_access_token(sub=user.email), "refresh_token": raw, "token_type": "bearer"}
+
+def _revoke_family(db: Session, familia_id: uuid.UUID, now: datetime):
+    (
+        db.query(RefreshToken)
+        .filter(RefreshToken.familia_id == familia_id, RefreshToken.revogado_em.is_(None))
+        .update({RefreshToken.revogado_em: now}, synchronize_session=False)
+    )
+
+def _find_refresh_token(db: Session, raw: str):
+    # um lookup indexado (token_hash) já trazendo o usuário; FOR UPDATE evita
+    # que duas requisições rotacionem o mesmo token ao mesmo tempo
+    return (
+        db.query(RefreshToken, User)
+        .join(User, User.id == RefreshToken.usuario_id)
+        .filter(RefreshToken.token_hash == hash_refresh_token(raw))
+        .with_for_update(of=RefreshToken)
+        .first()
+    )
+
+# register/login são async: o hash roda no pool de credenciais e a rota só
+# aguarda, sem prender uma thread do threadpool durante o pbkdf2
 @router.post("/register", response_model=UserOut, status_code=201)
-def register(payload: UserCreate, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.email == payload.email).first():
+async def register(payload: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    if (await db.execute(select(User.id).where(User.email == payload.email))).first():
         raise HTTPException(status_code=400, detail="Email já cadastrado")
+    try:
+        senha_hash = await credentials.hash(payload.senha)
+    except CredentialsBusy as e:
+        raise _busy(e)
     user = User(
         email=payload.email.lower(),
         nome=payload.nome,
-        senha_hash=hash_password(payload.senha),
+        senha_hash=senha_hash,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 @router.post("/login", response_model=Token)
-def login(body: LoginInput, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == body.email.lower()).first()
+async def login(body: LoginInput, db: AsyncSession = Depends(get_async_db)):
+    user = (await db.execute(select(User).where(User.email == body.email.lower()))).scalars().first()
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email incorreto")
-    if not verify_password(body.senha, user.senha_hash):
+    try:
+        ok, new_hash = await credentials.verify(body.senha, user.senha_hash)
+    except CredentialsBusy as e:
+        raise _busy(e)
+    if not ok:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Senha incorreta")
     if not user.fl_ativo:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Usuário inativo")
-    token = create_access_token(sub=user.email)
-    return {"access_token": token, "token_type": "bearer"}
\ No newline at end of file
+    if new_hash:
+        # parâmetros do hash mudaram: aproveita a senha em claro para refazer
+        user.senha_hash = new_hash
+    tokens = _issue_tokens(db, user)
+    await db.commit()
+    return tokens
+
+@router.post("/refresh", response_model=Token)
+def refresh(body: RefreshInput, db: Session = Depends(get_db)):
+    row = _find_refresh_token(db, body.refresh_token)
+    if not row:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token inválido")
+    token, user = row
+    now = datetime.now(timezone.utc)
+    if token.usado_em or token.revogado_em:
+        # token já rotacionado sendo reapresentado: possível vazamento
+        _revoke_family(db, token.familia_id, now)
+        db.commit()
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token reutilizado")
+    if token.expira_em <= now:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token expirado")
+    if not user.fl_ativo:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Usuário inativo")
+    token.usado_em = now
+    tokens = _issue_tokens(db, user, token.familia_id)
+    db.commit()
+    return tokens
+
+@router.post("/logout", status_code=204)
+def logout(body: RefreshInput, db: Session = Depends(get_db)):
+    row = _find_refresh_token(db, body.refresh_token)
+    if row:
+        _revoke_family(db, row[0].familia_id, datetime.now(timezone.utc))
+        db.commit()
+    return Response(status_code=204)
+
+@router.get("/stats")
+def credential_stats():
+    return credentials.stats()
@@ -0,0 +1,123 @@
+from __future__ import annotations
+import os
+import uuid
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_bearer_user_async
+from app.core.config import settings
+from app.db.session import get_async_db
+from app.db.models.lgpd import ExportacaoDados, ExclusaoConta
+from app.schemas.lgpd import ExportacaoRead, ExclusaoRead
+from app.services.account_deletion import deletion_worker
+from app.services.exports import export_path, export_worker
+
+router = APIRouter(prefix="/me", tags=["lgpd"])
+
+async def _get_export(db: AsyncSession, export_id: uuid.UUID, user_id) -> ExportacaoDados:
+    exp = (
+        await db.execute(select(ExportacaoDados).where(ExportacaoDados.id == export_id, ExportacaoDados.usuario_id == user_id))
+    ).scalars().first()
+    if not exp:
+        raise HTTPException(status_code=404, detail="Exportação não encontrada")
+    return exp
+
+@router.post("/exports", response_model=ExportacaoRead, status_code=202)
+async def request_export(db: AsyncSession = Depends(get_async_db), current_user=Depends(get_bearer_user_async)):
+    # só enfileira; o arquivo é gerado pelo worker. Um pedido em aberto é reaproveitado.
+    exp = (
+        await db.execute(
+            select(ExportacaoDados).where(
+                ExportacaoDados.usuario_id == current_user.id,
+                ExportacaoDados.status.in_(("PENDENTE", "PROCESSANDO")),
+            )
+        )
+    ).scalars().first()
+    if not exp:
+        exp = ExportacaoDados(
+            id=uuid.uuid4(), usuario_id=current_user.id, formato="NDJSON_ZIP",
+            status="PENDENTE", solicitado_em=datetime.now(timezone.utc),
+        )
+        db.add(exp)
+        await db.commit()
+        export_worker.wake()
+    return exp
+
+@router.get("/exports", response_model=list[ExportacaoRead])
+async def list_exports(db: AsyncSession = Depends(get_async_db), current_user=Depends(get_bearer_user_async)):
+    rows = await db.execute(
+        select(ExportacaoDados)
+        .where(ExportacaoDados.usuario_id == current_user.id)
+        .order_by(ExportacaoDados.solicitado_em.desc())
+    )
+    return rows.scalars().all()
+
+@router.get("/exports/{export_id}", response_model=ExportacaoRead)
+async def get_export(export_id: uuid.UUID, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_bearer_user_async)):
+    return await _get_export(db, export_id, current_user.id)
+
+@router.get("/exports/{export_id}/download")
+async def download_export(export_id: uuid.UUID, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_bearer_user_async)):
+    exp = await _get_export(db, export_id, current_user.id)
+    path = export_path(settings.EXPORT_DIR, current_user.id, exp.id)
+    if exp.status != "CONCLUIDA" or not os.path.exists(path):
+        raise HTTPException(status_code=409, detail="Exportação ainda não está pronta")
+    # FileResponse envia o arquivo em blocos, sem carregar na memória
+    return FileResponse(path, media_type="application/zip", filename=f"kitchen_brain_{exp.id}.zip")
+
+@router.post("/deletion", response_model=ExclusaoRead, status_code=202)
+async def request_deletion(db: AsyncSession = Depends(get_async_db), current_user=Depends(get_bearer_user_async)):
+    # a exclusão roda no worker, em lotes; aqui só registra o pedido
+    exc = (
+        await db.execute(
+            select(ExclusaoConta).where(ExclusaoConta.usuario_id == current_user.id, ExclusaoConta.status == "PENDENTE")
+        )
+    ).scalars().first()
+    if not exc:
+        exc = ExclusaoConta(
+            id=uuid.uuid4(), usuario_id=current_user.id, status="PENDENTE",
+            solicitado_em=datetime.now(timezone.utc), linhas_removidas=0,
+        )
+        db.add(exc)
+        await db.commit()
+        if not settings.DELETION_GRACE_S:
+            deletion_worker.wake()
+    return exc
+
+@router.get("/deletion", response_model=ExclusaoRead)
+async def get_deletion(db: AsyncSession = Depends(get_async_db), current_user=Depends(get_bearer_user_async)):
+    exc = (
+        await db.execute(
+            select(ExclusaoConta)
+            .where(ExclusaoConta.usuario_id == current_user.id)
+            .order_by(ExclusaoConta.solicitado_em.desc())
+            .limit(1)
+        )
+    ).scalars().first()
+    if not exc:
+        raise HTTPException(status_code=404, detail="Nenhum pedido de exclusão")
+    return exc
+
+@router.post("/deletion/{exclusao_id}/cancel", response_model=ExclusaoRead)
+async def cancel_deletion(exclusao_id: uuid.UUID, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_bearer_user_async)):
+    # só antes do worker começar: depois disso os dados já estão sendo apagados
+    exc = (
+        await db.execute(
+            update(ExclusaoConta)
+            .where(
+                ExclusaoConta.id == exclusao_id,
+                ExclusaoConta.usuario_id == current_user.id,
+                ExclusaoConta.status == "PENDENTE",
+                ExclusaoConta.iniciado_em.is_(None),
+            )
+            .values(status="CANCELADA")
+            .returning(ExclusaoConta)
+        )
+    ).scalars().first()
+    if not exc:
+        raise HTTPException(status_code=409, detail="Pedido não pode mais ser cancelado")
+    await db.commit()
+    return exc
@@ -0,0 +1,120 @@
+from __future__ import annotations
+import os
+import uuid
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Path, Query, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_bearer_user_async
+from app.db.session import get_async_db
+from app.db.models.media import AnexoMidia
+from app.db.models.storage import ItemEstoque
+from app.schemas.media import AnexoRead
+from app.services.media import IMAGE_TYPES, MediaRejected, etag_matches, media_store
+
+router = APIRouter(prefix="/media", tags=["media"])
+
+# conteúdo de um hash nunca muda; "private" porque a rota exige login
+CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+@router.post("", response_model=AnexoRead, status_code=201)
+async def upload_media(
+        arquivo: UploadFile = File(..., description="Foto (JPEG/PNG/WebP) ou nota fiscal em PDF"),
+        tipo: str | None = Query(None, max_length=30, description="Ex.: FOTO_PRODUTO, NOTA_FISCAL"),
+        item_estoque_id: uuid.UUID | None = Query(None),
+        db: AsyncSession = Depends(get_async_db),
+        current_user=Depends(get_bearer_user_async),
+    ):
+    if item_estoque_id is not None:
+        owned = await db.execute(
+            select(ItemEstoque.id).where(ItemEstoque.id == item_estoque_id, ItemEstoque.usuario_id == current_user.id)
+        )
+        if owned.scalar() is None:
+            raise HTTPException(status_code=404, detail="Item não encontrado")
+    # hash e gravação fora do event loop; conteúdo repetido não é gravado de novo
+    try:
+        blob = await run_in_threadpool(media_store.save, arquivo.file)
+    except MediaRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    anexo = AnexoMidia(
+        usuario_id=current_user.id,
+        item_estoque_id=item_estoque_id,
+        url=f"/media/{blob.sha256}",
+        tipo=tipo,
+        sha256=blob.sha256,
+        mime=blob.mime,
+        tamanho_bytes=blob.tamanho_bytes,
+        largura=blob.largura,
+        altura=blob.altura,
+    )
+    db.add(anexo)
+    await db.commit()
+    await db.refresh(anexo)
+    return AnexoRead.model_validate(anexo).model_copy(update={"duplicado": blob.duplicado})
+
+@router.get("/stats")
+def media_stats():
+    return media_store.stats()
+
+@router.get("/{sha256}")
+async def get_media(
+        sha256: str = Path(pattern="^[0-9a-f]{64}$"),
+        w: int | None = Query(None, ge=1, le=4096, description="Largura máxima (versão reduzida, só imagens)"),
+        if_none_match: str | None = Header(None),
+        db: AsyncSession = Depends(get_async_db),
+        current_user=Depends(get_bearer_user_async),
+    ):
+    # só quem tem um anexo com esse conteúdo pode baixá-lo
+    row = (
+        await db.execute(
+            select(AnexoMidia.mime, AnexoMidia.largura)
+            .where(AnexoMidia.sha256 == sha256, AnexoMidia.usuario_id == current_user.id)
+            .limit(1)
+        )
+    ).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Arquivo não encontrado")
+    mime, largura = row
+    width = media_store.pick_width(w, largura) if w and mime in IMAGE_TYPES else None
+    # ETag forte = o próprio hash (mais a largura da variante)
+    etag = f'"{sha256}"' if width is None else f'"{sha256}-{width}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    path = media_store.path(sha256)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Arquivo não encontrado")
+    if width is not None:
+        try:
+            path = await run_in_threadpool(media_store.variant, sha256, width)
+            mime = "image/jpeg"
+        except MediaRejected:
+            # imagem que o decoder não abre: vai o original
+            headers["ETag"] = f'"{sha256}"'
+    # FileResponse lê em blocos e atende Range/If-Range (PDF grande, download retomado)
+    return FileResponse(path, media_type=mime, headers=headers)
+
+@router.delete("/anexos/{anexo_id}", status_code=204)
+async def delete_attachment(
+        anexo_id: uuid.UUID,
+        db: AsyncSession = Depends(get_async_db),
+        current_user=Depends(get_bearer_user_async),
+    ):
+    row = (
+        await db.execute(
+            delete(AnexoMidia)
+            .where(AnexoMidia.id == anexo_id, AnexoMidia.usuario_id == current_user.id)
+            .returning(AnexoMidia.sha256)
+        )
+    ).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Anexo não encontrado")
+    await db.commit()
+    sha256 = row[0]
+    if sha256:
+        # o arquivo só sai quando nenhum outro anexo (de ninguém) aponta para ele
+        still = (await db.execute(select(AnexoMidia.id).where(AnexoMidia.sha256 == sha256).limit(1))).first()
+        await run_in_threadpool(media_store.discard, [sha256], {sha256} if still else set())
+    return Response(status_code=204)
@@ -0,0 +1,106 @@
+from __future__ import annotations
+import io
+import secrets
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_bearer_user_async
+from app.core.config import settings
+from app.db.session import engine, get_async_db
+from app.db.models.product import Produto, CodigoBarras
+from app.core.text import normalize
+from app.schemas.product import ProdutoCodigoRead, CodigosBatchIn, CodigosBatchOut, ProdutoBuscaRead
+from app.services.barcodes import MISSING, barcode_cache, product_payload
+from app.services.ingest import FORMATS, detect_format, ingest_feed
+from app.services.product_search import hot_index, search_stmt, trigram_available
+
+router = APIRouter(prefix="/products", tags=["products"])
+
+async def _resolve(db: AsyncSession, valores: list[str]) -> dict[str, dict | None]:
+    # cache primeiro; o que faltar vai ao banco num único SELECT ... IN
+    found: dict[str, dict | None] = {}
+    misses = []
+    for valor in valores:
+        hit = barcode_cache.get(valor)
+        if hit is MISSING:
+            misses.append(valor)
+        else:
+            found[valor] = hit
+    if misses:
+        rows = await db.execute(
+            select(Produto, CodigoBarras)
+            .join(CodigoBarras, CodigoBarras.produto_id == Produto.id)
+            .where(CodigoBarras.valor.in_(misses))
+            .order_by(CodigoBarras.valor, CodigoBarras.id)
+        )
+        resolved: dict[str, dict] = {}
+        for produto, codigo in rows:
+            resolved.setdefault(codigo.valor, product_payload(produto, codigo))
+        for valor in misses:
+            product = resolved.get(valor)
+            barcode_cache.put(valor, product)  # None também vai pro cache (negativo)
+            found[valor] = product
+    return found
+
+@router.get("/barcode/{valor}", response_model=ProdutoCodigoRead)
+async def product_by_barcode(valor: str, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_bearer_user_async)):
+    valor = valor.strip()
+    product = (await _resolve(db, [valor]))[valor]
+    if product is None:
+        raise HTTPException(status_code=404, detail="Produto não encontrado")
+    return product
+
+@router.post("/barcode/batch", response_model=CodigosBatchOut)
+async def products_by_barcodes(body: CodigosBatchIn, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_bearer_user_async)):
+    valores = list(dict.fromkeys(v.strip() for v in body.valores if v.strip()))
+    found = await _resolve(db, valores)
+    return CodigosBatchOut(
+        encontrados={v: p for v, p in found.items() if p is not None},
+        desconhecidos=[v for v, p in found.items() if p is None],
+    )
+
+@router.get("/search", response_model=list[ProdutoBuscaRead])
+async def search_products(
+        q: str = Query(..., min_length=1, max_length=120),
+        limit: int = Query(10, ge=1, le=50),
+        db: AsyncSession = Depends(get_async_db),
+        current_user=Depends(get_bearer_user_async),
+    ):
+    # sem acento/caixa: "parmesao" encontra "Parmesão"
+    query = normalize(q)
+    if not query:
+        return []
+    # página cheia de prefixos na fatia quente em memória: não vai ao banco.
+    # Acerto só aproximado não basta: o banco pode ter um prefixo fora da fatia.
+    hot = hot_index.search(query, limit)
+    if len(hot) >= limit and all(r["busca"].startswith(query) for r in hot):
+        return hot
+    rows = await db.execute(search_stmt(query, limit, await trigram_available(db)))
+    return [dict(row._mapping) for row in rows]
+
+@router.post("/ingest")
+async def ingest_products(
+        arquivo: UploadFile = File(..., description="Catálogo/preços em CSV ou NDJSON"),
+        formato: str | None = Query(None, description="csv | ndjson (padrão: pela extensão)"),
+        x_ingest_token: str | None = Header(None),
+    ):
+    # carga de feeds (scrapers, catálogos): token próprio, não é rota de usuário
+    if not settings.INGEST_TOKEN or not secrets.compare_digest(x_ingest_token or "", settings.INGEST_TOKEN):
+        raise HTTPException(status_code=403, detail="Ingestão não autorizada")
+    formato = formato or detect_format(arquivo.filename)
+    if formato not in FORMATS:
+        raise HTTPException(status_code=400, detail="Formato desconhecido: use csv ou ndjson")
+    # o upload já está em arquivo temporário; lido em lotes, sem carregar tudo
+    stream = io.TextIOWrapper(arquivo.file, encoding="utf-8-sig", newline="")
+    try:
+        return await run_in_threadpool(ingest_feed, engine, stream, formato)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Arquivo precisa estar em UTF-8")
+    finally:
+        stream.detach()
+
+@router.get("/stats")
+def products_stats():
+    return {"barcode_cache": barcode_cache.stats(), "search_index": hot_index.stats()}
@@ -0,0 +1,71 @@
+from __future__ import annotations
+import uuid
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_bearer_user_async
+from app.core.config import settings
+from app.db.session import get_async_db, SessionLocal
+from app.db.models.recipe import ImportacaoLote
+from app.schemas.recipe import ImportacaoLoteRead, ImportarReceitas, ReceitaMatchRead
+from app.services.pantry import stock_totals_stmt
+from app.services.recipe_import import recipe_import_worker
+from app.services.recipe_matcher import pantry_vectors, recipe_index
+
+router = APIRouter(prefix="/recipes", tags=["recipes"])
+
+@router.get("/cookable", response_model=list[ReceitaMatchRead])
+async def cookable_recipes(
+        limit: int = Query(20, ge=1, le=100),
+        min_score: float = Query(0.0, ge=0, le=1, description="Cobertura mínima (0..1)"),
+        db: AsyncSession = Depends(get_async_db),
+        current_user=Depends(get_bearer_user_async),
+    ):
+    # despensa somada no banco, já em g/ml/un: uma linha por produto/dimensão
+    pantry = pantry_vectors(await db.execute(stock_totals_stmt(current_user.id)))
+    # índice pronto em memória; só é refeito quando receitas mudam
+    matrix = await run_in_threadpool(recipe_index.get, SessionLocal)
+    return [
+        ReceitaMatchRead(
+            id=matrix.recipe_ids[r],
+            titulo=matrix.titles[r],
+            cobertura=round(score, 3),
+            ingredientes=int(matrix.n_ingredients[r]),
+            faltando=missing,
+        )
+        for r, score, missing in matrix.score(current_user.id, pantry, limit, min_score)
+    ]
+
+@router.post("/import", response_model=ImportacaoLoteRead, status_code=202)
+async def import_from_urls(
+        payload: ImportarReceitas,
+        db: AsyncSession = Depends(get_async_db),
+        current_user=Depends(get_bearer_user_async),
+    ):
+    # só enfileira: a coleção inteira é buscada e gravada em lote pelo worker
+    if len(payload.urls) > settings.RECIPE_IMPORT_MAX_URLS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {settings.RECIPE_IMPORT_MAX_URLS} URLs por importação")
+    lote = ImportacaoLote(
+        id=uuid.uuid4(), usuario_id=current_user.id, status="PENDENTE",
+        urls=payload.urls, solicitado_em=datetime.now(timezone.utc),
+    )
+    db.add(lote)
+    await db.commit()
+    recipe_import_worker.wake()
+    return lote
+
+@router.get("/import/{lote_id}", response_model=ImportacaoLoteRead)
+async def get_import(lote_id: uuid.UUID, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_bearer_user_async)):
+    lote = (
+        await db.execute(select(ImportacaoLote).where(ImportacaoLote.id == lote_id, ImportacaoLote.usuario_id == current_user.id))
+    ).scalars().first()
+    if not lote:
+        raise HTTPException(status_code=404, detail="Importação não encontrada")
+    return lote
+
+@router.get("/stats")
+def recipes_stats():
+    return {"index": recipe_index.stats(), "import": recipe_import_worker.stats()}
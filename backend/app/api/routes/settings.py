@@ -1,13 +1,16 @@
 from __future__ import annotations
+import uuid
 from datetime import datetime, timezone
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.db.session import get_db
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_async_db
 from app.db.models.settings import UserSettings
 from app.db.models.lgpd import Consentimento
 from app.schemas.settings import SettingsRead, SettingsUpdate
 
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user_async
 
 router = APIRouter()
 
@@ -19,32 +22,47 @@ CONSENTS = {
     "allow_microphone": "microphone",
 }
 
-def _get_or_create_user_settings(db: Session, user_id):
-    us = db.query(UserSettings).filter(UserSettings.user_id == user_id).first()
+async def _get_or_create_user_settings(db: AsyncSession, user_id):
+    us = (await db.execute(select(UserSettings).where(UserSettings.user_id == user_id))).scalars().first()
     if not us:
         us = UserSettings(user_id=user_id)
         db.add(us)
-        db.flush()
+        await db.flush()
     return us
 
-def _set_consent(db: Session, user_id, escopo: str, granted: bool):
-    # se granted=True e não existe consentimento ativo -> cria
-    # se granted=False e existe ativo -> marca revogado_em
-    active = (
-        db.query(Consentimento)
-        .filter(Consentimento.usuario_id == user_id, Consentimento.escopo == escopo, Consentimento.revogado_em.is_(None))
-        .first()
+async def _reconcile_consents(db: AsyncSession, user_id, desired: dict[str, bool]):
+    # um SELECT dos ativos + no máximo um INSERT e um UPDATE em lote
+    if not desired:
+        return
+    active = set(
+        (
+            await db.execute(
+                select(Consentimento.escopo)
+                .where(Consentimento.usuario_id == user_id, Consentimento.revogado_em.is_(None))
+            )
+        ).scalars()
     )
+    grant = [escopo for escopo, granted in desired.items() if granted and escopo not in active]
+    revoke = [escopo for escopo, granted in desired.items() if not granted and escopo in active]
     now = datetime.now(timezone.utc)
-    if granted and not active:
-        db.add(Consentimento(usuario_id=user_id, escopo=escopo, concedido_em=now))
-    elif not granted and active:
-        active.revogado_em = now
+    if grant:
+        # ON CONFLICT no índice parcial: requests concorrentes não duplicam o ativo
+        await db.execute(
+            pg_insert(Consentimento)
+            .values([{"id": uuid.uuid4(), "usuario_id": user_id, "escopo": e, "concedido_em": now} for e in grant])
+            .on_conflict_do_nothing(index_elements=["usuario_id", "escopo"], index_where=Consentimento.revogado_em.is_(None))
+        )
+    if revoke:
+        await db.execute(
+            update(Consentimento)
+            .where(Consentimento.usuario_id == user_id, Consentimento.escopo.in_(revoke), Consentimento.revogado_em.is_(None))
+            .values(revogado_em=now)
+        )
 
 @router.get("/me/settings", response_model=SettingsRead)
-def get_my_settings(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    us = _get_or_create_user_settings(db, current_user.id)
-    db.commit()  # persiste caso tenha sido criado
+async def get_my_settings(db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user_async)):
+    us = await _get_or_create_user_settings(db, current_user.id)
+    await db.commit()  # persiste caso tenha sido criado
     return SettingsRead(
         user_id=current_user.id,
         allow_location=us.allow_location,
@@ -55,20 +73,21 @@ def get_my_settings(db: Session = Depends(get_db), current_user=Depends(get_curr
     )
 
 @router.patch("/me/settings", response_model=SettingsRead)
-def update_my_settings(payload: SettingsUpdate, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    us = _get_or_create_user_settings(db, current_user.id)
+async def update_my_settings(payload: SettingsUpdate, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user_async)):
+    us = await _get_or_create_user_settings(db, current_user.id)
 
     # atualiza flags e registra consentimentos/revogação
+    desired = {}
     for field, escopo in CONSENTS.items():
         val = getattr(payload, field)
         if val is None:
             continue
         setattr(us, field, bool(val))
-        _set_consent(db, current_user.id, escopo, bool(val))
+        desired[escopo] = bool(val)
+    await _reconcile_consents(db, current_user.id, desired)
 
     db.add(us)
-    db.commit()
-    db.refresh(us)
+    await db.commit()  # expire_on_commit=False: não precisa de refresh
     return SettingsRead(
         user_id=current_user.id,
         allow_location=us.allow_location,
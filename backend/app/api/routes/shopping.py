@@ -0,0 +1,127 @@
+from __future__ import annotations
+import uuid
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import Numeric, and_, case, cast, insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.api.deps import get_bearer_user_async
+from app.db.session import get_async_db
+from app.core.units import CONTAGEM, sql_canonical
+from app.db.models.market import Mercado, PrecoAtual
+from app.db.models.recipe import Cardapio, Refeicao, Receita, IngredienteReceita
+from app.db.models.shopping import ListaCompras, ItemLista
+from app.schemas.shopping import ListaFromCardapioIn, ListaComprasRead, ItemListaRead, ListaCustoRead
+from app.services.pantry import stock_totals_stmt
+from app.services.shopping import compare_markets, plan_requirements, shopping_items, stock_amounts
+
+router = APIRouter(prefix="/shopping-lists", tags=["shopping"])
+
+def _lista_out(lista: ListaCompras, itens) -> ListaComprasRead:
+    return ListaComprasRead(
+        id=lista.id,
+        nome=lista.nome,
+        status=lista.status,
+        itens=[
+            ItemListaRead(
+                id=i.id, produto_id=i.produto_id, nome_livre=i.nome_livre, quantidade=i.quantidade,
+                unidade=i.unidade, feito=i.feito, preco_estimado=i.preco_estimado,
+            )
+            for i in itens
+        ],
+    )
+
+@router.post("/from-menu/{cardapio_id}", response_model=ListaComprasRead, status_code=201)
+async def list_from_menu(
+        cardapio_id: uuid.UUID,
+        body: ListaFromCardapioIn | None = None,
+        db: AsyncSession = Depends(get_async_db),
+        current_user=Depends(get_bearer_user_async),
+    ):
+    body = body or ListaFromCardapioIn()
+    # cardápio inteiro em 5 SELECTs (cardápio, refeições, receitas, ingredientes,
+    # produtos), não importa quantos dias ele tenha
+    cardapio = (
+        await db.execute(
+            select(Cardapio)
+            .where(Cardapio.id == cardapio_id, Cardapio.usuario_id == current_user.id)
+            .options(
+                selectinload(Cardapio.refeicoes)
+                .selectinload(Refeicao.receitas)
+                .selectinload(Receita.ingredientes)
+                .selectinload(IngredienteReceita.produto)
+            )
+        )
+    ).scalars().first()
+    if not cardapio:
+        raise HTTPException(status_code=404, detail="Cardápio não encontrado")
+
+    need, labels = plan_requirements(cardapio.refeicoes, body.porcoes)
+    produtos = {ref for ref, _ in need if isinstance(ref, uuid.UUID)}
+    have = {}
+    if produtos:
+        # estoque somado no banco, já em g/ml/un
+        have = stock_amounts(await db.execute(stock_totals_stmt(current_user.id, produtos)))
+    pesos = {
+        ing.produto_id: ing.produto.peso_unidade_g
+        for refeicao in cardapio.refeicoes for receita in refeicao.receitas for ing in receita.ingredientes
+        if ing.produto is not None and ing.produto.peso_unidade_g
+    }
+
+    lista = ListaCompras(id=uuid.uuid4(), usuario_id=current_user.id, nome=body.nome or f"Compras: {cardapio.titulo}", status="ABERTA")
+    db.add(lista)
+    await db.flush()
+    rows = [{"id": uuid.uuid4(), "lista_id": lista.id, "feito": False, **item} for item in shopping_items(need, have, labels, pesos)]
+    itens = []
+    if rows:
+        # um INSERT em lote (insertmanyvalues) para todos os itens
+        itens = (await db.execute(insert(ItemLista).returning(ItemLista), rows)).scalars().all()
+    await db.commit()
+    return _lista_out(lista, itens)
+
+@router.get("/{lista_id}", response_model=ListaComprasRead)
+async def get_list(lista_id: uuid.UUID, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_bearer_user_async)):
+    lista = (
+        await db.execute(
+            select(ListaCompras)
+            .where(ListaCompras.id == lista_id, ListaCompras.usuario_id == current_user.id)
+            .options(selectinload(ListaCompras.itens))
+        )
+    ).scalars().first()
+    if not lista:
+        raise HTTPException(status_code=404, detail="Lista não encontrada")
+    return _lista_out(lista, lista.itens)
+
+@router.post("/{lista_id}/estimate", response_model=ListaCustoRead)
+async def estimate_list(lista_id: uuid.UUID, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_bearer_user_async)):
+    # O preço coletado é por unidade vendida: itens contados (UN, DZ) multiplicam
+    # pela quantidade; em g/ml sem tamanho de embalagem, conta uma embalagem.
+    dim, value = sql_canonical(ItemLista.quantidade, ItemLista.unidade)
+    estimado = cast(
+        PrecoAtual.preco * case((and_(dim == CONTAGEM, value > 0), value), else_=literal(1)),
+        Numeric(12, 2),
+    )
+    # uma consulta só: itens x últimos preços de todos os mercados (LEFT JOINs,
+    # para a lista e os itens sem preço aparecerem mesmo assim)
+    rows = (
+        await db.execute(
+            select(ItemLista.id, ItemLista.produto_id, Mercado.id, Mercado.nome, estimado)
+            .select_from(ListaCompras)
+            .outerjoin(ItemLista, ItemLista.lista_id == ListaCompras.id)
+            .outerjoin(PrecoAtual, PrecoAtual.produto_id == ItemLista.produto_id)
+            .outerjoin(Mercado, Mercado.id == PrecoAtual.mercado_id)
+            .where(ListaCompras.id == lista_id, ListaCompras.usuario_id == current_user.id)
+        )
+    ).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Lista não encontrada")
+
+    result = compare_markets(rows)
+    if result["itens"]:
+        # preco_estimado de cada item no mercado escolhido (UPDATE em lote por PK)
+        await db.execute(
+            update(ItemLista),
+            [{"id": i["item_id"], "preco_estimado": i["preco_estimado"]} for i in result["itens"]],
+        )
+        await db.commit()
+    return ListaCustoRead(lista_id=lista_id, **result)
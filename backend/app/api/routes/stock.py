@@ -0,0 +1,269 @@
+from __future__ import annotations
+import base64
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select, true, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from app.api.deps import get_bearer_user_async
+from app.db.session import get_async_db
+from app.db.models.product import Produto
+from app.db.models.storage import LocalEstoque, ItemEstoque, MovimentoEstoque, SaldoEstoque
+from app.schemas.stock import (
+    LocalCreate, LocalRead, EntradaIn, SaidaIn, TransferenciaIn, MovimentoRead, SaldoRead,
+    ItemValidadeRead, ItemValidadePage,
+)
+
+router = APIRouter(prefix="/stock", tags=["stock"])
+
+async def _lock_item(db: AsyncSession, user_id, item_id) -> ItemEstoque:
+    # FOR UPDATE no item: movimentos do mesmo item ficam em fila e uma
+    # transferência A->B nunca cruza com B->A (sem deadlock entre saldos)
+    item = (
+        await db.execute(
+            select(ItemEstoque)
+            .where(ItemEstoque.id == item_id, ItemEstoque.usuario_id == user_id)
+            .with_for_update()
+        )
+    ).scalars().first()
+    if not item:
+        raise HTTPException(status_code=404, detail="Item não encontrado")
+    return item
+
+async def _check_locals(db: AsyncSession, user_id, *local_ids):
+    ids = set(local_ids)
+    found = (
+        await db.execute(
+            select(func.count())
+            .select_from(LocalEstoque)
+            .where(LocalEstoque.id.in_(ids), LocalEstoque.usuario_id == user_id)
+        )
+    ).scalar_one()
+    if found != len(ids):
+        raise HTTPException(status_code=404, detail="Local não encontrado")
+
+async def _credit(db: AsyncSession, item_id, local_id, quantidade: Decimal) -> Decimal:
+    stmt = pg_insert(SaldoEstoque).values(id=uuid.uuid4(), item_id=item_id, local_id=local_id, quantidade=quantidade)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_saldo_item_local",
+        set_={"quantidade": SaldoEstoque.quantidade + stmt.excluded.quantidade},
+    ).returning(SaldoEstoque.quantidade)
+    return (await db.execute(stmt)).scalar_one()
+
+async def _debit(db: AsyncSession, item_id, local_id, quantidade: Decimal) -> Decimal:
+    # UPDATE condicional: nunca deixa o saldo negativo
+    saldo = (
+        await db.execute(
+            update(SaldoEstoque)
+            .where(
+                SaldoEstoque.item_id == item_id,
+                SaldoEstoque.local_id == local_id,
+                SaldoEstoque.quantidade >= quantidade,
+            )
+            .values(quantidade=SaldoEstoque.quantidade - quantidade)
+            .returning(SaldoEstoque.quantidade)
+        )
+    ).scalar_one_or_none()
+    if saldo is None:
+        raise HTTPException(status_code=409, detail="Saldo insuficiente")
+    return saldo
+
+def _movement_out(mov: MovimentoEstoque, item: ItemEstoque, saldo_de=None, saldo_para=None) -> MovimentoRead:
+    return MovimentoRead(
+        id=mov.id,
+        item_id=item.id,
+        tipo=mov.tipo,
+        quantidade=mov.quantidade,
+        de_local_id=mov.de_local_id,
+        para_local_id=mov.para_local_id,
+        saldo_de=saldo_de,
+        saldo_para=saldo_para,
+        total_item=item.quantidade,
+    )
+
+@router.get("/locations", response_model=list[LocalRead])
+async def list_locations(db: AsyncSession = Depends(get_async_db), current_user=Depends(get_bearer_user_async)):
+    rows = (
+        await db.execute(select(LocalEstoque).where(LocalEstoque.usuario_id == current_user.id).order_by(LocalEstoque.nome))
+    ).scalars()
+    return [LocalRead(id=l.id, nome=l.nome, descricao=l.descricao) for l in rows]
+
+@router.post("/locations", response_model=LocalRead, status_code=201)
+async def create_location(body: LocalCreate, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_bearer_user_async)):
+    local = LocalEstoque(id=uuid.uuid4(), usuario_id=current_user.id, nome=body.nome, descricao=body.descricao)
+    db.add(local)
+    await db.commit()
+    return LocalRead(id=local.id, nome=local.nome, descricao=local.descricao)
+
+@router.get("", response_model=list[SaldoRead])
+async def list_stock(
+        local_id: uuid.UUID | None = None,
+        db: AsyncSession = Depends(get_async_db),
+        current_user=Depends(get_bearer_user_async),
+    ):
+    # lê só os saldos materializados: custo proporcional aos itens, não ao histórico
+    stmt = (
+        select(
+            SaldoEstoque.item_id, ItemEstoque.produto_id, Produto.nome.label("produto"),
+            SaldoEstoque.local_id, LocalEstoque.nome.label("local"),
+            SaldoEstoque.quantidade, ItemEstoque.unidade, ItemEstoque.validade,
+        )
+        .join(ItemEstoque, ItemEstoque.id == SaldoEstoque.item_id)
+        .join(Produto, Produto.id == ItemEstoque.produto_id)
+        .join(LocalEstoque, LocalEstoque.id == SaldoEstoque.local_id)
+        .where(ItemEstoque.usuario_id == current_user.id, SaldoEstoque.quantidade > 0)
+        .order_by(LocalEstoque.nome, Produto.nome)
+    )
+    if local_id is not None:
+        stmt = stmt.where(SaldoEstoque.local_id == local_id)
+    return [SaldoRead(**row._mapping) for row in await db.execute(stmt)]
+
+def _encode_cursor(validade: date, item_id: uuid.UUID) -> str:
+    return base64.urlsafe_b64encode(f"{validade.isoformat()}|{item_id}".encode()).decode()
+
+def _decode_cursor(cursor: str) -> tuple[date, uuid.UUID]:
+    try:
+        raw_date, raw_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return date.fromisoformat(raw_date), uuid.UUID(raw_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+@router.get("/expiring", response_model=ItemValidadePage)
+async def list_expiring(
+        limit: int = Query(50, ge=1, le=200),
+        cursor: str | None = Query(None, description="next_cursor da página anterior"),
+        local_id: uuid.UUID | None = None,
+        days: int | None = Query(None, ge=0, description="Só itens que vencem em até N dias"),
+        db: AsyncSession = Depends(get_async_db),
+        current_user=Depends(get_bearer_user_async),
+    ):
+    # keyset em (validade, id) sobre ix_itens_estoque_usuario_validade: cada
+    # página custa o mesmo, sem OFFSET; produto e local vêm no mesmo SELECT.
+    # O local sai dos saldos (o item pode ter sido transferido ou estar em mais
+    # de um lugar): o JOIN LATERAL só mantém itens com saldo positivo no local
+    # pedido e devolve esse saldo; sem local, o que guarda a maior parte.
+    saldo = (
+        select(SaldoEstoque.local_id, SaldoEstoque.quantidade)
+        .where(SaldoEstoque.item_id == ItemEstoque.id, SaldoEstoque.quantidade > 0)
+        .order_by(SaldoEstoque.quantidade.desc(), SaldoEstoque.local_id)
+        .limit(1)
+    )
+    if local_id is not None:
+        saldo = saldo.where(SaldoEstoque.local_id == local_id)
+    saldo = saldo.lateral("saldo")
+    stmt = (
+        select(ItemEstoque, saldo.c.local_id, LocalEstoque.nome, saldo.c.quantidade)
+        .select_from(ItemEstoque)
+        .join(saldo, true())
+        .join(LocalEstoque, LocalEstoque.id == saldo.c.local_id)
+        .options(joinedload(ItemEstoque.produto))
+        .where(
+            ItemEstoque.usuario_id == current_user.id,
+            ItemEstoque.validade.is_not(None),
+            ItemEstoque.quantidade > 0,
+        )
+        .order_by(ItemEstoque.validade, ItemEstoque.id)
+        .limit(limit + 1)
+    )
+    if cursor:
+        stmt = stmt.where(tuple_(ItemEstoque.validade, ItemEstoque.id) > tuple_(*_decode_cursor(cursor)))
+    today = date.today()
+    if days is not None:
+        stmt = stmt.where(ItemEstoque.validade <= today + timedelta(days=days))
+
+    rows = (await db.execute(stmt)).all()
+    page = rows[:limit]
+    next_cursor = _encode_cursor(page[-1][0].validade, page[-1][0].id) if len(rows) > limit else None
+    return ItemValidadePage(
+        items=[
+            ItemValidadeRead(
+                id=i.id,
+                produto_id=i.produto_id,
+                produto=i.produto.nome,
+                local_id=saldo_local,
+                local=local,
+                # com local: o saldo nele; sem local: o total do item
+                quantidade=em_local if local_id is not None else i.quantidade,
+                unidade=i.unidade,
+                validade=i.validade,
+                dias_restantes=(i.validade - today).days,
+            )
+            for i, saldo_local, local, em_local in page
+        ],
+        next_cursor=next_cursor,
+    )
+
+@router.post("/entries", response_model=MovimentoRead, status_code=201)
+async def stock_entry(body: EntradaIn, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_bearer_user_async)):
+    if body.item_id is not None:
+        item = await _lock_item(db, current_user.id, body.item_id)
+    elif body.produto_id is not None:
+        if await db.get(Produto, body.produto_id) is None:
+            raise HTTPException(status_code=404, detail="Produto não encontrado")
+        item = ItemEstoque(
+            id=uuid.uuid4(),
+            usuario_id=current_user.id,
+            produto_id=body.produto_id,
+            local_id=body.local_id,
+            quantidade=Decimal(0),
+            unidade=body.unidade or "UN",
+            validade=body.validade,
+        )
+        db.add(item)
+    else:
+        raise HTTPException(status_code=400, detail="Informe item_id ou produto_id")
+
+    local_id = body.local_id or item.local_id
+    if local_id is None:
+        raise HTTPException(status_code=400, detail="Informe o local do estoque")
+    await _check_locals(db, current_user.id, local_id)
+    await db.flush()
+
+    saldo = await _credit(db, item.id, local_id, body.quantidade)
+    item.quantidade = (item.quantidade or Decimal(0)) + body.quantidade
+    mov = MovimentoEstoque(
+        id=uuid.uuid4(), item_id=item.id, tipo="ENTRADA", quantidade=body.quantidade,
+        para_local_id=local_id, motivo=body.motivo,
+    )
+    db.add(mov)
+    await db.commit()
+    return _movement_out(mov, item, saldo_para=saldo)
+
+@router.post("/exits", response_model=MovimentoRead, status_code=201)
+async def stock_exit(body: SaidaIn, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_bearer_user_async)):
+    item = await _lock_item(db, current_user.id, body.item_id)
+    local_id = body.local_id or item.local_id
+    if local_id is None:
+        raise HTTPException(status_code=400, detail="Informe o local do estoque")
+
+    saldo = await _debit(db, item.id, local_id, body.quantidade)
+    item.quantidade = item.quantidade - body.quantidade
+    mov = MovimentoEstoque(
+        id=uuid.uuid4(), item_id=item.id, tipo="SAIDA", quantidade=body.quantidade,
+        de_local_id=local_id, motivo=body.motivo,
+    )
+    db.add(mov)
+    await db.commit()
+    return _movement_out(mov, item, saldo_de=saldo)
+
+@router.post("/transfers", response_model=MovimentoRead, status_code=201)
+async def stock_transfer(body: TransferenciaIn, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_bearer_user_async)):
+    if body.de_local_id == body.para_local_id:
+        raise HTTPException(status_code=400, detail="Locais de origem e destino iguais")
+    item = await _lock_item(db, current_user.id, body.item_id)
+    await _check_locals(db, current_user.id, body.para_local_id)
+
+    # débito e crédito na mesma transação; o total do item não muda
+    saldo_de = await _debit(db, item.id, body.de_local_id, body.quantidade)
+    saldo_para = await _credit(db, item.id, body.para_local_id, body.quantidade)
+    mov = MovimentoEstoque(
+        id=uuid.uuid4(), item_id=item.id, tipo="TRANSFERENCIA", quantidade=body.quantidade,
+        de_local_id=body.de_local_id, para_local_id=body.para_local_id, motivo=body.motivo,
+    )
+    db.add(mov)
+    await db.commit()
+    return _movement_out(mov, item, saldo_de=saldo_de, saldo_para=saldo_para)
@@ -1,46 +1,226 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from faster_whisper import WhisperModel
-import tempfile, shutil, os
+import asyncio, contextlib, json
+from concurrent.futures import Future
+
+from app.core.config import settings
+from app.services.transcription import TranscriptionEngine, ModelTiers, EngineBusy, DECODE_OPTIONS, VAD_PARAMETERS
+from app.services.transcription_cache import TranscriptionCache, cache_key, hash_upload
+from app.services.streaming import StreamingSession
+from app.services.audio import AudioRejected, decode_audio, SAMPLE_RATE
 
 router = APIRouter(prefix="/voice", tags=["voice"])
 
-WHISPER_MODEL_SIZE = "small"
-WHISPER_COMPUTE = "int8"  # melhor para CPU
-model = WhisperModel(WHISPER_MODEL_SIZE, compute_type=WHISPER_COMPUTE)
+def _build_engine(model_size: str) -> TranscriptionEngine:
+    return TranscriptionEngine(
+        model_size,
+        settings.WHISPER_COMPUTE,
+        workers=settings.TRANSCRIBE_WORKERS,
+        max_queue=settings.TRANSCRIBE_MAX_QUEUE,
+        mode=settings.TRANSCRIBE_EXECUTOR,
+        retry_after=settings.TRANSCRIBE_RETRY_AFTER,
+        max_batch_size=settings.TRANSCRIBE_MAX_BATCH,
+        batch_window_ms=settings.TRANSCRIBE_BATCH_WINDOW_MS,
+    )
+
+tiers = ModelTiers(
+    [s.strip() for s in settings.WHISPER_MODEL_TIERS.split(",") if s.strip()],
+    _build_engine,
+    default=settings.WHISPER_MODEL_SIZE,
+    short_s=settings.WHISPER_TIER_SHORT_S,
+    long_s=settings.WHISPER_TIER_LONG_S,
+    warm_up=settings.WHISPER_WARMUP,
+)
+cache = TranscriptionCache(
+    settings.TRANSCRIBE_CACHE_SIZE, settings.TRANSCRIBE_CACHE_DIR, max_disk_entries=settings.TRANSCRIBE_CACHE_DISK_ENTRIES,
+)
 
 class TranscribeOut(BaseModel):
     text: str
+    model: str | None = None
+
+def _with_model(job: Future, model: str, out: Future) -> Future:
+    # resultado guardado no cache já com o tier que transcreveu
+    def done(f: Future):
+        if f.cancelled():
+            out.cancel()
+        elif f.exception() is not None:
+            out.set_exception(f.exception())
+        else:
+            out.set_result({"text": f.result() or "", "model": model})
+
+    job.add_done_callback(done)
+    return out
+
+def _cache_key(digest: str, language: str | None, model: str | None) -> str:
+    # tudo que muda o texto entra na chave: trocar a configuração invalida o cache
+    return cache_key(
+        digest, language, model or "auto",
+        compute_type=settings.WHISPER_COMPUTE,
+        tiers=settings.WHISPER_MODEL_TIERS,
+        vad=json.dumps(VAD_PARAMETERS, sort_keys=True),
+        **DECODE_OPTIONS,
+    )
 
 @router.post("/transcribe", response_model=TranscribeOut)
 async def transcribe_audio(
         audio: UploadFile = File(..., description="Arquivo de áudio (m4a/mp3/wav/ogg...)"),
-        language: str = Query("pt", description="Idioma (ex.: 'pt', 'en', 'auto' ...)")
+        language: str = Query("pt", description="Idioma (ex.: 'pt', 'en', 'auto' ...)"),
+        model: str | None = Query(None, description="Força um tier de modelo (ex.: 'tiny', 'small')"),
     ):
     if not (audio.content_type or "").startswith("audio/"):
         raise HTTPException(status_code=400, detail="Conteúdo inválido: envie um arquivo de áudio.")
 
-    tmp_path = None
+    lang_arg = None if language in ("auto", "", None) else language
+    digest = await run_in_threadpool(hash_upload, audio.file)
+    key = _cache_key(digest, lang_arg, model)
+    # a camada em disco bloqueia: fora do event loop
+    cached = await run_in_threadpool(cache.get, key)
+    if cached is not None:
+        return TranscribeOut(**cached)
+
     try:
-        with tempfile.NamedTemporaryFile(suffix=".bin", delete=False) as tmp:
-            shutil.copyfileobj(audio.file, tmp)
-            tmp_path = tmp.name
-
-        lang_arg = None if language in ("auto", "", None) else language
-        segments, info = model.transcribe(
-            tmp_path,
-            language=lang_arg,
-            vad_filter=True,
-            beam_size=5
-        )
-        text = " ".join([s.text for s in segments]).strip()
-        return TranscribeOut(text=text or "")
+        # reserva a chave antes de qualquer await: o pedido idêntico que chegar
+        # durante a decodificação espera este em vez de rodar outra inferência
+        job, owner = cache.reserve(key)
+        if owner:
+            try:
+                try:
+                    # decodifica direto do upload (memória/spooled) para float32 16 kHz
+                    pcm = await run_in_threadpool(
+                        decode_audio,
+                        audio.file,
+                        max_bytes=settings.TRANSCRIBE_MAX_UPLOAD_MB * 1024 * 1024,
+                        max_duration_s=settings.TRANSCRIBE_MAX_DURATION_S,
+                    )
+                except AudioRejected as e:
+                    raise HTTPException(status_code=e.status_code, detail=e.detail)
+                try:
+                    tier = tiers.choose(len(pcm) / SAMPLE_RATE, lang_arg, model)
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                # a inferência roda no pool do engine; o event loop fica livre
+                _with_model(tiers.engine(tier).submit(pcm, lang_arg), tier, job)
+            except asyncio.CancelledError:
+                # cliente desistiu antes da inferência: quem esperava recebe erro e a chave fica livre
+                job.set_exception(RuntimeError("pedido original cancelado"))
+                raise
+            except Exception as e:
+                job.set_exception(e)
+                raise
+        # shield: se este cliente desistir, o retry ainda aproveita o resultado
+        result = await asyncio.shield(asyncio.wrap_future(job))
+        return TranscribeOut(**result)
 
+    except HTTPException:
+        raise
+    except EngineBusy as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Transcrição indisponível no momento, tente novamente.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Falha na transcrição: {e}")
+
+@router.get("/stats")
+def transcribe_stats():
+    return {**tiers.stats(), "cache": cache.stats()}
+
+@router.websocket("/stream")
+async def transcribe_stream(ws: WebSocket, language: str = "pt"):
+    # Protocolo: o cliente envia frames binários com PCM 16-bit mono 16 kHz e,
+    # ao terminar, a mensagem de texto {"type": "stop"}. O servidor responde com
+    # {"type": "partial"|"final", "text", "start", "end"} e por fim {"type": "done", "text"}.
+    # Mesmos limites do upload (TRANSCRIBE_MAX_UPLOAD_MB / _MAX_DURATION_S).
+    await ws.accept()
+    lang_arg = None if language in ("auto", "") else language
+    session = StreamingSession(max_partial_s=settings.TRANSCRIBE_STREAM_PARTIAL_S)
+    max_bytes = settings.TRANSCRIBE_MAX_UPLOAD_MB * 1024 * 1024
+    max_duration_s = settings.TRANSCRIBE_MAX_DURATION_S
+    received = 0
+    finals: list[str] = []
+    send_lock = asyncio.Lock()
+    # parciais rodam fora do laço de recepção: só a mais recente espera vez e
+    # uma parcial de um trecho que já virou final é descartada
+    latest: list = [None]  # (segmento, geração)
+    wake = asyncio.Event()
+    generation = 0  # sobe a cada final
+
+    async def send(payload: dict):
+        async with send_lock:
+            await ws.send_json(payload)
+
+    async def transcribe(seg):
+        tier = tiers.choose(seg.end - seg.start, lang_arg)
+        return tier, await tiers.engine(tier).transcribe(seg.audio, lang_arg)
+
+    def segment_out(kind: str, seg, tier: str, text: str) -> dict:
+        return {"type": kind, "text": text, "model": tier, "start": round(seg.start, 2), "end": round(seg.end, 2)}
+
+    async def send_final(seg):
+        tier, text = await transcribe(seg)
+        if text:
+            finals.append(text)
+        await send(segment_out("final", seg, tier, text))
+
+    async def run_partials():
+        while True:
+            await wake.wait()
+            wake.clear()
+            if latest[0] is None:
+                continue
+            (seg, gen), latest[0] = latest[0], None
+            try:
+                tier, text = await transcribe(seg)
+            except EngineBusy:
+                continue  # parcial é só prévia: com o engine cheio, fica sem
+            if gen == generation and latest[0] is None:
+                await send(segment_out("partial", seg, tier, text))
+
+    partials = asyncio.create_task(run_partials())
+    try:
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                return
+            if msg.get("bytes"):
+                received += len(msg["bytes"])
+                session.feed(msg["bytes"])
+                if received > max_bytes or session.total_samples > max_duration_s * SAMPLE_RATE:
+                    await send({"type": "error", "detail": f"Áudio mais longo que {max_duration_s:g} s."})
+                    await ws.close(code=1009)
+                    return
+                finished = await run_in_threadpool(session.pop_finished)
+                if finished:
+                    generation += 1
+                    latest[0] = None
+                for seg in finished:
+                    await send_final(seg)
+                partial = session.take_partial()
+                if partial is not None:
+                    latest[0] = (partial, generation)
+                    wake.set()
+            elif msg.get("text"):
+                try:
+                    command = json.loads(msg["text"]).get("type")
+                except (ValueError, AttributeError):
+                    command = None
+                if command == "stop":
+                    partials.cancel()
+                    last = await run_in_threadpool(session.flush)
+                    if last is not None:
+                        await send_final(last)
+                    await send({"type": "done", "text": " ".join(finals)})
+                    await ws.close()
+                    return
+    except EngineBusy as e:
+        await send({"type": "error", "detail": "Transcrição indisponível no momento, tente novamente.", "retry_after": e.retry_after})
+        await ws.close(code=1013)
+    except WebSocketDisconnect:
+        pass
     finally:
-        try:
-            if tmp_path and os.path.exists(tmp_path):
-                os.remove(tmp_path)
-        except Exception:
-            pass
+        partials.cancel()
+        with contextlib.suppress(asyncio.CancelledError, Exception):
+            await partials
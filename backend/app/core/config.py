@@ -5,7 +5,86 @@ class Settings(BaseSettings):
     DATABASE_URL: AnyUrl
     SECRET_KEY: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
     BACKEND_CORS_ORIGINS: str = "*"
+    # pool de conexões (vale para o engine sync e para o async, cada um com o seu)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_S: float = 30
+    DB_POOL_RECYCLE_S: int = 1800
+    DB_STATEMENT_TIMEOUT_MS: int = 15000  # 0 desliga
+    PASSWORD_HASH_ROUNDS: int | None = None  # None = padrão do passlib
+    # hashing de senha fora do threadpool da API
+    CREDENTIAL_EXECUTOR: str = "process"  # "thread" | "process"
+    CREDENTIAL_WORKERS: int = 2
+    CREDENTIAL_MAX_CONCURRENCY: int = 8  # operações em andamento + na fila
+    CREDENTIAL_WAIT_S: float = 2.0  # espera por uma vaga antes de responder 503
+    PRINCIPAL_CACHE_SIZE: int = 4096  # tokens em cache no get_current_user (0 desliga)
+    PRINCIPAL_CACHE_TTL_S: int = 300
+    # cache código de barras -> produto (0 desliga)
+    BARCODE_CACHE_SIZE: int = 10000
+    BARCODE_CACHE_TTL_S: int = 3600
+    BARCODE_NEGATIVE_TTL_S: int = 60  # códigos desconhecidos
+    # busca de produtos: fatia mais usada do catálogo em memória
+    PRODUCT_SEARCH_HOT_SIZE: int = 50000
+    PRODUCT_SEARCH_REFRESH_S: int = 600
+    RECIPE_INDEX_TTL_S: int = 300  # índice de receitas do "o que dá pra cozinhar"
+    RECIPE_INDEX_MIN_INTERVAL_S: float = 5  # intervalo mínimo entre rebuilds por mudança em receitas
+    # importação de receitas por URL (POST /recipes/import)
+    RECIPE_IMPORT_MAX_URLS: int = 500  # URLs por pedido
+    RECIPE_IMPORT_WORKER: bool = True  # roda o worker dentro da API; false = processo separado
+    RECIPE_IMPORT_POLL_S: float = 30
+    RECIPE_IMPORT_STALE_S: int = 1800  # PROCESSANDO há mais que isso (worker caiu) volta para a fila
+    RECIPE_IMPORT_CONCURRENCY: int = 20  # conexões simultâneas no total
+    RECIPE_IMPORT_PER_HOST: int = 4  # conexões simultâneas por site
+    RECIPE_IMPORT_TIMEOUT_S: float = 10
+    RECIPE_IMPORT_MAX_BYTES: int = 3000000  # páginas maiores são descartadas
+    RECIPE_IMPORT_ALLOW_PRIVATE: bool = False  # permite buscar em IPs internos (só dev/testes)
+    # ingestão em lote de catálogo/preços (POST /products/ingest)
+    INGEST_TOKEN: str | None = None  # header X-Ingest-Token; sem ele o endpoint fica desligado
+    INGEST_BATCH_ROWS: int = 20000  # linhas por COPY/merge (limita a memória)
+    # exportação de dados (LGPD)
+    EXPORT_DIR: str = "data/exports"  # onde ficam os .zip gerados
+    EXPORT_WORKER: bool = True  # roda o worker dentro da API; false = processo separado
+    EXPORT_POLL_S: float = 30  # intervalo de busca por pedidos pendentes
+    EXPORT_BATCH_ROWS: int = 1000  # linhas por fetch do cursor no servidor
+    EXPORT_STALE_S: int = 1800  # PROCESSANDO há mais que isso (worker caiu) volta para a fila
+    # exclusão de conta (LGPD): apaga em lotes pequenos para não segurar locks
+    DELETION_WORKER: bool = True  # roda o worker dentro da API; false = processo separado
+    DELETION_POLL_S: float = 60
+    DELETION_GRACE_S: int = 0  # carência para o usuário cancelar antes de começar a apagar
+    DELETION_BATCH_ROWS: int = 500  # linhas por DELETE (um commit cada)
+    DELETION_PAUSE_S: float = 0.05  # pausa entre lotes (throttle)
+    DELETION_LOCK_TIMEOUT_MS: int = 2000  # lote que esperar lock mais que isso desiste e tenta depois
+    DELETION_STALE_S: int = 300  # lease sem renovar há mais que isso: outro worker retoma
+    # mídia (fotos de produto, notas fiscais): arquivos endereçados pelo sha256
+    MEDIA_DIR: str = "data/media"
+    MEDIA_MAX_UPLOAD_MB: int = 15
+    MEDIA_VARIANT_WIDTHS: str = "160,320,640,1280"  # larguras servidas em ?w= (geradas sob demanda)
+    MEDIA_MAX_PIXELS: int = 50000000  # imagens maiores são recusadas
+    MEDIA_GC_GRACE_S: int = 600  # arquivo sem anexo só é apagado depois disso (upload em andamento)
+    # cria as tabelas no startup (apenas dev; em produção use migrações)
+    DB_CREATE_ALL: bool = False
+
+    # Transcrição (faster-whisper)
+    WHISPER_MODEL_SIZE: str = "small"  # tier carregado no startup
+    WHISPER_MODEL_TIERS: str = "tiny,base,small"  # do mais rápido ao mais preciso
+    WHISPER_TIER_SHORT_S: float = 5  # até aqui usa o tier mais rápido
+    WHISPER_TIER_LONG_S: float = 30  # acima disso usa o tier mais preciso
+    WHISPER_COMPUTE: str = "int8"  # melhor para CPU
+    WHISPER_WARMUP: bool = True  # roda uma inferência curta depois de carregar o modelo
+    TRANSCRIBE_EXECUTOR: str = "thread"  # "thread" | "process"
+    TRANSCRIBE_WORKERS: int = 1
+    TRANSCRIBE_MAX_QUEUE: int = 8
+    TRANSCRIBE_RETRY_AFTER: int = 5  # segundos (header Retry-After do 503)
+    TRANSCRIBE_MAX_BATCH: int = 8
+    TRANSCRIBE_BATCH_WINDOW_MS: int = 25
+    TRANSCRIBE_MAX_UPLOAD_MB: int = 25
+    TRANSCRIBE_MAX_DURATION_S: int = 300
+    TRANSCRIBE_STREAM_PARTIAL_S: float = 10  # parcial do /voice/stream: só os últimos N s da fala aberta
+    TRANSCRIBE_CACHE_SIZE: int = 1024  # entradas no LRU em memória (0 desliga)
+    TRANSCRIBE_CACHE_DIR: str | None = None  # camada em disco, sobrevive a restarts
+    TRANSCRIBE_CACHE_DISK_ENTRIES: int = 10000  # LRU da camada em disco (0 desliga a gravação)
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,119 @@
+from __future__ import annotations
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+
+from app.core.config import settings
+from app.db.models.user import User
+
+
+class PrincipalCache:
+    """Cache token -> usuário, para não consultar o banco a cada request autenticado.
+
+    Guarda só os valores das colunas; a cada hit devolve um User destacado que
+    o chamador reanexa à sessão do request com `merge(load=False)`, sem round
+    trip, e que continua podendo ser alterado e commitado normalmente.
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl_s: int = 300):
+        self.max_entries = max(0, max_entries)
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        self._tokens_by_sub: dict[str, set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> User | None:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[1] <= now:
+                self._drop(token)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            values = copy.deepcopy(entry[0])
+        user = User(**values)
+        make_transient_to_detached(user)
+        return user
+
+    def put(self, token: str, user: User, exp: float | None):
+        if not self.max_entries:
+            return
+        # nunca além do exp do token
+        expires_at = time.time() + self.ttl_s
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        values = copy.deepcopy({attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs})
+        with self._lock:
+            self._drop(token)
+            self._entries[token] = (values, expires_at)
+            self._tokens_by_sub.setdefault(values["email"], set()).add(token)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, token: str):
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        sub = entry[0]["email"]
+        tokens = self._tokens_by_sub.get(sub)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_sub[sub]
+
+    def invalidate(self, sub: str):
+        with self._lock:
+            for token in list(self._tokens_by_sub.get(sub, ())):
+                self._drop(token)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_sub.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL_S)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user(_mapper, _connection, target: User):
+    # qualquer UPDATE no usuário (perfil, fl_ativo, email...) derruba o cache
+    emails = {target.email, *inspect(target).attrs.email.history.deleted}
+    for email in emails:
+        principal_cache.invalidate(email)
+    # de novo no commit: um request entre o flush e o commit ainda lê (e
+    # guarda) a linha antiga
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("principals_changed", set()).update(emails)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bulk_user_change(state):
+    # update(User)/delete(User) em lote não passa pelos eventos de mapper e não
+    # diz quais linhas mudou: limpa o cache inteiro no commit
+    if (state.is_update or state.is_delete) and state.bind_mapper is inspect(User):
+        state.session.info["principals_cleared"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop("principals_cleared", False):
+        principal_cache.clear()
+    for email in session.info.pop("principals_changed", ()):
+        principal_cache.invalidate(email)
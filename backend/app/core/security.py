@@ -1,11 +1,20 @@
+import hashlib
+import secrets
 from datetime import datetime, timedelta, timezone
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
 
+_rounds = (
+    # min_rounds = default: hashes antigos com menos rounds são refeitos no login
+    {"pbkdf2_sha256__default_rounds": settings.PASSWORD_HASH_ROUNDS, "pbkdf2_sha256__min_rounds": settings.PASSWORD_HASH_ROUNDS}
+    if settings.PASSWORD_HASH_ROUNDS
+    else {}
+)
 pwd_context = CryptContext(
     schemes=["pbkdf2_sha256"],
-    deprecated="auto"
+    deprecated="auto",
+    **_rounds,
 )
 
 ALGO = "HS256"
@@ -16,7 +25,19 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, hashed: str) -> bool:
     return pwd_context.verify(password, hashed)
 
+def verify_and_update_password(password: str, hashed: str) -> tuple[bool, str | None]:
+    # devolve um hash novo quando os parâmetros do CryptContext mudaram
+    return pwd_context.verify_and_update(password, hashed)
+
 def create_access_token(sub: str) -> str:
     expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     payload = {"sub": sub, "exp": expire}
     return jwt.encode(payload, settings.SECRET_KEY, algorithm=ALGO)
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def new_refresh_token() -> tuple[str, str]:
+    # token opaco (não é JWT): validar custa um lookup indexado pelo hash
+    token = secrets.token_urlsafe(32)
+    return token, hash_refresh_token(token)
@@ -0,0 +1,23 @@
+from __future__ import annotations
+import re
+import unicodedata
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str | None) -> str:
+    # minúsculas, sem acento e sem pontuação: "Parmesão Ralado!" -> "parmesao ralado"
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_WORD.sub(" ", stripped).strip()
+
+
+def trigrams(text: str) -> set[str]:
+    # mesmos trigramas do pg_trgm: cada palavra com dois espaços antes e um depois
+    grams: set[str] = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
@@ -0,0 +1,131 @@
+from __future__ import annotations
+from decimal import Decimal
+from typing import Sequence
+
+import numpy as np
+from sqlalchemy import case, func, null
+
+from app.core.text import normalize
+
+# dimensões; valores canônicos em g, ml e unidades
+MASSA, VOLUME, CONTAGEM = 0, 1, 2
+DESCONHECIDA = -1
+
+# unidade -> (dimensão, fator para g/ml/un). Grafias com acento entram como
+# estão (o SQL só faz lower/trim); o lado Python normaliza antes de procurar.
+_ALIASES: dict[tuple[int, float], tuple[str, ...]] = {
+    (MASSA, 0.001): ("mg", "miligrama", "miligramas"),
+    (MASSA, 1.0): ("g", "gr", "grama", "gramas"),
+    (MASSA, 1000.0): ("kg", "quilo", "quilos", "kilo", "kilos", "quilograma", "quilogramas"),
+    (VOLUME, 1.0): ("ml", "mililitro", "mililitros"),
+    (VOLUME, 1000.0): ("l", "lt", "litro", "litros"),
+    (VOLUME, 240.0): ("xicara", "xicaras", "xícara", "xícaras", "xic"),
+    (VOLUME, 200.0): ("copo", "copos"),
+    (VOLUME, 15.0): ("colher de sopa", "colheres de sopa", "colher (sopa)", "colheres (sopa)", "cs", "csp"),
+    (VOLUME, 10.0): ("colher de sobremesa", "colheres de sobremesa", "colher (sobremesa)", "colheres (sobremesa)"),
+    (VOLUME, 5.0): (
+        "colher de cha", "colheres de cha", "colher de chá", "colheres de chá",
+        "colher (chá)", "colheres (chá)", "cc", "cch",
+    ),
+    (CONTAGEM, 1.0): ("un", "und", "unid", "unidade", "unidades", "pc", "pç", "peca", "pecas", "peça", "peças"),
+    (CONTAGEM, 12.0): ("dz", "duzia", "duzias", "dúzia", "dúzias"),
+}
+
+UNITS: dict[str, tuple[int, float]] = {}
+for _unit, _names in _ALIASES.items():
+    for _name in _names:
+        UNITS[_name] = _unit
+        UNITS[normalize(_name)] = _unit
+
+
+def unit_of(unidade: str | None) -> tuple[int, float] | None:
+    # sem unidade = unidades (como o default de ItemEstoque)
+    return UNITS.get(normalize(unidade) or "un")
+
+
+def to_canonical(
+    quantidade: Decimal | float | None,
+    unidade: str | None,
+    densidade: Decimal | float | None = None,
+    peso_unidade: Decimal | float | None = None,
+) -> tuple[int, float] | None:
+    """(dimensão, quantidade em g/ml/un) ou None se a unidade não é conhecida.
+
+    Com a densidade (g/ml) ou o peso da unidade (g) do produto, volume e
+    contagem viram massa, e "2 un" de ovo somam com "100 g" de ovo.
+    """
+    if quantidade is None:
+        return None
+    unit = unit_of(unidade)
+    if unit is None:
+        return None
+    dim, factor = unit
+    value = float(quantidade) * factor
+    if dim == VOLUME and densidade:
+        return MASSA, value * float(densidade)
+    if dim == CONTAGEM and peso_unidade:
+        return MASSA, value * float(peso_unidade)
+    return dim, value
+
+
+def to_canonical_array(
+    quantidades: Sequence,
+    unidades: Sequence[str | None],
+    densidade: Sequence | None = None,
+    peso_unidade: Sequence | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Versão vetorizada de to_canonical para colunas inteiras.
+
+    Cada unidade distinta é resolvida uma vez (np.unique); o resto é
+    aritmética de arrays. Devolve (dimensões, valores), com DESCONHECIDA/NaN
+    onde a unidade ou a quantidade não existe.
+    """
+    qty = np.asarray([np.nan if q is None else float(q) for q in quantidades], dtype=np.float64)
+    if not len(qty):
+        return np.zeros(0, dtype=np.int64), qty
+    names, inverse = np.unique(np.asarray([u or "" for u in unidades], dtype=object), return_inverse=True)
+    table = [unit_of(u) for u in names]
+    dims = np.asarray([t[0] if t else DESCONHECIDA for t in table], dtype=np.int64)[inverse]
+    values = qty * np.asarray([t[1] if t else np.nan for t in table], dtype=np.float64)[inverse]
+    dims[np.isnan(values)] = DESCONHECIDA
+
+    for column, source_dim in ((densidade, VOLUME), (peso_unidade, CONTAGEM)):
+        if column is None:
+            continue
+        factor = np.asarray([np.nan if f is None else float(f) for f in column], dtype=np.float64)
+        convert = (dims == source_dim) & (factor > 0)
+        values[convert] *= factor[convert]
+        dims[convert] = MASSA
+    return dims, values
+
+
+def _sql_case(unidade, pick: int):
+    key = func.coalesce(func.nullif(func.lower(func.trim(unidade)), ""), "un")
+    return case({name: unit[pick] for name, unit in UNITS.items()}, value=key, else_=null())
+
+
+def sql_canonical(quantidade, unidade, densidade=None, peso_unidade=None):
+    """(dimensão, valor) como expressões SQL, para somar no banco.
+
+    Usa a mesma tabela de UNITS num CASE; dimensão NULL = unidade desconhecida.
+    """
+    dim = _sql_case(unidade, 0)
+    value = quantidade * _sql_case(unidade, 1)
+    conversions = []
+    if densidade is not None:
+        conversions.append(((dim == VOLUME) & (densidade > 0), densidade))
+    if peso_unidade is not None:
+        conversions.append(((dim == CONTAGEM) & (peso_unidade > 0), peso_unidade))
+    if conversions:
+        value = case(*[(cond, value * factor) for cond, factor in conversions], else_=value)
+        dim = case(*[(cond, MASSA) for cond, _ in conversions], else_=dim)
+    return dim, value
+
+
+def from_canonical(dim: int, value: float) -> tuple[float, str]:
+    # unidade "de gente" para exibir: 1500 g -> 1.5 KG
+    if dim == MASSA:
+        return (value / 1000, "KG") if value >= 1000 else (value, "G")
+    if dim == VOLUME:
+        return (value / 1000, "L") if value >= 1000 else (value, "ML")
+    return value, "UN"
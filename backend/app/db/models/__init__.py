@@ -1,19 +1,21 @@
 from .user import User  # já existente
 from .product import Produto, CodigoBarras
-from .storage import LocalEstoque, ItemEstoque, MovimentoEstoque
-from .recipe import Receita, IngredienteReceita, Playlist, Cardapio, Refeicao, ImportacaoReceita
+from .storage import LocalEstoque, ItemEstoque, MovimentoEstoque, SaldoEstoque
+from .recipe import Receita, IngredienteReceita, Playlist, Cardapio, Refeicao, ImportacaoReceita, ImportacaoLote
 from .shopping import ListaCompras, ItemLista
-from .market import Mercado, PrecoProduto
+from .market import Mercado, PrecoProduto, PrecoAtual
 from .media import AnexoMidia, LeituraOCR
 from .lgpd import Consentimento, ExportacaoDados, ExclusaoConta
+from .token import RefreshToken
 
 __all__ = [
     "User",
     "Produto", "CodigoBarras",
-    "LocalEstoque", "ItemEstoque", "MovimentoEstoque",
-    "Receita", "IngredienteReceita", "Playlist", "Cardapio", "Refeicao", "ImportacaoReceita",
+    "LocalEstoque", "ItemEstoque", "MovimentoEstoque", "SaldoEstoque",
+    "Receita", "IngredienteReceita", "Playlist", "Cardapio", "Refeicao", "ImportacaoReceita", "ImportacaoLote",
     "ListaCompras", "ItemLista",
-    "Mercado", "PrecoProduto",
+    "Mercado", "PrecoProduto", "PrecoAtual",
     "AnexoMidia", "LeituraOCR",
-    "Consentimento", "ExportacaoDados", "ExclusaoConta","UserSettings", "MobileDevice"
+    "Consentimento", "ExportacaoDados", "ExclusaoConta","UserSettings", "MobileDevice",
+    "RefreshToken",
 ]
@@ -2,7 +2,7 @@ from __future__ import annotations
 import uuid
 from datetime import datetime
 
-from sqlalchemy import String, DateTime, ForeignKey
+from sqlalchemy import BigInteger, String, DateTime, ForeignKey, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column
 
@@ -19,6 +19,34 @@ class Consentimento(Base):
     concedido_em: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
     revogado_em: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
 
+    __table_args__ = (
+        # no máximo um consentimento ativo por escopo
+        Index(
+            "uq_consentimento_ativo", "usuario_id", "escopo",
+            unique=True, postgresql_where=text("revogado_em IS NULL"),
+        ),
+    )
+
+
+# Bancos anteriores ao índice parcial: revoga os ativos repetidos (fica o mais
+# recente de cada escopo) e cria o índice que o ON CONFLICT do PATCH
+# /me/settings exige. Idempotente; em produção rode na migração.
+CONSENT_DDL = (
+    """
+    UPDATE consentimentos c SET revogado_em = now()
+    FROM (
+        SELECT id, row_number() OVER (
+            PARTITION BY usuario_id, escopo ORDER BY concedido_em DESC, id DESC
+        ) AS n
+        FROM consentimentos
+        WHERE revogado_em IS NULL
+    ) d
+    WHERE c.id = d.id AND d.n > 1
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_consentimento_ativo ON consentimentos (usuario_id, escopo)"
+    " WHERE revogado_em IS NULL",
+)
+
 
 class ExportacaoDados(Base):
     __tablename__ = "exportacoes_dados"
@@ -26,16 +54,47 @@ class ExportacaoDados(Base):
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     usuario_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
     formato: Mapped[str] = mapped_column(String(16), default="JSON")
+    status: Mapped[str] = mapped_column(String(16), default="PENDENTE", server_default="PENDENTE")  # PENDENTE/PROCESSANDO/CONCLUIDA/ERRO
     solicitado_em: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    iniciado_em: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     concluido_em: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     url_resultado: Mapped[str | None] = mapped_column(String(1024))
+    erro: Mapped[str | None] = mapped_column(String(500))
+
+    __table_args__ = (
+        # fila do worker: só as que ainda não terminaram
+        Index(
+            "ix_exportacoes_fila", "solicitado_em",
+            postgresql_where=text("status IN ('PENDENTE', 'PROCESSANDO')"),
+        ),
+    )
+
+
+# fila de exportação em bancos antigos: pedidos já concluídos não voltam para a
+# fila. Idempotente; em produção rode na migração.
+EXPORT_DDL = (
+    "ALTER TABLE exportacoes_dados ADD COLUMN IF NOT EXISTS status varchar(16) NOT NULL DEFAULT 'PENDENTE'",
+    "ALTER TABLE exportacoes_dados ADD COLUMN IF NOT EXISTS iniciado_em timestamptz",
+    "ALTER TABLE exportacoes_dados ADD COLUMN IF NOT EXISTS erro varchar(500)",
+    "UPDATE exportacoes_dados SET status = 'CONCLUIDA' WHERE status = 'PENDENTE' AND concluido_em IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS ix_exportacoes_fila ON exportacoes_dados (solicitado_em)"
+    " WHERE status IN ('PENDENTE', 'PROCESSANDO')",
+)
 
 
 class ExclusaoConta(Base):
     __tablename__ = "exclusoes_conta"
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    usuario_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    # SET NULL: o pedido sobrevive à exclusão do usuário, como registro de que foi efetivada
+    usuario_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("users.id", ondelete="SET NULL"), index=True, nullable=True)
     status: Mapped[str] = mapped_column(String(16), default="PENDENTE")  # PENDENTE/EFETIVADA/CANCELADA
     solicitado_em: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    # lease do worker: renovado a cada lote; parado há muito tempo = worker caiu
+    iniciado_em: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    linhas_removidas: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
     efetivado_em: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_exclusoes_pendentes", "solicitado_em", postgresql_where=text("status = 'PENDENTE'")),
+    )
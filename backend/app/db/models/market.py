@@ -3,7 +3,7 @@ import uuid
 from datetime import datetime
 from decimal import Decimal
 
-from sqlalchemy import String, DateTime, ForeignKey, Numeric, UniqueConstraint
+from sqlalchemy import DateTime, ForeignKey, Index, Numeric, String, UniqueConstraint, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -21,6 +21,11 @@ class Mercado(Base):
 
     precos: Mapped[list["PrecoProduto"]] = relationship(back_populates="mercado")
 
+    # chave natural usada pela ingestão em lote (cidade/uf vazias contam como iguais)
+    __table_args__ = (
+        Index("uq_mercado_local", "nome", text("coalesce(cidade, '')"), text("coalesce(uf, '')"), unique=True),
+    )
+
 
 class PrecoProduto(Base):
     __tablename__ = "precos_produto"
@@ -35,5 +40,118 @@ class PrecoProduto(Base):
     mercado: Mapped[Mercado] = relationship(back_populates="precos")
 
     __table_args__ = (
+        # o índice da constraint também serve a "coleta mais recente" (varredura reversa)
         UniqueConstraint("produto_id", "mercado_id", "coletado_em", name="uq_preco_coleta"),
     )
+
+
+class PrecoAtual(Base):
+    # último preço de cada produto em cada mercado; mantido pelo trigger abaixo
+    __tablename__ = "precos_atuais"
+
+    produto_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("produtos.id", ondelete="CASCADE"), primary_key=True)
+    mercado_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("mercados.id", ondelete="CASCADE"), primary_key=True, index=True)
+    preco: Mapped[Decimal] = mapped_column(Numeric(12, 2))
+    coletado_em: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    mercado: Mapped[Mercado] = relationship()
+
+
+# Triggers por comando (não por linha): um INSERT/COPY de milhares de preços faz
+# um único upsert em precos_atuais, só com a coleta mais recente de cada par.
+# O de UPDATE cobre a correção de um preço já coletado (ON CONFLICT DO UPDATE);
+# o de DELETE recalcula os pares afetados a partir das coletas que sobraram.
+# Idempotentes: com DB_CREATE_ALL rodam na subida (main._upgrade_schema), seguidos
+# do backfill; em produção rode na migração.
+LATEST_PRICE_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION atualiza_precos_atuais() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO precos_atuais (produto_id, mercado_id, preco, coletado_em)
+        SELECT DISTINCT ON (produto_id, mercado_id) produto_id, mercado_id, preco, coletado_em
+        FROM novos
+        ORDER BY produto_id, mercado_id, coletado_em DESC
+        ON CONFLICT (produto_id, mercado_id) DO UPDATE
+            SET preco = EXCLUDED.preco, coletado_em = EXCLUDED.coletado_em
+            WHERE precos_atuais.coletado_em <= EXCLUDED.coletado_em;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS tg_precos_atuais ON precos_produto",
+    """
+    CREATE TRIGGER tg_precos_atuais AFTER INSERT ON precos_produto
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION atualiza_precos_atuais()
+    """,
+    "DROP TRIGGER IF EXISTS tg_precos_atuais_upd ON precos_produto",
+    """
+    CREATE TRIGGER tg_precos_atuais_upd AFTER UPDATE ON precos_produto
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION atualiza_precos_atuais()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION recalcula_precos_atuais() RETURNS trigger AS $$
+    BEGIN
+        DELETE FROM precos_atuais a
+        USING (SELECT DISTINCT produto_id, mercado_id FROM removidos) r
+        WHERE a.produto_id = r.produto_id AND a.mercado_id = r.mercado_id;
+        INSERT INTO precos_atuais (produto_id, mercado_id, preco, coletado_em)
+        SELECT DISTINCT ON (p.produto_id, p.mercado_id) p.produto_id, p.mercado_id, p.preco, p.coletado_em
+        FROM precos_produto p
+        JOIN (SELECT DISTINCT produto_id, mercado_id FROM removidos) r
+            ON r.produto_id = p.produto_id AND r.mercado_id = p.mercado_id
+        ORDER BY p.produto_id, p.mercado_id, p.coletado_em DESC
+        ON CONFLICT (produto_id, mercado_id) DO NOTHING;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS tg_precos_atuais_del ON precos_produto",
+    """
+    CREATE TRIGGER tg_precos_atuais_del AFTER DELETE ON precos_produto
+    REFERENCING OLD TABLE AS removidos
+    FOR EACH STATEMENT EXECUTE FUNCTION recalcula_precos_atuais()
+    """,
+)
+
+# Mercados repetidos (mesma chave natural) em bancos antigos: os preços vão para
+# o primeiro de cada grupo (a coleta que ele já tem prevalece) e os outros saem,
+# para o índice único que a ingestão usa no ON CONFLICT poder ser criado.
+# Roda depois dos triggers acima, que refazem precos_atuais. Idempotente.
+_DUPLICATE_MARKETS = """
+    SELECT id, first_value(id) OVER (
+        PARTITION BY nome, coalesce(cidade, ''), coalesce(uf, '') ORDER BY id
+    ) AS manter
+    FROM mercados
+"""
+MARKET_DDL = (
+    f"""
+    DELETE FROM precos_produto p
+    USING ({_DUPLICATE_MARKETS}) m
+    WHERE p.mercado_id = m.id AND m.id <> m.manter
+      AND EXISTS (
+          SELECT 1 FROM precos_produto k
+          WHERE k.mercado_id = m.manter AND k.produto_id = p.produto_id AND k.coletado_em = p.coletado_em
+      )
+    """,
+    f"""
+    UPDATE precos_produto p SET mercado_id = m.manter
+    FROM ({_DUPLICATE_MARKETS}) m
+    WHERE p.mercado_id = m.id AND m.id <> m.manter
+    """,
+    f"""
+    DELETE FROM mercados x
+    USING ({_DUPLICATE_MARKETS}) m
+    WHERE x.id = m.id AND m.id <> m.manter
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_mercado_local ON mercados (nome, coalesce(cidade, ''), coalesce(uf, ''))",
+)
+
+LATEST_PRICE_BACKFILL = """
+    INSERT INTO precos_atuais (produto_id, mercado_id, preco, coletado_em)
+    SELECT DISTINCT ON (produto_id, mercado_id) produto_id, mercado_id, preco, coletado_em
+    FROM precos_produto
+    ORDER BY produto_id, mercado_id, coletado_em DESC
+    ON CONFLICT (produto_id, mercado_id) DO NOTHING
+"""
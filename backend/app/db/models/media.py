@@ -1,7 +1,7 @@
 from __future__ import annotations
 import uuid
 
-from sqlalchemy import String, Text, ForeignKey, Float, JSON
+from sqlalchemy import BigInteger, Integer, String, Text, ForeignKey, Float, Index, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -16,11 +16,34 @@ class AnexoMidia(Base):
     item_estoque_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("itens_estoque.id", ondelete="SET NULL"))
     url: Mapped[str] = mapped_column(String(1024))
     tipo: Mapped[str | None] = mapped_column(String(30))
+    # conteúdo no MediaStore (services.media), endereçado pelo hash
+    sha256: Mapped[str | None] = mapped_column(String(64))
+    mime: Mapped[str | None] = mapped_column(String(100))
+    tamanho_bytes: Mapped[int | None] = mapped_column(BigInteger)
+    largura: Mapped[int | None] = mapped_column(Integer)  # imagens, já com a orientação do EXIF
+    altura: Mapped[int | None] = mapped_column(Integer)
 
     leituras_ocr: Mapped[list["LeituraOCR"]] = relationship(
         back_populates="anexo", cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        # autorização do GET /media/{sha256} e contagem de referências
+        Index("ix_anexos_midia_sha256", "sha256", "usuario_id"),
+    )
+
+
+# anexos_midia já existia sem as colunas do MediaStore; anexos antigos ficam com
+# sha256 NULL (só a url). Idempotente; em produção rode na migração.
+MEDIA_DDL = (
+    "ALTER TABLE anexos_midia ADD COLUMN IF NOT EXISTS sha256 varchar(64)",
+    "ALTER TABLE anexos_midia ADD COLUMN IF NOT EXISTS mime varchar(100)",
+    "ALTER TABLE anexos_midia ADD COLUMN IF NOT EXISTS tamanho_bytes bigint",
+    "ALTER TABLE anexos_midia ADD COLUMN IF NOT EXISTS largura integer",
+    "ALTER TABLE anexos_midia ADD COLUMN IF NOT EXISTS altura integer",
+    "CREATE INDEX IF NOT EXISTS ix_anexos_midia_sha256 ON anexos_midia (sha256, usuario_id)",
+)
+
 
 class LeituraOCR(Base):
     __tablename__ = "leituras_ocr"
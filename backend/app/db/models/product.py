@@ -1,9 +1,11 @@
 from __future__ import annotations
 import uuid
-from sqlalchemy import String, ForeignKey, UniqueConstraint
+from decimal import Decimal
+from sqlalchemy import String, Text, Numeric, ForeignKey, UniqueConstraint, event
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base import Base
+from app.core.text import normalize
 
 class Produto(Base):
     __tablename__ = "produtos"
@@ -12,6 +14,11 @@ class Produto(Base):
     nome: Mapped[str] = mapped_column(String(180))
     marca: Mapped[str | None] = mapped_column(String(120))
     categoria: Mapped[str | None] = mapped_column(String(120))
+    # conversão entre dimensões (app.core.units): ml -> g e un -> g
+    densidade_g_ml: Mapped[Decimal | None] = mapped_column(Numeric(8, 4))
+    peso_unidade_g: Mapped[Decimal | None] = mapped_column(Numeric(10, 3))
+    # nome + marca + categoria normalizados (sem acento), base da busca
+    busca: Mapped[str] = mapped_column(Text, default="", server_default="")
 
     codigos: Mapped[list["CodigoBarras"]] = relationship(
         back_populates="produto", cascade="all, delete-orphan"
@@ -20,12 +27,30 @@ class Produto(Base):
         back_populates="produto"
     )
 
+def busca_text(nome: str | None, marca: str | None, categoria: str | None) -> str:
+    return normalize(" ".join(filter(None, [nome, marca, categoria])))
+
+@event.listens_for(Produto, "before_insert")
+@event.listens_for(Produto, "before_update")
+def _fill_busca(_mapper, _connection, target: Produto):
+    target.busca = busca_text(target.nome, target.marca, target.categoria)
+
+# create_all não altera produtos já existente; o backfill (services.product_search)
+# preenche busca depois. Idempotente; em produção rode na migração.
+PRODUTO_DDL = (
+    "ALTER TABLE produtos ADD COLUMN IF NOT EXISTS densidade_g_ml numeric(8, 4)",
+    "ALTER TABLE produtos ADD COLUMN IF NOT EXISTS peso_unidade_g numeric(10, 3)",
+    "ALTER TABLE produtos ADD COLUMN IF NOT EXISTS busca text NOT NULL DEFAULT ''",
+    # lookup por código de barras (rotas de barcode e ingestão)
+    "CREATE INDEX IF NOT EXISTS ix_codigos_barras_valor ON codigos_barras (valor)",
+)
+
 class CodigoBarras(Base):
     __tablename__ = "codigos_barras"
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     produto_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("produtos.id", ondelete="CASCADE"), index=True)
-    valor: Mapped[str] = mapped_column(String(64))
+    valor: Mapped[str] = mapped_column(String(64), index=True)
     tipo: Mapped[str] = mapped_column(String(16), default="EAN13")
 
     produto: Mapped[Produto] = relationship(back_populates="codigos")
@@ -1,10 +1,10 @@
 from __future__ import annotations
 import uuid
-from datetime import date
+from datetime import date, datetime
 from decimal import Decimal
 
 from sqlalchemy import (
-    String, Text, Integer, Date, ForeignKey, Table, UniqueConstraint, Column
+    String, Text, Integer, Boolean, Date, DateTime, ForeignKey, Index, JSON, Table, UniqueConstraint, Column, text
 )
 from sqlalchemy.dialects.postgresql import UUID, NUMERIC
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -35,11 +35,14 @@ class Receita(Base):
     __tablename__ = "receitas"
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    usuario_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    # NULL: o autor excluiu a conta e a receita compartilhada segue com quem a usa
+    usuario_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("users.id", ondelete="SET NULL"), index=True)
     titulo: Mapped[str] = mapped_column(String(180))
     descricao: Mapped[str | None] = mapped_column(Text)
     rendimento_porcoes: Mapped[int] = mapped_column(Integer, default=1)
     tempo_preparo_min: Mapped[int] = mapped_column(Integer, default=0)
+    # visível para todos os usuários (ex.: receitas da casa)
+    compartilhada: Mapped[bool] = mapped_column(Boolean, default=False, server_default="false")
 
     ingredientes: Mapped[list["IngredienteReceita"]] = relationship(
         back_populates="receita", cascade="all, delete-orphan"
@@ -117,7 +120,62 @@ class ImportacaoReceita(Base):
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     receita_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("receitas.id", ondelete="CASCADE"), unique=True, index=True)
+    usuario_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
     fonte: Mapped[str | None] = mapped_column(String(120))
     url: Mapped[str | None] = mapped_column(String(512))
+    # chave de dedupe (services.recipe_import.normalize_url)
+    url_normalizada: Mapped[str | None] = mapped_column(String(512))
 
     receita: Mapped[Receita] = relationship(back_populates="importacao")
+
+    __table_args__ = (
+        # importar a mesma URL de novo é só um lookup
+        UniqueConstraint("usuario_id", "url_normalizada", name="uq_importacao_url"),
+    )
+
+
+# create_all não altera tabelas existentes; idempotente, em produção rode na migração
+RECIPE_DDL = (
+    "ALTER TABLE receitas ADD COLUMN IF NOT EXISTS compartilhada boolean NOT NULL DEFAULT false",
+    "ALTER TABLE importacoes_receita ADD COLUMN IF NOT EXISTS usuario_id uuid REFERENCES users (id) ON DELETE CASCADE",
+    "ALTER TABLE importacoes_receita ADD COLUMN IF NOT EXISTS url_normalizada varchar(512)",
+    # ADD CONSTRAINT não tem IF NOT EXISTS
+    """
+    DO $$ BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_constraint
+            WHERE conname = 'uq_importacao_url' AND conrelid = 'importacoes_receita'::regclass
+        ) THEN
+            ALTER TABLE importacoes_receita
+                ADD CONSTRAINT uq_importacao_url UNIQUE (usuario_id, url_normalizada);
+        END IF;
+    END $$
+    """,
+)
+
+
+# pedido de importação de uma coleção de URLs (processado pelo RecipeImportWorker)
+class ImportacaoLote(Base):
+    __tablename__ = "importacoes_lote"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    usuario_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    status: Mapped[str] = mapped_column(String(16), default="PENDENTE", server_default="PENDENTE")  # PENDENTE/PROCESSANDO/CONCLUIDA/ERRO
+    urls: Mapped[list] = mapped_column(JSON)
+    # um resultado por URL, na ordem pedida (status IMPORTADA/EXISTENTE/ERRO)
+    itens: Mapped[list | None] = mapped_column(JSON)
+    importadas: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    existentes: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    erros: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    solicitado_em: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    iniciado_em: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    concluido_em: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    erro: Mapped[str | None] = mapped_column(String(500))
+
+    __table_args__ = (
+        # fila do worker: só os que ainda não terminaram
+        Index(
+            "ix_importacoes_lote_fila", "solicitado_em",
+            postgresql_where=text("status IN ('PENDENTE', 'PROCESSANDO')"),
+        ),
+    )
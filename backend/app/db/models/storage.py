@@ -1,7 +1,7 @@
 from __future__ import annotations
 import uuid
 from decimal import Decimal
-from sqlalchemy import String, Text, Date, ForeignKey, Numeric, CheckConstraint
+from sqlalchemy import String, Text, Date, ForeignKey, Numeric, CheckConstraint, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base import Base
@@ -35,6 +35,11 @@ class ItemEstoque(Base):
         back_populates="item", cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        # "vencendo em breve": keyset por (validade, id) dentro do usuário
+        Index("ix_itens_estoque_usuario_validade", "usuario_id", "validade", "id"),
+    )
+
 class MovimentoEstoque(Base):
     __tablename__ = "movimentos_estoque"
 
@@ -53,3 +58,40 @@ class MovimentoEstoque(Base):
     __table_args__ = (
         CheckConstraint("quantidade > 0", name="ck_mov_qtd_pos"),
     )
+
+class SaldoEstoque(Base):
+    # saldo materializado por item e local, atualizado junto com cada movimento
+    __tablename__ = "saldos_estoque"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    item_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("itens_estoque.id", ondelete="CASCADE"), index=True)
+    local_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("locais_estoque.id", ondelete="CASCADE"), index=True)
+    quantidade: Mapped[Decimal] = mapped_column(Numeric(12, 3), default=0)
+
+    item: Mapped[ItemEstoque] = relationship()
+    local: Mapped[LocalEstoque] = relationship()
+
+    __table_args__ = (
+        UniqueConstraint("item_id", "local_id", name="uq_saldo_item_local"),
+        CheckConstraint("quantidade >= 0", name="ck_saldo_qtd_nao_neg"),
+    )
+
+
+# índices novos em tabelas que já existiam; em produção rode na migração
+STORAGE_DDL = (
+    "CREATE INDEX IF NOT EXISTS ix_itens_estoque_usuario_validade ON itens_estoque (usuario_id, validade, id)",
+)
+
+# Estoque anterior aos saldos: cada item ganha um saldo com a quantidade toda no
+# local cadastrado. Só para itens sem nenhum saldo, então pode rodar de novo sem
+# duplicar. Itens sem local ficam de fora (a primeira entrada cria o saldo).
+# Em produção rode uma vez na migração; com DB_CREATE_ALL roda na subida.
+SALDO_BACKFILL_SQL = """
+INSERT INTO saldos_estoque (id, item_id, local_id, quantidade)
+SELECT gen_random_uuid(), i.id, i.local_id, i.quantidade
+FROM itens_estoque i
+WHERE i.local_id IS NOT NULL
+  AND i.quantidade > 0
+  AND NOT EXISTS (SELECT 1 FROM saldos_estoque s WHERE s.item_id = i.id)
+ON CONFLICT DO NOTHING
+"""
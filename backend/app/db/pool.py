@@ -0,0 +1,59 @@
+from __future__ import annotations
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class _PoolMetrics:
+    # tempo de espera no checkout: só é > 0 quando o pool está esgotado
+    def _init_metrics(self):
+        self._metrics_lock = threading.Lock()
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            with self._metrics_lock:
+                self._timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._metrics_lock:
+                self._waits += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+
+    def metrics(self) -> dict:
+        capacity = self.size() + max(self._max_overflow, 0)
+        checked_out = self.checkedout()
+        with self._metrics_lock:
+            return {
+                "size": self.size(),
+                "max_overflow": self._max_overflow,
+                "checked_out": checked_out,
+                "idle": self.checkedin(),
+                "utilization": round(checked_out / capacity, 3) if capacity else 0.0,
+                "checkouts": self._waits,
+                "avg_wait_ms": round(self._wait_total / self._waits * 1000, 3) if self._waits else 0.0,
+                "max_wait_ms": round(self._wait_max * 1000, 3),
+                "timeouts": self._timeouts,
+            }
+
+
+class TimedQueuePool(_PoolMetrics, QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._init_metrics()
+
+
+class TimedAsyncQueuePool(_PoolMetrics, AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._init_metrics()
@@ -1,13 +1,48 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.db.pool import TimedAsyncQueuePool, TimedQueuePool
 
-engine = create_engine(str(settings.DATABASE_URL), pool_pre_ping=True)
+_pool_args = dict(
+    pool_pre_ping=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT_S,
+    pool_recycle=settings.DB_POOL_RECYCLE_S,
+)
+
+def _async_url(url: str) -> str:
+    # mesmo DATABASE_URL, trocando o driver pelo asyncpg
+    scheme, rest = url.split("://", 1)
+    return f"postgresql+asyncpg://{rest}" if scheme.startswith("postgres") else url
+
+engine = create_engine(
+    str(settings.DATABASE_URL),
+    poolclass=TimedQueuePool,
+    connect_args={"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"},
+    **_pool_args,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(
+    _async_url(str(settings.DATABASE_URL)),
+    poolclass=TimedAsyncQueuePool,
+    connect_args={"server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}},
+    **_pool_args,
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def pool_stats() -> dict:
+    return {"sync": engine.pool.metrics(), "async": async_engine.pool.metrics()}
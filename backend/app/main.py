@@ -1,5 +1,9 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import text
 
 from app.core.config import settings
 
@@ -7,16 +11,81 @@ from app.core.config import settings
 from app.api.routes.auth import router as auth_router
 from app.api.routes.settings import router as settings_router
 from app.api.routes.profile import router as profile_router
-from app.api.routes.transcribe import router as transcribe_router
+from app.api.routes.stock import router as stock_router
+from app.api.routes.products import router as products_router
+from app.api.routes.recipes import router as recipes_router
+from app.api.routes.shopping import router as shopping_router
+from app.api.routes.lgpd import router as lgpd_router
+from app.api.routes.media import router as media_router
+from app.api.routes.transcribe import router as transcribe_router, tiers as whisper_tiers
 # from app.api.routes.devices import router as devices_router
 
-# ⚠️ Recomendado usar Alembic. Se você quiser criar tabelas sem migração,
-# descomente as 3 linhas abaixo (apenas em dev):
 from app.db.base import Base
-from app.db.session import engine
-Base.metadata.create_all(bind=engine)
+from app.db.models.lgpd import CONSENT_DDL, EXPORT_DDL
+from app.db.models.product import PRODUTO_DDL
+from app.db.models.recipe import RECIPE_DDL
+from app.db.models.media import MEDIA_DDL
+from app.db.models.market import LATEST_PRICE_BACKFILL, LATEST_PRICE_DDL, MARKET_DDL
+from app.db.models.storage import SALDO_BACKFILL_SQL, STORAGE_DDL
+from app.db.session import engine, async_engine, SessionLocal, pool_stats
+from app.services.credentials import credentials
+from app.services.exports import export_worker
+from app.services.account_deletion import ACCOUNT_DELETION_DDL, deletion_worker
+from app.services.product_search import backfill_busca, ensure_trigram_index, hot_index as product_index
+from app.services.recipe_import import recipe_import_worker
+
+
+def _upgrade_schema():
+    # create_all não altera tabelas existentes; estes comandos são idempotentes
+    with engine.begin() as conn:
+        for ddl in RECIPE_DDL:
+            conn.execute(text(ddl))
+        for ddl in MEDIA_DDL:
+            conn.execute(text(ddl))
+        for ddl in ACCOUNT_DELETION_DDL:
+            conn.execute(text(ddl))
+        for ddl in CONSENT_DDL + EXPORT_DDL:
+            conn.execute(text(ddl))
+        for ddl in STORAGE_DDL:
+            conn.execute(text(ddl))
+        conn.execute(text(SALDO_BACKFILL_SQL))
+        # triggers antes do backfill: preço gravado depois já entra pelo trigger
+        for ddl in LATEST_PRICE_DDL + MARKET_DDL:
+            conn.execute(text(ddl))
+        conn.execute(text(LATEST_PRICE_BACKFILL))
+        for ddl in PRODUTO_DDL:
+            conn.execute(text(ddl))
+        backfill_busca(conn)
+        # sem pg_trgm no servidor a busca usa o índice em memória + LIKE
+        ensure_trigram_index(conn)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # ⚠️ Recomendado usar Alembic. create_all só roda com DB_CREATE_ALL=true (dev).
+    if settings.DB_CREATE_ALL:
+        await run_in_threadpool(Base.metadata.create_all, bind=engine)
+        await run_in_threadpool(_upgrade_schema)
+    # o modelo carrega em background: rotas que não usam voz já respondem
+    whisper_tiers.start()
+    product_index.start(SessionLocal, settings.PRODUCT_SEARCH_REFRESH_S)
+    if settings.EXPORT_WORKER:
+        export_worker.start(SessionLocal)
+    if settings.DELETION_WORKER:
+        deletion_worker.start(SessionLocal)
+    if settings.RECIPE_IMPORT_WORKER:
+        recipe_import_worker.start(SessionLocal)
+    yield
+    whisper_tiers.shutdown()
+    product_index.shutdown()
+    export_worker.shutdown()
+    deletion_worker.shutdown()
+    recipe_import_worker.shutdown()
+    credentials.shutdown()
+    await async_engine.dispose()
 
-app = FastAPI(title="Backend FastAPI", version="0.1.0")
+
+app = FastAPI(title="Backend FastAPI", version="0.1.0", lifespan=lifespan)
 
 # CORS
 origins = (
@@ -32,13 +101,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Healthcheck
+# Healthcheck (liveness)
 @app.get("/", tags=["health"])
 def health():
     return {"ok": True}
 
+def _db_ready() -> bool:
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        return False
+
+# Readiness: modelo de voz e banco
+@app.get("/ready", tags=["health"])
+def ready(response: Response):
+    checks = {"model": whisper_tiers.ready, "db": _db_ready()}
+    if not all(checks.values()):
+        response.status_code = 503
+    return {"ready": all(checks.values()), **checks, "model_error": whisper_tiers.load_error}
+
+# Pools de conexão: uso e espera no checkout
+@app.get("/db/stats", tags=["health"])
+def db_stats():
+    return pool_stats()
+
 app.include_router(auth_router)
 app.include_router(profile_router)
+app.include_router(stock_router)
+app.include_router(products_router)
+app.include_router(recipes_router)
+app.include_router(shopping_router)
+app.include_router(lgpd_router)
+app.include_router(media_router)
 app.include_router(transcribe_router)
 app.include_router(settings_router, tags=["settings"])
 # app.include_router(devices_router, tags=["devices"])
@@ -7,8 +7,13 @@ class LoginInput(BaseModel):
 
 class Token(BaseModel):
     access_token: str
+    refresh_token: str | None = None
     token_type: str = "bearer"
 
+class RefreshInput(BaseModel):
+    refresh_token: str
+    model_config = {"extra": "forbid"}
+
 class ProfileInput(BaseModel):
     preferencias: list[str]
     alergias: list[str]
@@ -0,0 +1,23 @@
+from __future__ import annotations
+import uuid
+from datetime import datetime
+from pydantic import BaseModel
+
+class ExportacaoRead(BaseModel):
+    id: uuid.UUID
+    formato: str
+    status: str
+    solicitado_em: datetime
+    concluido_em: datetime | None = None
+    url_resultado: str | None = None
+    erro: str | None = None
+    model_config = {"from_attributes": True}
+
+class ExclusaoRead(BaseModel):
+    id: uuid.UUID
+    status: str
+    solicitado_em: datetime
+    iniciado_em: datetime | None = None
+    linhas_removidas: int = 0
+    efetivado_em: datetime | None = None
+    model_config = {"from_attributes": True}
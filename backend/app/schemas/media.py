@@ -0,0 +1,16 @@
+from __future__ import annotations
+import uuid
+from pydantic import BaseModel
+
+class AnexoRead(BaseModel):
+    id: uuid.UUID
+    url: str
+    tipo: str | None = None
+    item_estoque_id: uuid.UUID | None = None
+    sha256: str
+    mime: str
+    tamanho_bytes: int
+    largura: int | None = None
+    altura: int | None = None
+    duplicado: bool = False  # conteúdo já existia no servidor
+    model_config = {"from_attributes": True}
@@ -0,0 +1,25 @@
+from __future__ import annotations
+import uuid
+from pydantic import BaseModel, Field
+
+class ProdutoCodigoRead(BaseModel):
+    id: uuid.UUID
+    nome: str
+    marca: str | None = None
+    categoria: str | None = None
+    codigo: str
+    tipo: str
+
+class CodigosBatchIn(BaseModel):
+    valores: list[str] = Field(min_length=1, max_length=200)
+    model_config = {"extra": "forbid"}
+
+class CodigosBatchOut(BaseModel):
+    encontrados: dict[str, ProdutoCodigoRead]
+    desconhecidos: list[str]
+
+class ProdutoBuscaRead(BaseModel):
+    id: uuid.UUID
+    nome: str
+    marca: str | None = None
+    categoria: str | None = None
@@ -0,0 +1,42 @@
+from __future__ import annotations
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from pydantic import BaseModel, Field
+
+class IngredienteFaltando(BaseModel):
+    produto_id: uuid.UUID
+    nome: str
+    quantidade: Decimal | None = None
+    unidade: str | None = None
+    falta: float | None = None  # em g/ml/un; None quando não dá pra medir
+
+class ReceitaMatchRead(BaseModel):
+    id: uuid.UUID
+    titulo: str
+    cobertura: float  # 0..1
+    ingredientes: int
+    faltando: list[IngredienteFaltando]
+
+class ImportarReceitas(BaseModel):
+    urls: list[str] = Field(min_length=1)
+
+class ImportacaoItemRead(BaseModel):
+    url: str
+    status: str  # IMPORTADA, EXISTENTE, ERRO
+    receita_id: uuid.UUID | None = None
+    titulo: str | None = None
+    erro: str | None = None
+
+class ImportacaoLoteRead(BaseModel):
+    id: uuid.UUID
+    status: str  # PENDENTE, PROCESSANDO, CONCLUIDA, ERRO
+    solicitado_em: datetime
+    iniciado_em: datetime | None = None
+    concluido_em: datetime | None = None
+    importadas: int = 0
+    existentes: int = 0
+    erros: int = 0
+    itens: list[ImportacaoItemRead] | None = None
+    erro: str | None = None
+    model_config = {"from_attributes": True}
@@ -0,0 +1,45 @@
+from __future__ import annotations
+import uuid
+from decimal import Decimal
+from pydantic import BaseModel, Field
+
+class ListaFromCardapioIn(BaseModel):
+    porcoes: int | None = Field(default=None, ge=1, description="Pessoas por refeição; padrão: rendimento da receita")
+    nome: str | None = Field(default=None, max_length=120)
+    model_config = {"extra": "forbid"}
+
+class ItemListaRead(BaseModel):
+    id: uuid.UUID
+    produto_id: uuid.UUID | None = None
+    nome_livre: str | None = None
+    quantidade: Decimal | None = None
+    unidade: str | None = None
+    feito: bool = False
+    preco_estimado: Decimal | None = None
+
+class ListaComprasRead(BaseModel):
+    id: uuid.UUID
+    nome: str
+    status: str
+    itens: list[ItemListaRead]
+
+class MercadoCustoRead(BaseModel):
+    mercado_id: uuid.UUID
+    nome: str
+    total: Decimal
+    itens_cobertos: int
+    itens_sem_preco: int
+
+class ItemCustoRead(BaseModel):
+    item_id: uuid.UUID
+    produto_id: uuid.UUID | None = None
+    mercado_id: uuid.UUID | None = None
+    preco_estimado: Decimal | None = None
+    melhor_mercado_id: uuid.UUID | None = None
+    melhor_preco: Decimal | None = None
+
+class ListaCustoRead(BaseModel):
+    lista_id: uuid.UUID
+    mais_barato: MercadoCustoRead | None = None
+    mercados: list[MercadoCustoRead]
+    itens: list[ItemCustoRead]
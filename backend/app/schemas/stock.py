@@ -0,0 +1,76 @@
+from __future__ import annotations
+import uuid
+from datetime import date
+from decimal import Decimal
+from pydantic import BaseModel, Field
+
+class LocalCreate(BaseModel):
+    nome: str = Field(min_length=1, max_length=120)
+    descricao: str | None = Field(default=None, max_length=240)
+
+class LocalRead(BaseModel):
+    id: uuid.UUID
+    nome: str
+    descricao: str | None = None
+
+class EntradaIn(BaseModel):
+    # item existente (item_id) ou novo item do produto (produto_id)
+    item_id: uuid.UUID | None = None
+    produto_id: uuid.UUID | None = None
+    local_id: uuid.UUID | None = None
+    quantidade: Decimal = Field(gt=0)
+    unidade: str | None = Field(default=None, max_length=8)
+    validade: date | None = None
+    motivo: str | None = Field(default=None, max_length=180)
+    model_config = {"extra": "forbid"}
+
+class SaidaIn(BaseModel):
+    item_id: uuid.UUID
+    local_id: uuid.UUID | None = None
+    quantidade: Decimal = Field(gt=0)
+    motivo: str | None = Field(default=None, max_length=180)
+    model_config = {"extra": "forbid"}
+
+class TransferenciaIn(BaseModel):
+    item_id: uuid.UUID
+    de_local_id: uuid.UUID
+    para_local_id: uuid.UUID
+    quantidade: Decimal = Field(gt=0)
+    motivo: str | None = Field(default=None, max_length=180)
+    model_config = {"extra": "forbid"}
+
+class MovimentoRead(BaseModel):
+    id: uuid.UUID
+    item_id: uuid.UUID
+    tipo: str
+    quantidade: Decimal
+    de_local_id: uuid.UUID | None = None
+    para_local_id: uuid.UUID | None = None
+    saldo_de: Decimal | None = None
+    saldo_para: Decimal | None = None
+    total_item: Decimal
+
+class SaldoRead(BaseModel):
+    item_id: uuid.UUID
+    produto_id: uuid.UUID
+    produto: str
+    local_id: uuid.UUID
+    local: str
+    quantidade: Decimal
+    unidade: str
+    validade: date | None = None
+
+class ItemValidadeRead(BaseModel):
+    id: uuid.UUID
+    produto_id: uuid.UUID
+    produto: str
+    local_id: uuid.UUID | None = None
+    local: str | None = None
+    quantidade: Decimal
+    unidade: str
+    validade: date
+    dias_restantes: int
+
+class ItemValidadePage(BaseModel):
+    items: list[ItemValidadeRead]
+    next_cursor: str | None = None
@@ -0,0 +1,252 @@
+from __future__ import annotations
+import json
+import os
+import shutil
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from sqlalchemy import Table, UniqueConstraint, delete, or_, select, text, tuple_, update
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+from app.core.principal_cache import principal_cache
+from app.db.models.lgpd import ExclusaoConta
+from app.db.models.media import AnexoMidia
+from app.db.models.recipe import Cardapio, Playlist, Receita, Refeicao, playlist_receita, refeicao_receita
+from app.db.models.user import User
+from app.services.jobs import JobWorker
+from app.services.media import MediaStore, media_store, referenced
+from app.services.user_data import OWNED_TABLES, owned_filter
+
+# users sai por último, num comando à parte; o pedido de exclusão fica como registro
+_KEEP = frozenset({"users", "exclusoes_conta"})
+_LOCK_NOT_AVAILABLE = "55P03"
+
+# bancos criados antes desta rotina; em produção rode na migração. Receitas e o
+# próprio pedido perdem o autor (SET NULL) em vez de sumir junto com o usuário.
+ACCOUNT_DELETION_DDL = (
+    "ALTER TABLE receitas ALTER COLUMN usuario_id DROP NOT NULL",
+    "ALTER TABLE receitas DROP CONSTRAINT IF EXISTS receitas_usuario_id_fkey",
+    "ALTER TABLE receitas ADD CONSTRAINT receitas_usuario_id_fkey"
+    " FOREIGN KEY (usuario_id) REFERENCES users (id) ON DELETE SET NULL",
+    "ALTER TABLE exclusoes_conta ALTER COLUMN usuario_id DROP NOT NULL",
+    "ALTER TABLE exclusoes_conta DROP CONSTRAINT IF EXISTS exclusoes_conta_usuario_id_fkey",
+    "ALTER TABLE exclusoes_conta ADD CONSTRAINT exclusoes_conta_usuario_id_fkey"
+    " FOREIGN KEY (usuario_id) REFERENCES users (id) ON DELETE SET NULL",
+    "ALTER TABLE exclusoes_conta ADD COLUMN IF NOT EXISTS iniciado_em timestamptz",
+    "ALTER TABLE exclusoes_conta ADD COLUMN IF NOT EXISTS linhas_removidas bigint NOT NULL DEFAULT 0",
+    "CREATE INDEX IF NOT EXISTS ix_exclusoes_pendentes ON exclusoes_conta (solicitado_em) WHERE status = 'PENDENTE'",
+)
+
+
+def deletion_plan() -> list[tuple[Table, tuple[Table, ...]]]:
+    # filhos antes dos pais: nenhum DELETE depende de cascade
+    return [(table, via) for table, via in reversed(OWNED_TABLES) if table.name not in _KEEP]
+
+
+def _key_columns(table: Table) -> list:
+    keys = list(table.primary_key.columns)
+    if keys:
+        return keys
+    # tabelas de associação: o par único
+    return list(next(c for c in table.constraints if isinstance(c, UniqueConstraint)).columns)
+
+
+def delete_batch_stmt(table: Table, via: tuple[Table, ...], user_id: uuid.UUID, limit: int):
+    """DELETE de no máximo `limit` linhas do usuário: lock curto, WAL pequeno."""
+    keys = _key_columns(table)
+    picked = select(*keys).where(owned_filter(table, via, user_id)).limit(limit)
+    target = keys[0] if len(keys) == 1 else tuple_(*keys)
+    return delete(table).where(target.in_(picked))
+
+
+def release_shared_recipes_stmt(user_id: uuid.UUID):
+    """Tira o autor das receitas compartilhadas que outro usuário usa.
+
+    Apagar a receita levaria junto (FK em cascata) as refeições e playlists de
+    quem a adicionou; sem autor ela deixa de ser dado do usuário e sai do plano
+    de exclusão. Os vínculos do próprio usuário continuam sendo apagados.
+    """
+    planned = (
+        select(refeicao_receita.c.receita_id)
+        .join(Refeicao, Refeicao.id == refeicao_receita.c.refeicao_id)
+        .join(Cardapio, Cardapio.id == Refeicao.cardapio_id)
+        .where(Cardapio.usuario_id != user_id)
+    )
+    listed = (
+        select(playlist_receita.c.receita_id)
+        .join(Playlist, Playlist.id == playlist_receita.c.playlist_id)
+        .where(Playlist.usuario_id != user_id)
+    )
+    return (
+        update(Receita)
+        .where(
+            Receita.usuario_id == user_id,
+            Receita.compartilhada.is_(True),
+            or_(Receita.id.in_(planned), Receita.id.in_(listed)),
+        )
+        .values(usuario_id=None)
+    )
+
+
+class DeletionWorker(JobWorker):
+    """Executa os pedidos de ExclusaoConta em lotes, um commit por lote.
+
+    Retomável: o progresso é o que já foi apagado, então um worker que cai no
+    meio só deixa o lease (iniciado_em) expirar e o próximo continua de onde
+    parou. Cada lote tem lock_timeout curto; se esbarrar em linha travada por
+    outro usuário, desiste, espera e tenta de novo em vez de enfileirar writes.
+    """
+
+    name = "lgpd-deletions"
+
+    def __init__(
+        self,
+        poll_s: float = 60,
+        batch_rows: int = 500,
+        pause_s: float = 0.05,
+        lock_timeout_ms: int = 2000,
+        stale_s: float = 300,
+        grace_s: float = 0,
+        export_dir: str | None = None,
+        media: MediaStore | None = None,
+    ):
+        super().__init__(poll_s)
+        self.batch_rows = max(1, batch_rows)
+        self.pause_s = pause_s
+        self.lock_timeout_ms = lock_timeout_ms
+        self.stale_s = stale_s
+        self.grace_s = grace_s
+        self.export_dir = export_dir
+        self.media = media
+        self.rows_deleted = 0
+        self.lock_retries = 0
+
+    def claim(self, db) -> tuple[uuid.UUID, uuid.UUID | None] | None:
+        now = datetime.now(timezone.utc)
+        next_id = (
+            select(ExclusaoConta.id)
+            .where(
+                ExclusaoConta.status == "PENDENTE",
+                ExclusaoConta.solicitado_em <= now - timedelta(seconds=self.grace_s),
+                or_(
+                    ExclusaoConta.iniciado_em.is_(None),
+                    ExclusaoConta.iniciado_em < now - timedelta(seconds=self.stale_s),
+                ),
+            )
+            .order_by(ExclusaoConta.solicitado_em)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        row = db.execute(
+            update(ExclusaoConta)
+            .where(ExclusaoConta.id == next_id)
+            .values(iniciado_em=now)
+            .returning(ExclusaoConta.id, ExclusaoConta.usuario_id)
+        ).first()
+        db.commit()
+        return tuple(row) if row else None
+
+    def _delete_batch(self, db, job_id: uuid.UUID, table: Table, via: tuple[Table, ...], user_id: uuid.UUID) -> int:
+        db.execute(text(f"SET LOCAL lock_timeout = {int(self.lock_timeout_ms)}"))
+        n = db.execute(delete_batch_stmt(table, via, user_id, self.batch_rows)).rowcount
+        # progresso e lease na mesma transação do lote
+        db.execute(
+            update(ExclusaoConta)
+            .where(ExclusaoConta.id == job_id)
+            .values(iniciado_em=datetime.now(timezone.utc), linhas_removidas=ExclusaoConta.linhas_removidas + n)
+        )
+        db.commit()
+        self.rows_deleted += n
+        return n
+
+    def run_once(self, session_factory: Callable) -> bool:
+        """Processa um pedido; False se a fila estava vazia."""
+        with session_factory() as db:
+            job = self.claim(db)
+            if job is None:
+                return False
+            job_id, user_id = job
+            email = None
+            digests: set[str] = set()
+            if user_id is not None:
+                # sem login nem refresh a partir daqui
+                email = db.execute(
+                    update(User).where(User.id == user_id).values(fl_ativo=False).returning(User.email)
+                ).scalar()
+                # antes dos lotes: o que outro usuário usa não entra no plano
+                db.execute(release_shared_recipes_stmt(user_id))
+                db.commit()
+                if email is not None:
+                    principal_cache.invalidate(email)
+                if self.media is not None:
+                    # fotos e notas fiscais: os arquivos saem depois das linhas
+                    digests = set(db.execute(
+                        select(AnexoMidia.sha256).where(AnexoMidia.usuario_id == user_id, AnexoMidia.sha256.is_not(None))
+                    ).scalars())
+                for table, via in deletion_plan():
+                    while True:
+                        if self.stopping:
+                            return True  # o lease expira e o próximo worker continua
+                        try:
+                            n = self._delete_batch(db, job_id, table, via, user_id)
+                        except OperationalError as e:
+                            db.rollback()
+                            if getattr(e.orig, "pgcode", None) != _LOCK_NOT_AVAILABLE:
+                                self.failed += 1
+                                self.last_error = str(e)
+                                raise
+                            self.lock_retries += 1
+                            self.pause(max(1.0, self.pause_s))
+                            continue
+                        if n < self.batch_rows:
+                            break
+                        self.pause(self.pause_s)
+                db.execute(delete(User).where(User.id == user_id))
+            db.execute(
+                update(ExclusaoConta)
+                .where(ExclusaoConta.id == job_id)
+                .values(status="EFETIVADA", efetivado_em=datetime.now(timezone.utc))
+            )
+            db.commit()
+            if digests:
+                # conteúdo que outro usuário também anexou continua no disco
+                self.media.discard(digests, referenced(db, digests))
+        if email is not None:
+            principal_cache.invalidate(email)
+        if self.export_dir and user_id is not None:
+            # arquivos de exportação também são dados do usuário
+            shutil.rmtree(os.path.join(self.export_dir, str(user_id)), ignore_errors=True)
+        self.done += 1
+        return True
+
+    def stats(self) -> dict:
+        return {**super().stats(), "rows_deleted": self.rows_deleted, "lock_retries": self.lock_retries}
+
+
+deletion_worker = DeletionWorker(
+    poll_s=settings.DELETION_POLL_S,
+    batch_rows=settings.DELETION_BATCH_ROWS,
+    pause_s=settings.DELETION_PAUSE_S,
+    lock_timeout_ms=settings.DELETION_LOCK_TIMEOUT_MS,
+    stale_s=settings.DELETION_STALE_S,
+    grace_s=settings.DELETION_GRACE_S,
+    export_dir=settings.EXPORT_DIR,
+    media=media_store,
+)
+
+
+def main() -> int:
+    # worker dedicado: python -m app.services.account_deletion (com DELETION_WORKER=false na API)
+    from app.db.session import SessionLocal
+
+    deletion_worker.run_forever(SessionLocal)
+    print(json.dumps(deletion_worker.stats()), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
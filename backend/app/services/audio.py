@@ -0,0 +1,64 @@
+from __future__ import annotations
+from typing import BinaryIO
+
+import av
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+class AudioRejected(ValueError):
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def upload_size(file: BinaryIO) -> int:
+    pos = file.tell()
+    file.seek(0, 2)
+    size = file.tell()
+    file.seek(pos)
+    return size
+
+
+def decode_audio(
+    source: BinaryIO,
+    sample_rate: int = SAMPLE_RATE,
+    max_bytes: int | None = None,
+    max_duration_s: float | None = None,
+) -> np.ndarray:
+    # Decodifica direto do arquivo em memória/spooled (sem tocar no disco),
+    # reamostrando frame a frame para mono 16 kHz.
+    if max_bytes is not None and upload_size(source) > max_bytes:
+        raise AudioRejected(f"Arquivo de áudio maior que {max_bytes // (1024 * 1024)} MB.", 413)
+    source.seek(0)
+
+    max_samples = int(max_duration_s * sample_rate) if max_duration_s else None
+    too_long = AudioRejected(f"Áudio mais longo que {max_duration_s:g} s.", 413) if max_duration_s else None
+    chunks = []
+    total = 0
+    try:
+        with av.open(source, mode="r", metadata_errors="ignore") as container:
+            if not container.streams.audio:
+                raise AudioRejected("Nenhuma faixa de áudio encontrada.")
+            # duração declarada no container: rejeita antes de decodificar
+            if max_duration_s and container.duration and container.duration / av.time_base > max_duration_s:
+                raise too_long
+            resampler = av.AudioResampler(format="s16", layout="mono", rate=sample_rate)
+            frames = container.decode(audio=0)
+            for frame in frames:
+                for out in resampler.resample(frame):
+                    chunk = out.to_ndarray().reshape(-1)
+                    total += len(chunk)
+                    if max_samples and total > max_samples:
+                        raise too_long
+                    chunks.append(chunk)
+            for out in resampler.resample(None):
+                chunks.append(out.to_ndarray().reshape(-1))
+    except av.error.FFmpegError:
+        raise AudioRejected("Não foi possível decodificar o áudio.")
+
+    if not chunks:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(chunks).astype(np.float32) / 32768.0
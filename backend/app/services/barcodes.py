@@ -0,0 +1,127 @@
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, inspect
+
+from app.core.config import settings
+from app.db.models.product import Produto, CodigoBarras
+
+MISSING = object()
+
+
+class BarcodeCache:
+    """LRU código de barras -> produto (dict), com cache negativo.
+
+    Códigos desconhecidos ficam guardados por `negative_ttl_s`, para que
+    leituras repetidas do mesmo código não voltem ao banco. Alterações em
+    CodigoBarras/Produto feitas por este processo invalidam na hora; as de
+    outros processos expiram pelo TTL.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_s: int = 3600, negative_ttl_s: int = 60):
+        self.max_entries = max(0, max_entries)
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = negative_ttl_s
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[object, float]] = OrderedDict()
+        self._codes_by_product: dict[str, set[str]] = {}
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def get(self, valor: str):
+        """Produto (dict), None se sabidamente desconhecido, ou MISSING."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(valor)
+            if entry is not None and entry[1] <= now:
+                self._drop(valor)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(valor)
+            if entry[0] is None:
+                self.negative_hits += 1
+                return None
+            self.hits += 1
+            return dict(entry[0])
+
+    def put(self, valor: str, product: dict | None):
+        if not self.max_entries:
+            return
+        ttl = self.ttl_s if product is not None else self.negative_ttl_s
+        with self._lock:
+            self._drop(valor)
+            self._entries[valor] = (product, time.time() + ttl)
+            if product is not None:
+                self._codes_by_product.setdefault(str(product["id"]), set()).add(valor)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, valor: str):
+        entry = self._entries.pop(valor, None)
+        if entry is None or entry[0] is None:
+            return
+        product_id = str(entry[0]["id"])
+        codes = self._codes_by_product.get(product_id)
+        if codes is not None:
+            codes.discard(valor)
+            if not codes:
+                del self._codes_by_product[product_id]
+
+    def invalidate(self, valor: str):
+        with self._lock:
+            self._drop(valor)
+
+    def invalidate_product(self, product_id):
+        with self._lock:
+            for valor in list(self._codes_by_product.get(str(product_id), ())):
+                self._drop(valor)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._codes_by_product.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+            }
+
+
+barcode_cache = BarcodeCache(settings.BARCODE_CACHE_SIZE, settings.BARCODE_CACHE_TTL_S, settings.BARCODE_NEGATIVE_TTL_S)
+
+
+def product_payload(produto: Produto, codigo: CodigoBarras) -> dict:
+    return {
+        "id": produto.id,
+        "nome": produto.nome,
+        "marca": produto.marca,
+        "categoria": produto.categoria,
+        "codigo": codigo.valor,
+        "tipo": codigo.tipo,
+    }
+
+
+@event.listens_for(CodigoBarras, "after_insert")
+@event.listens_for(CodigoBarras, "after_update")
+@event.listens_for(CodigoBarras, "after_delete")
+def _invalidate_code(_mapper, _connection, target: CodigoBarras):
+    # inclui o insert: derruba o cache negativo de um código recém-cadastrado
+    barcode_cache.invalidate(target.valor)
+    for old_valor in inspect(target).attrs.valor.history.deleted:
+        barcode_cache.invalidate(old_valor)
+
+
+@event.listens_for(Produto, "after_update")
+@event.listens_for(Produto, "after_delete")
+def _invalidate_product(_mapper, _connection, target: Produto):
+    barcode_cache.invalidate_product(target.id)
@@ -0,0 +1,124 @@
+from __future__ import annotations
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+from app.core.config import settings
+from app.core.security import hash_password, verify_and_update_password
+
+
+class CredentialsBusy(Exception):
+    def __init__(self, retry_after: int = 1):
+        super().__init__("Serviço de credenciais ocupado")
+        self.retry_after = retry_after
+
+
+class CredentialService:
+    """Roda o pbkdf2 (hash/verify) num pool dedicado, com limite de concorrência.
+
+    As rotas de auth aguardam o pool sem ocupar threads da API; o semáforo
+    limita quantas operações ficam em andamento ou na fila, e quem não consegue
+    vaga em `wait_s` recebe CredentialsBusy (503).
+    """
+
+    def __init__(self, workers: int = 2, max_concurrency: int = 8, mode: str = "process", wait_s: float = 2.0):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Executor de credenciais inválido: {mode}")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.max_concurrency = max(1, max_concurrency)
+        self.wait_s = wait_s
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._executor: Executor | None = None
+        self._timings: dict[str, dict[str, float]] = {}
+        self._rejected = 0
+
+    def _pool(self) -> Executor:
+        # criado no primeiro uso, para não subir processos só por importar o módulo
+        with self._lock:
+            if self._executor is None:
+                if self.mode == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="credentials")
+            return self._executor
+
+    async def _run(self, op: str, fn: Callable, *args) -> Any:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.wait_s)
+        except TimeoutError:
+            with self._lock:
+                self._rejected += 1
+            raise CredentialsBusy()
+        loop = asyncio.get_running_loop()
+        queued = time.perf_counter()
+        try:
+            job = self._pool().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # a vaga só volta quando o pbkdf2 termina de fato: se o request for
+        # cancelado, o job continua ocupando o pool
+        job.add_done_callback(lambda _: self._release(loop))
+        result = await asyncio.wrap_future(job)
+        self._record(op, queued - started, time.perf_counter() - queued)
+        return result
+
+    def _release(self, loop: asyncio.AbstractEventLoop):
+        # chamado na thread do pool; o semáforo é do event loop
+        try:
+            loop.call_soon_threadsafe(self._slots.release)
+        except RuntimeError:
+            pass  # loop já fechado (shutdown)
+
+    def _record(self, op: str, wait: float, run: float):
+        with self._lock:
+            t = self._timings.setdefault(op, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "wait_ms": 0.0})
+            t["count"] += 1
+            t["total_ms"] += run * 1000
+            t["max_ms"] = max(t["max_ms"], run * 1000)
+            t["wait_ms"] += wait * 1000
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", hash_password, password)
+
+    async def verify(self, password: str, hashed: str) -> tuple[bool, str | None]:
+        # (senha ok, hash novo se os parâmetros do CryptContext mudaram)
+        return await self._run("verify", verify_and_update_password, password, hashed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            ops = {
+                op: {
+                    "count": int(t["count"]),
+                    "avg_ms": round(t["total_ms"] / t["count"], 2),
+                    "max_ms": round(t["max_ms"], 2),
+                    "avg_wait_ms": round(t["wait_ms"] / t["count"], 2),
+                }
+                for op, t in self._timings.items()
+            }
+            return {
+                "mode": self.mode,
+                "workers": self.workers,
+                "max_concurrency": self.max_concurrency,
+                "rejected": self._rejected,
+                "operations": ops,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+credentials = CredentialService(
+    workers=settings.CREDENTIAL_WORKERS,
+    max_concurrency=settings.CREDENTIAL_MAX_CONCURRENCY,
+    mode=settings.CREDENTIAL_EXECUTOR,
+    wait_s=settings.CREDENTIAL_WAIT_S,
+)
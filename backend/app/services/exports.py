@@ -0,0 +1,192 @@
+from __future__ import annotations
+import json
+import os
+import sys
+import tempfile
+import uuid
+import zipfile
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from sqlalchemy import and_, or_, select, update
+
+from app.core.config import settings
+from app.db.models.lgpd import ExportacaoDados
+from app.services.jobs import JobWorker
+from app.services.user_data import OWNED_TABLES, owned_rows_stmt
+
+# nada de credenciais no arquivo exportado
+EXCLUDED_TABLES = frozenset({"refresh_tokens"})
+EXCLUDED_COLUMNS = frozenset({"senha_hash"})
+
+
+class LeaseLost(Exception):
+    """Outro worker reassumiu o pedido (o lease venceu)."""
+
+
+def export_path(directory: str, usuario_id: uuid.UUID, export_id: uuid.UUID) -> str:
+    return os.path.join(directory, str(usuario_id), f"{export_id}.zip")
+
+
+def download_url(export_id: uuid.UUID) -> str:
+    return f"/me/exports/{export_id}/download"
+
+
+def write_export(
+    conn, usuario_id: uuid.UUID, path: str, batch_rows: int = 1000, on_table: Callable[[str], None] | None = None,
+) -> dict[str, int]:
+    """Grava um .zip com um NDJSON por tabela e devolve as linhas por tabela.
+
+    Cada tabela é lida por cursor no servidor (yield_per) e escrita direto no
+    membro comprimido do zip: a memória não cresce com o tamanho da conta.
+    `on_table` roda depois de cada tabela (o worker renova o lease ali); uma
+    exceção dele aborta a exportação.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # nome temporário único: dois workers no mesmo pedido não escrevem no mesmo arquivo
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    counts: dict[str, int] = {}
+    try:
+        with os.fdopen(fd, "wb") as f, zipfile.ZipFile(f, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for table, via in OWNED_TABLES:
+                if table.name in EXCLUDED_TABLES:
+                    continue
+                stmt = owned_rows_stmt(table, via, usuario_id, EXCLUDED_COLUMNS)
+                result = conn.execution_options(yield_per=batch_rows).execute(stmt)
+                n = 0
+                with zf.open(f"{table.name}.ndjson", "w") as member:
+                    for row in result:
+                        line = json.dumps(dict(row._mapping), default=str, ensure_ascii=False)
+                        member.write(line.encode() + b"\n")
+                        n += 1
+                counts[table.name] = n
+                if on_table is not None:
+                    on_table(table.name)
+            zf.writestr("manifesto.json", json.dumps({
+                "usuario_id": str(usuario_id),
+                "gerado_em": datetime.now(timezone.utc).isoformat(),
+                "tabelas": counts,
+            }, ensure_ascii=False))
+        # só aparece com o nome final quando está completo
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return counts
+
+
+class ExportWorker(JobWorker):
+    """Processa a fila de ExportacaoDados em uma thread (ou num processo à parte).
+
+    Pedidos são reservados com FOR UPDATE SKIP LOCKED, então vários workers
+    (API + processos dedicados) dividem a fila sem pegar o mesmo pedido. Um
+    PROCESSANDO mais velho que `stale_s` (worker morreu no meio) volta a ser
+    elegível; por isso o lease (iniciado_em) é renovado a cada tabela, e quem
+    perdeu o pedido para outro worker para sem mexer nele.
+    """
+
+    name = "lgpd-exports"
+
+    def __init__(self, directory: str, poll_s: float = 30, batch_rows: int = 1000, stale_s: float = 1800):
+        super().__init__(poll_s)
+        self.directory = directory
+        self.batch_rows = batch_rows
+        self.stale_s = stale_s
+
+    def claim(self, db) -> tuple[uuid.UUID, uuid.UUID, datetime] | None:
+        now = datetime.now(timezone.utc)
+        next_id = (
+            select(ExportacaoDados.id)
+            .where(or_(
+                ExportacaoDados.status == "PENDENTE",
+                and_(
+                    ExportacaoDados.status == "PROCESSANDO",
+                    ExportacaoDados.iniciado_em < now - timedelta(seconds=self.stale_s),
+                ),
+            ))
+            .order_by(ExportacaoDados.solicitado_em)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        row = db.execute(
+            update(ExportacaoDados)
+            .where(ExportacaoDados.id == next_id)
+            .values(status="PROCESSANDO", iniciado_em=now)
+            .returning(ExportacaoDados.id, ExportacaoDados.usuario_id, ExportacaoDados.iniciado_em)
+        ).first()
+        db.commit()
+        return tuple(row) if row else None
+
+    def renew(self, db, export_id: uuid.UUID, lease: datetime) -> datetime:
+        """Estende o lease; LeaseLost se outro worker já reassumiu o pedido."""
+        now = datetime.now(timezone.utc)
+        row = db.execute(
+            update(ExportacaoDados)
+            .where(ExportacaoDados.id == export_id, ExportacaoDados.iniciado_em == lease)
+            .values(iniciado_em=now)
+            .returning(ExportacaoDados.id)
+        ).first()
+        db.commit()
+        if row is None:
+            raise LeaseLost(str(export_id))
+        return now
+
+    def run_once(self, session_factory: Callable) -> bool:
+        """Processa um pedido; False se a fila estava vazia."""
+        with session_factory() as db:
+            job = self.claim(db)
+            if job is None:
+                return False
+            export_id, usuario_id, lease = job
+
+            def renew(_table: str):
+                nonlocal lease
+                lease = self.renew(db, export_id, lease)
+
+            values = {}
+            try:
+                # conexão própria para o cursor no servidor; a sessão só atualiza o status
+                with db.get_bind().connect() as conn:
+                    write_export(
+                        conn, usuario_id, export_path(self.directory, usuario_id, export_id), self.batch_rows, renew,
+                    )
+                values = {"status": "CONCLUIDA", "concluido_em": datetime.now(timezone.utc), "url_resultado": download_url(export_id), "erro": None}
+                self.done += 1
+            except LeaseLost:
+                db.rollback()
+                return True  # o pedido é de outro worker agora
+            except Exception as e:
+                db.rollback()
+                values = {"status": "ERRO", "erro": str(e)[:500]}
+                self.failed += 1
+                self.last_error = str(e)
+            # só grava o resultado se o pedido ainda é deste worker
+            db.execute(
+                update(ExportacaoDados)
+                .where(ExportacaoDados.id == export_id, ExportacaoDados.iniciado_em == lease)
+                .values(**values)
+            )
+            db.commit()
+            return True
+
+
+export_worker = ExportWorker(
+    settings.EXPORT_DIR,
+    poll_s=settings.EXPORT_POLL_S,
+    batch_rows=settings.EXPORT_BATCH_ROWS,
+    stale_s=settings.EXPORT_STALE_S,
+)
+
+
+def main() -> int:
+    # worker dedicado: python -m app.services.exports (com EXPORT_WORKER=false na API)
+    from app.db.session import SessionLocal
+
+    export_worker.run_forever(SessionLocal)
+    print(json.dumps(export_worker.stats()), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,304 @@
+from __future__ import annotations
+import csv
+import io
+import itertools
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Iterable, Iterator, TextIO
+
+from app.core.config import settings
+from app.db.models.product import busca_text
+from app.services.barcodes import barcode_cache
+from app.services.product_search import hot_index
+from app.services.recipe_matcher import recipe_index
+
+FORMATS = ("csv", "ndjson")
+
+# Cada linha traz um produto (codigo, tipo, nome, marca, categoria), um preço
+# (codigo, mercado, cidade, uf, preco, coletado_em) ou os dois. As linhas vão
+# por COPY para uma tabela temporária, em lotes de tamanho fixo, e cada lote é
+# incorporado com quatro comandos set-based: memória constante, qualquer tamanho.
+
+# colunas da tabela temporária, na ordem do COPY
+_COLUMNS = ("linha", "codigo", "tipo", "nome", "marca", "categoria", "busca", "mercado", "cidade", "uf", "preco", "coletado_em")
+# tamanhos das colunas de destino: cortar aqui evita que uma linha derrube o lote
+_LIMITS = {"codigo": 64, "tipo": 16, "nome": 180, "marca": 120, "categoria": 120, "mercado": 180, "cidade": 120, "uf": 2}
+
+# codigos_barras.valor não é único: dois feeds com o mesmo código novo criariam
+# dois produtos. A parte de produtos de cada lote roda sob este lock (até o commit).
+_CATALOG_LOCK = "SELECT pg_advisory_xact_lock(hashtext('kitchen_brain.ingest_catalog'))"
+
+_STAGING_DDL = """
+CREATE TEMP TABLE IF NOT EXISTS stg_ingest (
+    linha bigint, codigo text, tipo text, nome text, marca text, categoria text, busca text,
+    mercado text, cidade text, uf text, preco numeric(12, 2), coletado_em timestamptz
+) ON COMMIT DELETE ROWS
+"""
+
+# produtos do lote, um por código (vale a última linha)
+_PRODUCTS_CTE = """
+WITH src AS (
+    SELECT DISTINCT ON (codigo) codigo, coalesce(tipo, 'EAN13') AS tipo, nome, marca, categoria, busca
+    FROM stg_ingest
+    WHERE nome IS NOT NULL
+    ORDER BY codigo, linha DESC
+)
+"""
+
+_UPDATE_PRODUCTS = _PRODUCTS_CTE + """
+UPDATE produtos p
+SET nome = s.nome, marca = s.marca, categoria = s.categoria, busca = s.busca
+FROM src s JOIN codigos_barras c ON c.valor = s.codigo
+WHERE p.id = c.produto_id
+  AND (p.nome, p.marca, p.categoria) IS DISTINCT FROM (s.nome, s.marca, s.categoria)
+RETURNING p.id
+"""
+
+_INSERT_PRODUCTS = _PRODUCTS_CTE + """
+, novos AS (
+    SELECT gen_random_uuid() AS id, s.*
+    FROM src s
+    WHERE NOT EXISTS (SELECT 1 FROM codigos_barras c WHERE c.valor = s.codigo)
+), produtos_novos AS (
+    INSERT INTO produtos (id, nome, marca, categoria, busca)
+    SELECT id, nome, marca, categoria, busca FROM novos
+)
+INSERT INTO codigos_barras (id, produto_id, valor, tipo)
+SELECT gen_random_uuid(), id, codigo, tipo FROM novos
+"""
+
+_INSERT_MARKETS = """
+INSERT INTO mercados (id, nome, cidade, uf)
+SELECT gen_random_uuid(), mercado, cidade, uf
+FROM (SELECT DISTINCT mercado, cidade, uf FROM stg_ingest WHERE mercado IS NOT NULL) m
+ON CONFLICT (nome, coalesce(cidade, ''), coalesce(uf, '')) DO NOTHING
+"""
+
+# mesmo (produto, mercado, coletado_em) repetido: vale a última linha; já
+# existente no banco: atualiza o preço (o trigger de precos_atuais acompanha)
+_MERGE_PRICES = """
+INSERT INTO precos_produto (id, produto_id, mercado_id, preco, coletado_em)
+SELECT DISTINCT ON (c.produto_id, m.id, s.coletado_em)
+       gen_random_uuid(), c.produto_id, m.id, s.preco, s.coletado_em
+FROM stg_ingest s
+JOIN LATERAL (
+    SELECT produto_id FROM codigos_barras WHERE valor = s.codigo ORDER BY id LIMIT 1
+) c ON true
+JOIN mercados m
+  ON m.nome = s.mercado AND coalesce(m.cidade, '') = coalesce(s.cidade, '') AND coalesce(m.uf, '') = coalesce(s.uf, '')
+WHERE s.mercado IS NOT NULL AND s.preco IS NOT NULL
+ORDER BY c.produto_id, m.id, s.coletado_em, s.linha DESC
+ON CONFLICT ON CONSTRAINT uq_preco_coleta DO UPDATE
+    SET preco = EXCLUDED.preco
+    WHERE precos_produto.preco IS DISTINCT FROM EXCLUDED.preco
+"""
+
+
+def iter_records(stream: TextIO, formato: str) -> Iterator[dict]:
+    if formato == "ndjson":
+        for line in stream:
+            line = line.strip()
+            if line:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                yield record if isinstance(record, dict) else {}
+        return
+    if formato != "csv":
+        raise ValueError(f"Formato desconhecido: {formato}")
+    header = stream.readline()
+    # planilhas em pt-BR costumam exportar com ';'
+    delimiter = ";" if header.count(";") > header.count(",") else ","
+    yield from csv.DictReader(itertools.chain([header], stream), delimiter=delimiter)
+
+
+def _text(record: dict, key: str) -> str | None:
+    value = record.get(key)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value[:_LIMITS[key]] if value else None
+
+
+def _price(value) -> Decimal | None:
+    if value is None or value == "":
+        return None
+    s = str(value).strip()
+    if "," in s:
+        s = s.replace(".", "").replace(",", ".")  # 1.234,56
+    price = Decimal(s)
+    if not price.is_finite() or price < 0:
+        raise InvalidOperation(s)
+    return price.quantize(Decimal("0.01"))
+
+
+def _timestamp(value, default: datetime) -> datetime:
+    if value is None or value == "":
+        return default
+    ts = datetime.fromisoformat(str(value).strip())
+    # sem fuso: UTC
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def parse_record(record: dict, linha: int, coletado_em: datetime) -> tuple | None:
+    """Linha do arquivo -> tupla na ordem de _COLUMNS, ou None se inválida."""
+    codigo = _text(record, "codigo")
+    nome, mercado = _text(record, "nome"), _text(record, "mercado")
+    try:
+        preco = _price(record.get("preco"))
+        ts = _timestamp(record.get("coletado_em"), coletado_em) if mercado else None
+    except (InvalidOperation, ValueError):
+        return None
+    if not codigo or not (nome or (mercado and preco is not None)):
+        return None
+    marca, categoria = _text(record, "marca"), _text(record, "categoria")
+    uf = _text(record, "uf")
+    return (
+        linha, codigo, _text(record, "tipo"), nome, marca, categoria,
+        busca_text(nome, marca, categoria) if nome else None,
+        mercado, _text(record, "cidade"), uf.upper() if uf else None,
+        preco if mercado else None, ts,
+    )
+
+
+def _copy(cursor, rows: list[tuple]):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow(["" if v is None else v.isoformat() if isinstance(v, datetime) else v for v in row])
+    buf.seek(0)
+    cursor.copy_expert(f"COPY stg_ingest ({', '.join(_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+
+def _merge(cursor, rows: list[tuple], report: dict) -> list:
+    _copy(cursor, rows)
+    # tabela temporária não passa pelo autovacuum: sem ANALYZE o planner chuta
+    cursor.execute("ANALYZE stg_ingest")
+    cursor.execute(_CATALOG_LOCK)
+    cursor.execute(_UPDATE_PRODUCTS)
+    updated = [r[0] for r in cursor.fetchall()]
+    cursor.execute(_INSERT_PRODUCTS)
+    report["produtos_novos"] += cursor.rowcount
+    if cursor.rowcount:
+        # códigos novos em volume deixam as estatísticas para trás (o autovacuum
+        # demora); com a tabela "vazia" o planner varre codigos_barras por linha
+        cursor.execute("ANALYZE codigos_barras")
+    report["produtos_atualizados"] += len(updated)
+    cursor.execute(_INSERT_MARKETS)
+    report["mercados_novos"] += cursor.rowcount
+    cursor.execute(_MERGE_PRICES)
+    report["precos"] += cursor.rowcount
+    return updated
+
+
+def _invalidate(rows: list[tuple], updated: list):
+    # o bulk não passa pelos eventos do ORM: invalida os caches aqui, depois do
+    # commit (antes dele, um request ainda relê e guarda a versão antiga)
+    for product_id in updated:
+        barcode_cache.invalidate_product(product_id)
+        hot_index.mark_stale(product_id)
+    for row in rows:
+        if row[3] is not None:
+            barcode_cache.invalidate(row[1])  # derruba o cache negativo de códigos novos
+    if updated:
+        recipe_index.invalidate()  # densidade/peso por unidade entram na matriz
+
+
+def ingest_feed(
+    engine,
+    stream: TextIO,
+    formato: str,
+    batch_rows: int = settings.INGEST_BATCH_ROWS,
+    coletado_em: datetime | None = None,
+    on_batch: Callable[[dict], None] | None = None,
+) -> dict:
+    """Carrega o arquivo em lotes de `batch_rows` linhas, um commit por lote.
+
+    Devolve (e passa a `on_batch` a cada lote) o relatório com as contagens e
+    linhas por segundo. Preços sem coletado_em recebem `coletado_em` (agora).
+    """
+    coletado_em = coletado_em or datetime.now(timezone.utc)
+    batch_rows = max(1, batch_rows)
+    report = {
+        "linhas": 0, "rejeitadas": 0, "lotes": 0, "produtos_novos": 0, "produtos_atualizados": 0,
+        "mercados_novos": 0, "precos": 0, "segundos": 0.0, "linhas_por_s": 0.0,
+    }
+    started = time.perf_counter()
+    records: Iterable[dict] = iter_records(stream, formato)
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(_STAGING_DDL)
+        conn.commit()
+        for linha_0 in itertools.count(0, batch_rows):
+            chunk = list(itertools.islice(records, batch_rows))
+            if not chunk:
+                break
+            rows = []
+            for i, record in enumerate(chunk, start=linha_0 + 1):
+                row = parse_record(record, i, coletado_em)
+                if row is None:
+                    report["rejeitadas"] += 1
+                else:
+                    rows.append(row)
+            report["linhas"] += len(chunk)
+            if rows:
+                try:
+                    updated = _merge(cursor, rows, report)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                _invalidate(rows, updated)
+            report["lotes"] += 1
+            elapsed = time.perf_counter() - started
+            report["segundos"] = round(elapsed, 3)
+            report["linhas_por_s"] = round(report["linhas"] / elapsed, 1) if elapsed else 0.0
+            if on_batch is not None:
+                on_batch(dict(report))
+        cursor.execute("DROP TABLE IF EXISTS stg_ingest")
+        conn.commit()
+    finally:
+        conn.close()
+    return report
+
+
+def detect_format(filename: str | None) -> str | None:
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return None
+
+
+def main(argv: list[str] | None = None) -> int:
+    import argparse
+    from app.db.session import engine
+
+    parser = argparse.ArgumentParser(description="Ingestão em lote de catálogo e preços")
+    parser.add_argument("arquivo", help="CSV ou NDJSON ('-' para stdin)")
+    parser.add_argument("--formato", choices=FORMATS)
+    parser.add_argument("--lote", type=int, default=settings.INGEST_BATCH_ROWS)
+    args = parser.parse_args(argv)
+
+    formato = args.formato or detect_format(args.arquivo)
+    if formato is None:
+        parser.error("informe --formato (csv ou ndjson)")
+
+    def progress(report: dict):
+        print(f"{report['linhas']} linhas, {report['linhas_por_s']:.0f} linhas/s", file=sys.stderr)
+
+    stream = sys.stdin if args.arquivo == "-" else open(args.arquivo, encoding="utf-8-sig", newline="")
+    with stream:
+        report = ingest_feed(engine, stream, formato, args.lote, on_batch=progress)
+    print(json.dumps(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
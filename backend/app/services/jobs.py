@@ -0,0 +1,75 @@
+from __future__ import annotations
+import threading
+from typing import Callable
+
+
+class JobWorker:
+    """Laço de worker de fila: processa até esvaziar, depois espera o poll ou um wake().
+
+    As subclasses implementam `run_once(session_factory) -> bool` (False = fila
+    vazia). Roda numa thread da API ou, via `run_forever`, num processo à parte.
+    """
+
+    name = "jobs"
+
+    def __init__(self, poll_s: float = 30):
+        self.poll_s = poll_s
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.done = 0
+        self.failed = 0
+        self.last_error: str | None = None
+
+    def run_once(self, session_factory: Callable) -> bool:
+        raise NotImplementedError
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop.is_set()
+
+    def pause(self, seconds: float) -> bool:
+        # sleep interrompível pelo shutdown; True = parar
+        return self._stop.wait(seconds)
+
+    def wake(self):
+        # chamado pela API ao enfileirar: não espera o próximo poll
+        self._wake.set()
+
+    def start(self, session_factory: Callable) -> threading.Thread:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, args=(session_factory,), name=self.name, daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def _loop(self, session_factory: Callable):
+        while not self._stop.is_set():
+            try:
+                while not self._stop.is_set() and self.run_once(session_factory):
+                    pass
+            except Exception as e:
+                self.last_error = str(e)
+            self._wake.wait(self.poll_s)
+            self._wake.clear()
+
+    def run_forever(self, session_factory: Callable):
+        thread = self.start(session_factory)
+        try:
+            while thread.is_alive():
+                thread.join(1)
+        except KeyboardInterrupt:
+            self.shutdown()
+            thread.join()
+
+    def shutdown(self):
+        self._stop.set()
+        self._wake.set()
+
+    def stats(self) -> dict:
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "done": self.done,
+            "failed": self.failed,
+            "last_error": self.last_error,
+        }
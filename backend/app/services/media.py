@@ -0,0 +1,333 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable
+
+import av
+import numpy as np
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.models.media import AnexoMidia
+
+_HEAD = 64 * 1024  # o EXIF fica no começo do arquivo
+_CHUNK = 1024 * 1024
+_JPEG_Q = 4  # qscale do mjpeg (2 = melhor, 31 = pior)
+IMAGE_TYPES = frozenset({"image/jpeg", "image/png", "image/webp"})
+# orientação EXIF -> rotação de 90° (troca largura e altura)
+_SWAPS_AXES = frozenset({5, 6, 7, 8})
+
+
+class MediaRejected(ValueError):
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+@dataclass
+class Blob:
+    sha256: str
+    mime: str
+    tamanho_bytes: int
+    largura: int | None = None
+    altura: int | None = None
+    duplicado: bool = False
+
+
+def sniff_mime(head: bytes) -> str | None:
+    # pelo conteúdo, não pelo nome/Content-Type do cliente
+    if head[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if head[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[:5] == b"%PDF-":
+        return "application/pdf"
+    return None
+
+
+def exif_orientation(head: bytes) -> int:
+    """Tag Orientation (0x0112) do APP1 de um JPEG; 1 quando não há."""
+    if head[:2] != b"\xff\xd8":
+        return 1
+    i = 2
+    while i + 4 <= len(head) and head[i] == 0xFF:
+        marker, size = head[i + 1], int.from_bytes(head[i + 2:i + 4], "big")
+        if marker == 0xE1 and head[i + 4:i + 10] == b"Exif\0\0":
+            tiff = head[i + 10:i + 2 + size]
+            order = "little" if tiff[:2] == b"II" else "big"
+            ifd = int.from_bytes(tiff[4:8], order)
+            for k in range(int.from_bytes(tiff[ifd:ifd + 2], order)):
+                entry = tiff[ifd + 2 + 12 * k:ifd + 14 + 12 * k]
+                if int.from_bytes(entry[:2], order) == 0x0112:
+                    value = int.from_bytes(entry[8:10], order)
+                    return value if 1 <= value <= 8 else 1
+            return 1
+        if marker == 0xDA:  # começo da imagem: não tem mais metadado
+            return 1
+        i += 2 + size
+    return 1
+
+
+def orient(pixels: np.ndarray, orientation: int) -> np.ndarray:
+    # mesmas transformações do ImageOps.exif_transpose
+    if orientation == 2:
+        return pixels[:, ::-1]
+    if orientation == 3:
+        return pixels[::-1, ::-1]
+    if orientation == 4:
+        return pixels[::-1]
+    if orientation == 5:
+        return pixels.transpose(1, 0, 2)
+    if orientation == 6:
+        return np.rot90(pixels, -1)
+    if orientation == 7:
+        return pixels.transpose(1, 0, 2)[::-1, ::-1]
+    if orientation == 8:
+        return np.rot90(pixels, 1)
+    return pixels
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+class MediaStore:
+    """Arquivos no disco endereçados pelo sha256: o mesmo conteúdo é gravado uma vez.
+
+    <dir>/ab/cd/<sha256> guarda o original; <dir>/variants/ab/<sha256>-<w>.jpg
+    as versões reduzidas, geradas na primeira vez que alguém pede aquela
+    largura. Como o conteúdo de um hash nunca muda, tudo é cacheável para sempre.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 15 * 1024 * 1024,
+        widths: Iterable[int] = (160, 320, 640, 1280),
+        max_pixels: int = 50_000_000,
+        gc_grace_s: float = 600,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.widths = sorted(set(widths))
+        self.max_pixels = max_pixels
+        self.gc_grace_s = gc_grace_s
+        # um build por variante; sem dicionário crescendo por chave
+        self._locks = [threading.Lock() for _ in range(64)]
+        self.stored = 0
+        self.deduplicated = 0
+        self.variants_built = 0
+        self.variant_hits = 0
+        self.removed = 0
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.directory, sha256[:2], sha256[2:4], sha256)
+
+    def variant_path(self, sha256: str, width: int) -> str:
+        return os.path.join(self.directory, "variants", sha256[:2], f"{sha256}-{width}.jpg")
+
+    def pick_width(self, requested: int, largura: int | None) -> int | None:
+        """Largura de variante para ?w=; None = o original já é pequeno o bastante."""
+        if not self.widths:
+            return None
+        width = next((w for w in self.widths if w >= requested), self.widths[-1])
+        return None if largura and width >= largura else width
+
+    def save(self, source: BinaryIO) -> Blob:
+        """Grava o upload (arquivo temporário do Starlette) e devolve os metadados.
+
+        Primeiro só calcula o hash; conteúdo repetido não é escrito de novo.
+        """
+        source.seek(0)
+        digest, size, head = hashlib.sha256(), 0, b""
+        while chunk := source.read(_CHUNK):
+            size += len(chunk)
+            if size > self.max_bytes:
+                raise MediaRejected(f"Arquivo maior que {self.max_bytes // (1024 * 1024)} MB.", 413)
+            if len(head) < _HEAD:
+                head += chunk[:_HEAD - len(head)]
+            digest.update(chunk)
+        if not size:
+            raise MediaRejected("Arquivo vazio.")
+        mime = sniff_mime(head)
+        if mime is None:
+            raise MediaRejected("Tipo de arquivo não suportado.", 415)
+        blob = Blob(digest.hexdigest(), mime, size)
+        if mime in IMAGE_TYPES:
+            blob.largura, blob.altura = self._dimensions(source, head)
+        final = self.path(blob.sha256)
+        if os.path.exists(final):
+            # renova o mtime: o GC não apaga um arquivo que acabou de ganhar anexo
+            os.utime(final)
+            blob.duplicado = True
+            self.deduplicated += 1
+        else:
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(final), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as out:
+                    source.seek(0)
+                    while chunk := source.read(_CHUNK):
+                        out.write(chunk)
+                os.replace(tmp, final)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            self.stored += 1
+        return blob
+
+    def _dimensions(self, source: BinaryIO, head: bytes) -> tuple[int, int]:
+        # só o cabeçalho; nada é decodificado aqui
+        source.seek(0)
+        try:
+            with av.open(source, mode="r", metadata_errors="ignore") as container:
+                codec = container.streams.video[0].codec_context
+                width, height = codec.width, codec.height
+        except (av.error.FFmpegError, IndexError):
+            raise MediaRejected("Imagem inválida.", 415)
+        if not width or not height or width * height > self.max_pixels:
+            raise MediaRejected("Imagem inválida ou grande demais.", 415)
+        return (height, width) if exif_orientation(head) in _SWAPS_AXES else (width, height)
+
+    def variant(self, sha256: str, width: int) -> str:
+        """Caminho da variante com `width` px de largura, gerando se ainda não existe."""
+        path = self.variant_path(sha256, width)
+        if os.path.exists(path):
+            self.variant_hits += 1
+            return path
+        with self._locks[hash(path) % len(self._locks)]:
+            if not os.path.exists(path):
+                try:
+                    self._build_variant(self.path(sha256), path, width)
+                except (av.error.FFmpegError, IndexError, StopIteration):
+                    raise MediaRejected("Não foi possível gerar a versão reduzida.", 422)
+                self.variants_built += 1
+            else:
+                self.variant_hits += 1
+        return path
+
+    def _build_variant(self, source: str, dest: str, width: int):
+        with open(source, "rb") as f:
+            orientation = exif_orientation(f.read(_HEAD))
+        with av.open(source, metadata_errors="ignore") as container:
+            stream = container.streams.video[0]
+            codec = stream.codec_context
+            raw_w, raw_h = codec.width, codec.height
+            shown_w = raw_h if orientation in _SWAPS_AXES else raw_w
+            scale = min(1.0, width / shown_w)
+            out_w, out_h = max(1, round(raw_w * scale)), max(1, round(raw_h * scale))
+            if codec.name == "mjpeg":
+                # o JPEG decodifica direto em 1/2, 1/4 ou 1/8: miniatura sem abrir os 12 MP
+                lowres = 0
+                while lowres < 3 and raw_w >> (lowres + 1) >= out_w and raw_h >> (lowres + 1) >= out_h:
+                    lowres += 1
+                codec.options = {"lowres": str(lowres)}
+            frame = next(container.decode(stream))
+        pixels = frame.reformat(width=out_w, height=out_h, format="rgb24", interpolation="AREA").to_ndarray()
+        pixels = np.ascontiguousarray(orient(pixels, orientation))
+        image = av.VideoFrame.from_ndarray(pixels, format="rgb24").reformat(format="yuvj420p")
+        encoder = av.CodecContext.create("mjpeg", "w")
+        encoder.width, encoder.height, encoder.pix_fmt = image.width, image.height, "yuvj420p"
+        encoder.options = {"qmin": str(_JPEG_Q), "qmax": str(_JPEG_Q)}
+        data = b"".join(bytes(p) for p in encoder.encode(image) + encoder.encode(None))
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), suffix=".tmp")
+        with os.fdopen(fd, "wb") as out:
+            out.write(data)
+        os.replace(tmp, dest)
+
+    def discard(self, digests: Iterable[str], referenced: set[str]) -> int:
+        """Apaga original e variantes dos hashes sem anexo; devolve quantos saíram.
+
+        Arquivo tocado há menos de `gc_grace_s` fica: pode ser um upload cujo
+        anexo ainda não foi gravado.
+        """
+        removed = 0
+        cutoff = time.time() - self.gc_grace_s
+        for sha256 in set(digests) - referenced:
+            path = self.path(sha256)
+            try:
+                if os.stat(path).st_mtime > cutoff:
+                    continue
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            for width in self.widths:
+                try:
+                    os.remove(self.variant_path(sha256, width))
+                except FileNotFoundError:
+                    pass
+            removed += 1
+        self.removed += removed
+        return removed
+
+    def digests(self) -> Iterable[str]:
+        for root, dirs, files in os.walk(self.directory):
+            if root == self.directory and "variants" in dirs:
+                dirs.remove("variants")
+            for name in files:
+                if len(name) == 64:
+                    yield name
+
+    def stats(self) -> dict:
+        return {
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "variants_built": self.variants_built,
+            "variant_hits": self.variant_hits,
+            "removed": self.removed,
+        }
+
+
+def referenced(db, digests: Iterable[str]) -> set[str]:
+    # hashes que ainda têm algum anexo (de qualquer usuário)
+    digests = list(digests)
+    if not digests:
+        return set()
+    return set(db.execute(select(AnexoMidia.sha256).where(AnexoMidia.sha256.in_(digests)).distinct()).scalars())
+
+
+def sweep(db, store: MediaStore, batch: int = 1000) -> int:
+    """Remove arquivos que nenhum anexo referencia (ex.: sobras de uploads)."""
+    removed, pending = 0, []
+    for sha256 in store.digests():
+        pending.append(sha256)
+        if len(pending) >= batch:
+            removed += store.discard(pending, referenced(db, pending))
+            pending = []
+    return removed + store.discard(pending, referenced(db, pending))
+
+
+media_store = MediaStore(
+    settings.MEDIA_DIR,
+    max_bytes=settings.MEDIA_MAX_UPLOAD_MB * 1024 * 1024,
+    widths=[int(w) for w in settings.MEDIA_VARIANT_WIDTHS.split(",") if w.strip()],
+    max_pixels=settings.MEDIA_MAX_PIXELS,
+    gc_grace_s=settings.MEDIA_GC_GRACE_S,
+)
+
+
+def main() -> int:
+    # limpeza periódica (cron): python -m app.services.media
+    from app.db.session import SessionLocal
+
+    with SessionLocal() as db:
+        removed = sweep(db, media_store)
+    print(json.dumps({"removed": removed, **media_store.stats()}), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+from __future__ import annotations
+from sqlalchemy import case, func, null, select
+
+from app.core.units import sql_canonical
+from app.db.models.product import Produto
+from app.db.models.storage import ItemEstoque
+
+
+def stock_totals_stmt(user_id, produto_ids=None):
+    """Estoque do usuário somado no banco, já em unidades canônicas.
+
+    Uma linha por (produto, dimensão): (produto_id, dimensao, unidade, total).
+    Unidade conhecida: dimensao 0/1/2, total em g/ml/un e unidade NULL.
+    Desconhecida: dimensao NULL, total na unidade original (em maiúsculas).
+    """
+    dim, value = sql_canonical(
+        ItemEstoque.quantidade, ItemEstoque.unidade, Produto.densidade_g_ml, Produto.peso_unidade_g
+    )
+    unidade = case((dim.is_(None), func.upper(func.trim(ItemEstoque.unidade))), else_=null())
+    stmt = (
+        select(
+            ItemEstoque.produto_id,
+            dim.label("dimensao"),
+            unidade.label("unidade"),
+            func.sum(func.coalesce(value, ItemEstoque.quantidade)).label("total"),
+        )
+        .join(Produto, Produto.id == ItemEstoque.produto_id)
+        .where(ItemEstoque.usuario_id == user_id, ItemEstoque.quantidade > 0)
+        .group_by(ItemEstoque.produto_id, dim, unidade)
+    )
+    if produto_ids is not None:
+        stmt = stmt.where(ItemEstoque.produto_id.in_(produto_ids))
+    return stmt
@@ -0,0 +1,228 @@
+from __future__ import annotations
+import bisect
+import threading
+import time
+from typing import Callable
+
+import numpy as np
+from sqlalchemy import and_, bindparam, event, func, literal, or_, select, text, update
+
+from app.core.config import settings
+from app.core.text import normalize, trigrams
+from app.db.models.product import Produto, busca_text
+from app.db.models.recipe import IngredienteReceita
+from app.db.models.storage import ItemEstoque
+
+# mesmo limiar padrão do operador <% (pg_trgm.word_similarity_threshold)
+MIN_SCORE = 0.6
+
+TRIGRAM_INDEX_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_produtos_busca_trgm ON produtos USING gin (busca gin_trgm_ops)",
+)
+
+
+class NgramIndex:
+    """Índice de trigramas em memória sobre a fatia mais usada do catálogo.
+
+    Responde o autocomplete sem ir ao banco e serve de fallback quando o
+    Postgres não tem pg_trgm. A pontuação é a fração dos trigramas da consulta
+    presentes no produto (aproxima o word_similarity do pg_trgm), somada a 1
+    quando o texto começa com a consulta.
+    """
+
+    def __init__(self, max_products: int = 50000, min_score: float = MIN_SCORE):
+        self.max_products = max_products
+        self.min_score = min_score
+        self._lock = threading.Lock()
+        self._rows: list[dict] = []
+        self._postings: dict[str, np.ndarray] = {}
+        self._prefix_keys: list[str] = []
+        self._prefix_order = np.zeros(0, dtype=np.int64)
+        self._positions: dict[str, int] = {}
+        self._stale: set[int] = set()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self.built_at: float | None = None
+        self.load_error: str | None = None
+
+    def build(self, rows: list[dict]):
+        postings: dict[str, list[int]] = {}
+        for i, row in enumerate(rows):
+            for gram in trigrams(row["busca"]):
+                postings.setdefault(gram, []).append(i)
+        order = sorted(range(len(rows)), key=lambda i: rows[i]["busca"])
+        # troca atômica: buscas em andamento seguem com a versão anterior
+        with self._lock:
+            self._rows = rows
+            self._postings = {g: np.asarray(ids, dtype=np.int64) for g, ids in postings.items()}
+            self._prefix_keys = [rows[i]["busca"] for i in order]
+            self._prefix_order = np.asarray(order, dtype=np.int64)
+            self._positions = {str(row["id"]): i for i, row in enumerate(rows)}
+            self._stale = set()
+            self.built_at = time.time()
+
+    def mark_stale(self, product_id):
+        # produto alterado: sai dos resultados até o próximo rebuild
+        with self._lock:
+            pos = self._positions.get(str(product_id))
+            if pos is not None:
+                self._stale.add(pos)
+
+    def search(self, query: str, limit: int = 10) -> list[dict]:
+        q = normalize(query)
+        if not q:
+            return []
+        with self._lock:
+            rows, postings, stale = self._rows, self._postings, set(self._stale)
+            keys, order = self._prefix_keys, self._prefix_order
+        if not rows:
+            return []
+
+        grams = trigrams(q)
+        hits = [postings[g] for g in grams if g in postings]
+        score = np.zeros(len(rows), dtype=np.float64)
+        if hits:
+            score += np.bincount(np.concatenate(hits), minlength=len(rows)) / len(grams)
+        lo = bisect.bisect_left(keys, q)
+        hi = bisect.bisect_left(keys, q + "\uffff")
+        score[order[lo:hi]] += 1.0
+        if stale:
+            score[list(stale)] = 0
+
+        candidates = np.flatnonzero(score >= self.min_score)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-score[candidates], limit - 1)[:limit]]
+        ranked = sorted(candidates.tolist(), key=lambda i: (-score[i], rows[i]["busca"]))
+        return [rows[i] for i in ranked]
+
+    @property
+    def ready(self) -> bool:
+        return self.built_at is not None
+
+    def start(self, session_factory: Callable, refresh_s: float = 600) -> threading.Thread:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._refresh_loop, args=(session_factory, refresh_s), name="product-search", daemon=True
+            )
+            self._thread.start()
+        return self._thread
+
+    def _refresh_loop(self, session_factory: Callable, refresh_s: float):
+        while not self._stop.is_set():
+            try:
+                with session_factory() as db:
+                    self.build(load_hot_slice(db, self.max_products))
+                self.load_error = None
+            except Exception as e:
+                self.load_error = str(e)
+            if self._stop.wait(refresh_s):
+                return
+
+    def shutdown(self):
+        self._stop.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "products": len(self._rows),
+                "trigrams": len(self._postings),
+                "stale": len(self._stale),
+                "built_at": self.built_at,
+                "load_error": self.load_error,
+            }
+
+
+def load_hot_slice(db, limit: int) -> list[dict]:
+    # "quentes" = mais presentes em estoques e receitas
+    usage = (
+        select(ItemEstoque.produto_id.label("produto_id"))
+        .union_all(select(IngredienteReceita.produto_id).where(IngredienteReceita.produto_id.is_not(None)))
+        .subquery()
+    )
+    counts = select(usage.c.produto_id, func.count().label("uso")).group_by(usage.c.produto_id).subquery()
+    stmt = (
+        select(Produto.id, Produto.nome, Produto.marca, Produto.categoria, Produto.busca)
+        .outerjoin(counts, counts.c.produto_id == Produto.id)
+        .order_by(func.coalesce(counts.c.uso, 0).desc(), Produto.id)
+        .limit(limit)
+    )
+    return [dict(row._mapping) for row in db.execute(stmt)]
+
+
+_trigram: bool | None = None
+
+
+async def trigram_available(db) -> bool:
+    # consultado uma vez por processo
+    global _trigram
+    if _trigram is None:
+        found = await db.execute(text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')"))
+        _trigram = bool(found.scalar())
+    return _trigram
+
+
+def search_stmt(q: str, limit: int, trigram: bool):
+    # q já normalizado: sem % nem _, seguro para LIKE
+    prefix = Produto.busca.like(f"{q}%")
+    if trigram:
+        # LIKE 'q%' e <% usam o índice GIN gin_trgm_ops
+        score = func.word_similarity(q, Produto.busca)
+        match = or_(prefix, literal(q).op("<%")(Produto.busca))
+    else:
+        # sem pg_trgm: todas as palavras como substring (varredura)
+        score = literal(0.0)
+        match = and_(*[Produto.busca.like(f"%{w}%") for w in q.split()])
+    return (
+        select(Produto.id, Produto.nome, Produto.marca, Produto.categoria)
+        .where(match)
+        .order_by(prefix.desc(), score.desc(), Produto.busca)
+        .limit(limit)
+    )
+
+
+def backfill_busca(conn, batch: int = 1000) -> int:
+    """Preenche `busca` dos produtos gravados antes da coluna existir.
+
+    O texto sai do mesmo busca_text() do ORM (o Postgres não tira acento sem a
+    extensão unaccent), em lotes por id. Só linhas com busca vazia: rodar de
+    novo não refaz nada. Em produção rode uma vez na migração.
+    """
+    stmt = (
+        update(Produto.__table__)
+        .where(Produto.__table__.c.id == bindparam("pid"))
+        .values(busca=bindparam("novo"))
+    )
+    done, last = 0, None
+    while True:
+        page = select(Produto.id, Produto.nome, Produto.marca, Produto.categoria).where(Produto.busca == "")
+        if last is not None:
+            page = page.where(Produto.id > last)
+        rows = conn.execute(page.order_by(Produto.id).limit(batch)).all()
+        if not rows:
+            return done
+        params = [{"pid": r.id, "novo": busca_text(r.nome, r.marca, r.categoria)} for r in rows]
+        conn.execute(stmt, params)
+        done += len(rows)
+        last = rows[-1].id
+
+
+def ensure_trigram_index(conn) -> bool:
+    # só em dev (DB_CREATE_ALL); em produção rode esses comandos na migração
+    try:
+        with conn.begin_nested():
+            for ddl in TRIGRAM_INDEX_DDL:
+                conn.execute(text(ddl))
+        return True
+    except Exception:
+        return False
+
+
+hot_index = NgramIndex(settings.PRODUCT_SEARCH_HOT_SIZE)
+
+
+@event.listens_for(Produto, "after_update")
+@event.listens_for(Produto, "after_delete")
+def _mark_stale(_mapper, _connection, target: Produto):
+    hot_index.mark_stale(target.id)
+
@@ -0,0 +1,584 @@
+from __future__ import annotations
+import asyncio
+import html
+import ipaddress
+import json
+import re
+import socket
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Callable
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpcore
+import httpx
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.config import settings
+from app.core.text import normalize
+from app.core.units import UNITS
+from app.db.models.recipe import Receita, IngredienteReceita, ImportacaoLote, ImportacaoReceita
+from app.services.jobs import JobWorker
+from app.services.product_search import load_hot_slice
+from app.services.recipe_matcher import recipe_index
+
+MAX_INGREDIENTS = 100
+_MAX_REDIRECTS = 5
+# parâmetros de rastreamento não mudam a página
+_TRACKING = re.compile(r"^(utm_\w+|fbclid|gclid|mc_cid|mc_eid|ref|igshid)$")
+_LD_JSON = re.compile(
+    r"<script[^>]*type\s*=\s*[\"']?application/ld\+json[\"']?[^>]*>(.*?)</script\s*>", re.I | re.S
+)
+_TAG = re.compile(r"<[^>]+>")
+_DURATION = re.compile(r"P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:[\d.]+S)?)?$", re.I)
+_FRACTIONS = {"½": "1/2", "¼": "1/4", "¾": "3/4", "⅓": "1/3", "⅔": "2/3"}
+_QUANTITY = re.compile(r"^\s*(\d+\s+\d+/\d+|\d+/\d+|\d+(?:[.,]\d+)?)\s*")
+_STOPWORDS = frozenset({"de", "da", "do", "das", "dos", "e", "com", "a", "o", "em"})
+_TO_TASTE = re.compile(r"\s*\b(a gosto|q b)$")
+# nome curto de cada unidade para IngredienteReceita.unidade (String(16))
+_UNIT_SHORT = {
+    unit: min((k for k, v in UNITS.items() if v == unit and k == normalize(k)), key=len) for unit in set(UNITS.values())
+}
+
+
+class RecipeImportError(Exception):
+    pass
+
+
+def normalize_url(url: str) -> str:
+    """Chave de dedupe: "HTTPS://www.Site.com/r/?utm_source=x#top" -> "https://site.com/r"."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme not in ("http", "https") or not parts.hostname:
+        raise RecipeImportError("URL inválida")
+    host = parts.hostname.lower().removeprefix("www.")
+    port = parts.port
+    if port and port != {"http": 80, "https": 443}[scheme]:
+        host = f"{host}:{port}"
+    path = re.sub(r"/{2,}", "/", parts.path).rstrip("/") or ""
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _TRACKING.match(k))
+    # http e https apontam para a mesma receita
+    return urlunsplit(("https", host, path, urlencode(query), ""))[:512]
+
+
+# ---- Dados estruturados (schema.org/Recipe em JSON-LD)
+
+def _nodes(data):
+    if isinstance(data, list):
+        for item in data:
+            yield from _nodes(item)
+    elif isinstance(data, dict):
+        yield data
+        for key in ("@graph", "mainEntity", "mainEntityOfPage"):
+            if isinstance(data.get(key), (list, dict)):
+                yield from _nodes(data[key])
+
+
+def _is_recipe(node: dict) -> bool:
+    kind = node.get("@type")
+    return kind == "Recipe" or (isinstance(kind, list) and "Recipe" in kind)
+
+
+def find_recipe(page: str) -> dict | None:
+    for match in _LD_JSON.finditer(page):
+        try:
+            data = json.loads(match.group(1).strip())
+        except ValueError:
+            continue
+        for node in _nodes(data):
+            if _is_recipe(node):
+                return node
+    return None
+
+
+def _text(value) -> str:
+    if isinstance(value, list):
+        value = value[0] if value else ""
+    if isinstance(value, dict):
+        value = value.get("name") or value.get("text") or ""
+    return " ".join(_TAG.sub(" ", html.unescape(str(value or ""))).split())
+
+
+def _minutes(value) -> int:
+    m = _DURATION.match(_text(value))
+    if not m:
+        return 0
+    days, hours, minutes = (int(g or 0) for g in m.groups())
+    return days * 1440 + hours * 60 + minutes
+
+
+def _servings(value) -> int:
+    found = re.search(r"\d+", _text(value))
+    return max(1, int(found.group())) if found else 1
+
+
+def _decimal(raw: str) -> Decimal | None:
+    raw = raw.replace(",", ".")
+    try:
+        total = Decimal(0)
+        for part in raw.split():
+            if "/" in part:
+                num, den = part.split("/")
+                total += Decimal(num) / Decimal(den)
+            else:
+                total += Decimal(part)
+        return total.quantize(Decimal("0.001"))
+    except (InvalidOperation, ZeroDivisionError):
+        return None
+
+
+def parse_ingredient(line: str) -> dict:
+    """ "2 xícaras (chá) de farinha de trigo, peneirada" -> quantidade, unidade, nome e observação."""
+    line = _text(line)
+    head, _, note = line.partition(",")
+    for char, frac in _FRACTIONS.items():
+        head = head.replace(char, f" {frac}")
+    quantidade = None
+    m = _QUANTITY.match(head)
+    if m:
+        quantidade = _decimal(m.group(1))
+        head = head[m.end():]
+    words = normalize(head).split()
+    unidade = None
+    for n in (3, 2, 1):
+        key = " ".join(words[:n])
+        if len(words) > n and key in UNITS:
+            unidade = key if len(key) <= 16 else _UNIT_SHORT[UNITS[key]]
+            words = words[n:]
+            break
+    if unidade and words[:1] == ["cha"]:  # "xícara (chá)"
+        words = words[1:]
+    while words and words[0] in _STOPWORDS:
+        words = words[1:]
+    name = " ".join(words)
+    note = note.strip()
+    taste = _TO_TASTE.search(name)
+    if taste:
+        name, note = name[:taste.start()], note or "a gosto"
+    return {
+        "nome": name,
+        "quantidade": quantidade,
+        "unidade": unidade,
+        "observacoes": note[:240] or None,
+        "nome_livre": line[:180],
+    }
+
+
+def parse_recipe(page: str, url: str) -> dict:
+    node = find_recipe(page)
+    if node is None:
+        raise RecipeImportError("Receita não encontrada na página")
+    titulo = _text(node.get("name"))
+    if not titulo:
+        raise RecipeImportError("Receita sem título")
+    lines = node.get("recipeIngredient") or node.get("ingredients") or []
+    if isinstance(lines, str):
+        lines = [lines]
+    tempo = _minutes(node.get("totalTime")) or _minutes(node.get("prepTime")) + _minutes(node.get("cookTime"))
+    return {
+        "titulo": titulo[:180],
+        "descricao": _text(node.get("description")) or None,
+        "rendimento_porcoes": _servings(node.get("recipeYield")),
+        "tempo_preparo_min": tempo,
+        "ingredientes": [parse_ingredient(l) for l in lines[:MAX_INGREDIENTS] if _text(l)],
+        "fonte": (urlsplit(url).hostname or "").removeprefix("www.")[:120] or None,
+    }
+
+
+# ---- Ingrediente -> Produto
+
+def _stem(word: str) -> str:
+    # plural simples: "ovos" -> "ovo", "cebolas" -> "cebola"
+    return word[:-1] if len(word) > 3 and word.endswith("s") else word
+
+
+class ProductNames:
+    """Nomes de produto (e seus começos) -> produto_id, do mais usado para o menos.
+
+    "Farinha de Trigo Tipo 1" responde por "farinha de trigo tipo 1",
+    "farinha de trigo" e "farinha"; casar um ingrediente é achar o maior trecho
+    do nome que é chave, sem ir ao banco.
+    """
+
+    def __init__(self, rows: list[dict], max_words: int = 4):
+        self.max_words = max_words
+        self.names: dict[str, uuid.UUID] = {}
+        for row in rows:
+            words = [_stem(w) for w in normalize(row["nome"]).split()]
+            for n in range(1, min(len(words), max_words) + 1):
+                if words[n - 1] not in _STOPWORDS:
+                    self.names.setdefault(" ".join(words[:n]), row["id"])
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def match(self, name: str) -> uuid.UUID | None:
+        words = [_stem(w) for w in normalize(name).split()]
+        for size in range(min(len(words), self.max_words), 0, -1):
+            for start in range(len(words) - size + 1):
+                span = words[start:start + size]
+                if span[0] in _STOPWORDS or span[-1] in _STOPWORDS:
+                    continue
+                found = self.names.get(" ".join(span))
+                if found is not None:
+                    return found
+        return None
+
+
+class ProductNameIndex:
+    """ProductNames da fatia mais usada do catálogo, refeito pelo TTL."""
+
+    def __init__(self, max_products: int = 50000, ttl_s: float = 600):
+        self.max_products = max_products
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._names: ProductNames | None = None
+        self._built_at = 0.0
+
+    def get(self, session_factory: Callable) -> ProductNames:
+        # síncrono (chamar no threadpool)
+        with self._lock:
+            if self._names is None or time.time() - self._built_at > self.ttl_s:
+                with session_factory() as db:
+                    self._names = ProductNames(load_hot_slice(db, self.max_products))
+                self._built_at = time.time()
+            return self._names
+
+
+# ---- Busca das páginas
+
+class _PublicNetwork(httpcore.AsyncNetworkBackend):
+    """Resolve o host e conecta no próprio IP verificado.
+
+    Checar o DNS antes do request não basta: o httpx resolve de novo ao
+    conectar e um host com TTL curto (DNS rebinding) pode responder com um IP
+    interno nessa segunda vez. SNI e Host continuam com o nome do site.
+    """
+
+    def __init__(self):
+        self._backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except OSError:
+            raise RecipeImportError("Site não encontrado")
+        addrs = list(dict.fromkeys(info[4][0] for info in infos))
+        if not addrs or not all(ipaddress.ip_address(a).is_global for a in addrs):
+            raise RecipeImportError("Endereço não permitido")
+        error: Exception | None = None
+        for addr in addrs:
+            try:
+                return await self._backend.connect_tcp(
+                    addr, port, timeout=timeout, local_address=local_address, socket_options=socket_options,
+                )
+            except httpcore.ConnectError as e:
+                error = e
+        raise error
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        raise RecipeImportError("Endereço não permitido")
+
+    async def sleep(self, seconds):
+        await self._backend.sleep(seconds)
+
+
+class RecipeFetcher:
+    """Um httpx.AsyncClient compartilhado (keep-alive) com limite global e por site.
+
+    O pool limita conexões no total; um semáforo por host garante que um lote
+    de 500 URLs do mesmo site não abra 20 conexões contra ele.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 20,
+        per_host: int = 4,
+        timeout_s: float = 10,
+        max_bytes: int = 3_000_000,
+        allow_private: bool = False,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.timeout_s = timeout_s
+        self.max_bytes = max_bytes
+        self.allow_private = allow_private
+        self._client: httpx.AsyncClient | None = None
+        self._hosts: dict[str, list] = {}  # host -> [semáforo, usuários]
+        self.fetched = 0
+        self.bytes = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+            transport = httpx.AsyncHTTPTransport(limits=limits)
+            if not self.allow_private:
+                # o httpx não expõe o network_backend do httpcore
+                transport._pool._network_backend = _PublicNetwork()
+            self._client = httpx.AsyncClient(
+                transport=transport,
+                timeout=self.timeout_s,
+                headers={"User-Agent": "KitchenBrain/0.1 (importador de receitas)", "Accept": "text/html"},
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _get(self, url: str) -> str:
+        target = httpx.URL(url)
+        for _ in range(_MAX_REDIRECTS + 1):
+            # o endereço é verificado na conexão (_PublicNetwork), a cada salto
+            response = await self.client.send(self.client.build_request("GET", target), stream=True)
+            try:
+                if response.is_redirect and response.next_request is not None:
+                    target = response.next_request.url
+                    continue
+                if response.status_code >= 400:
+                    raise RecipeImportError(f"HTTP {response.status_code}")
+                body = bytearray()
+                async for chunk in response.aiter_bytes():
+                    body += chunk
+                    if len(body) > self.max_bytes:
+                        raise RecipeImportError("Página grande demais")
+                self.fetched += 1
+                self.bytes += len(body)
+                return body.decode(response.charset_encoding or "utf-8", errors="replace")
+            finally:
+                await response.aclose()
+        raise RecipeImportError("Redirecionamentos demais")
+
+    async def fetch(self, url: str) -> str:
+        host = urlsplit(url).hostname or ""
+        slot = self._hosts.setdefault(host, [asyncio.Semaphore(self.per_host), 0])
+        slot[1] += 1
+        try:
+            async with slot[0]:
+                return await self._get(url)
+        except httpx.HTTPError as e:
+            raise RecipeImportError(f"Falha ao buscar a página ({type(e).__name__})")
+        finally:
+            slot[1] -= 1
+            if not slot[1]:
+                self._hosts.pop(host, None)
+
+    async def fetch_recipe(self, url: str) -> dict:
+        return parse_recipe(await self.fetch(url), url)
+
+    async def fetch_all(self, urls: list[str]) -> list[dict | RecipeImportError]:
+        # todas em paralelo; os limites do pool/semáforos seguram a vazão
+        async def one(url):
+            try:
+                return await self.fetch_recipe(url)
+            except RecipeImportError as e:
+                return e
+        return await asyncio.gather(*(one(u) for u in urls))
+
+    def stats(self) -> dict:
+        return {"fetched": self.fetched, "bytes": self.bytes, "hosts_active": len(self._hosts)}
+
+
+# ---- Pipeline
+
+async def _fetch_with_names(fetcher: RecipeFetcher, urls: list[str], names: Callable[[], ProductNames]):
+    # o índice de nomes é montado numa thread enquanto as páginas chegam
+    pending = asyncio.get_running_loop().run_in_executor(None, names)
+    try:
+        return await fetcher.fetch_all(urls), await pending
+    finally:
+        await fetcher.aclose()
+
+
+def import_recipes(
+    db, usuario_id: uuid.UUID, urls: list[str], fetcher: RecipeFetcher, names: Callable[[], ProductNames]
+) -> list[dict]:
+    """Importa um lote de URLs; devolve um resultado por URL, na ordem recebida.
+
+    URLs já importadas pelo usuário (mesma url_normalizada) viram um lookup só,
+    as demais são buscadas em paralelo e gravadas com um insert em lote por
+    tabela. Nenhuma transação fica aberta enquanto as páginas são buscadas.
+    """
+    results: list[dict] = [{"url": u, "status": "ERRO", "receita_id": None, "titulo": None, "erro": None} for u in urls]
+    keys: dict[str, list[int]] = {}
+    for i, url in enumerate(urls):
+        try:
+            keys.setdefault(normalize_url(url), []).append(i)
+        except RecipeImportError as e:
+            results[i]["erro"] = str(e)
+
+    def hit(key, receita_id, titulo):
+        for i in keys[key]:
+            results[i].update(status="EXISTENTE", receita_id=receita_id, titulo=titulo)
+
+    def existing(wanted):
+        return db.execute(
+            select(ImportacaoReceita.url_normalizada, Receita.id, Receita.titulo)
+            .join(Receita, Receita.id == ImportacaoReceita.receita_id)
+            .where(ImportacaoReceita.usuario_id == usuario_id, ImportacaoReceita.url_normalizada.in_(wanted))
+        ).all()
+
+    if keys:
+        for key, receita_id, titulo in existing(list(keys)):
+            hit(key, receita_id, titulo)
+        # a busca pode levar minutos: a conexão não fica "idle in transaction"
+        db.rollback()
+    todo = [k for k in keys if results[keys[k][0]]["status"] != "EXISTENTE"]
+    if not todo:
+        return results
+    parsed, product_names = asyncio.run(_fetch_with_names(fetcher, [urls[keys[k][0]] for k in todo], names))
+
+    receitas, ingredientes, importacoes = [], [], []
+    for key, recipe in zip(todo, parsed):
+        if isinstance(recipe, RecipeImportError):
+            for i in keys[key]:
+                results[i]["erro"] = str(recipe)
+            continue
+        receita_id = uuid.uuid4()
+        receitas.append({
+            "id": receita_id, "usuario_id": usuario_id, "titulo": recipe["titulo"], "descricao": recipe["descricao"],
+            "rendimento_porcoes": recipe["rendimento_porcoes"], "tempo_preparo_min": recipe["tempo_preparo_min"],
+            "compartilhada": False,
+        })
+        for ing in recipe["ingredientes"]:
+            ingredientes.append({
+                "id": uuid.uuid4(), "receita_id": receita_id, "produto_id": product_names.match(ing["nome"]),
+                "nome_livre": ing["nome_livre"], "quantidade": ing["quantidade"], "unidade": ing["unidade"],
+                "observacoes": ing["observacoes"],
+            })
+        importacoes.append({
+            "id": uuid.uuid4(), "receita_id": receita_id, "usuario_id": usuario_id, "fonte": recipe["fonte"],
+            "url": urls[keys[key][0]][:512], "url_normalizada": key,
+        })
+        for i in keys[key]:
+            results[i].update(status="IMPORTADA", receita_id=receita_id, titulo=recipe["titulo"])
+
+    if receitas:
+        # transação só para a gravação em lote
+        db.execute(insert(Receita), receitas)
+        if ingredientes:
+            db.execute(insert(IngredienteReceita), ingredientes)
+        won = set(db.execute(
+            pg_insert(ImportacaoReceita)
+            .values(importacoes)
+            .on_conflict_do_nothing(constraint="uq_importacao_url")
+            .returning(ImportacaoReceita.receita_id)
+        ).scalars())
+        # outro pedido importou a mesma URL enquanto buscávamos: fica a dele
+        lost = {r["url_normalizada"]: r["receita_id"] for r in importacoes if r["receita_id"] not in won}
+        if lost:
+            db.execute(delete(Receita).where(Receita.id.in_(list(lost.values()))))
+            for key, receita_id, titulo in existing(list(lost)):
+                hit(key, receita_id, titulo)
+        db.commit()
+        # insert em lote não passa pelos eventos do ORM
+        recipe_index.invalidate()
+    return results
+
+
+class RecipeImportWorker(JobWorker):
+    """Processa a fila de ImportacaoLote: uma coleção inteira por job.
+
+    A busca roda num event loop próprio da thread do worker (com o pool do
+    RecipeFetcher), fora do loop da API; o pedido HTTP só enfileira.
+    """
+
+    name = "recipe-imports"
+
+    def __init__(self, fetcher: RecipeFetcher, names: ProductNameIndex, poll_s: float = 30, stale_s: float = 1800):
+        super().__init__(poll_s)
+        self.fetcher = fetcher
+        self.names = names
+        self.stale_s = stale_s
+
+    def claim(self, db) -> tuple[uuid.UUID, uuid.UUID, list[str]] | None:
+        now = datetime.now(timezone.utc)
+        next_id = (
+            select(ImportacaoLote.id)
+            .where(or_(
+                ImportacaoLote.status == "PENDENTE",
+                and_(
+                    ImportacaoLote.status == "PROCESSANDO",
+                    ImportacaoLote.iniciado_em < now - timedelta(seconds=self.stale_s),
+                ),
+            ))
+            .order_by(ImportacaoLote.solicitado_em)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        row = db.execute(
+            update(ImportacaoLote)
+            .where(ImportacaoLote.id == next_id)
+            .values(status="PROCESSANDO", iniciado_em=now)
+            .returning(ImportacaoLote.id, ImportacaoLote.usuario_id, ImportacaoLote.urls)
+        ).first()
+        db.commit()
+        return tuple(row) if row else None
+
+    def run_once(self, session_factory: Callable) -> bool:
+        """Processa um pedido; False se a fila estava vazia."""
+        with session_factory() as db:
+            job = self.claim(db)
+            if job is None:
+                return False
+            lote_id, usuario_id, urls = job
+            try:
+                itens = import_recipes(db, usuario_id, urls, self.fetcher, lambda: self.names.get(session_factory))
+                counts = Counter(i["status"] for i in itens)
+                values = {
+                    "status": "CONCLUIDA",
+                    "itens": [{**i, "receita_id": i["receita_id"] and str(i["receita_id"])} for i in itens],
+                    "importadas": counts["IMPORTADA"],
+                    "existentes": counts["EXISTENTE"],
+                    "erros": counts["ERRO"],
+                    "concluido_em": datetime.now(timezone.utc),
+                    "erro": None,
+                }
+                self.done += 1
+            except Exception as e:
+                db.rollback()
+                values = {"status": "ERRO", "erro": str(e)[:500], "concluido_em": datetime.now(timezone.utc)}
+                self.failed += 1
+                self.last_error = str(e)
+            db.execute(update(ImportacaoLote).where(ImportacaoLote.id == lote_id).values(**values))
+            db.commit()
+            return True
+
+    def stats(self) -> dict:
+        return {**super().stats(), **self.fetcher.stats()}
+
+
+recipe_import_worker = RecipeImportWorker(
+    RecipeFetcher(
+        concurrency=settings.RECIPE_IMPORT_CONCURRENCY,
+        per_host=settings.RECIPE_IMPORT_PER_HOST,
+        timeout_s=settings.RECIPE_IMPORT_TIMEOUT_S,
+        max_bytes=settings.RECIPE_IMPORT_MAX_BYTES,
+        allow_private=settings.RECIPE_IMPORT_ALLOW_PRIVATE,
+    ),
+    ProductNameIndex(settings.PRODUCT_SEARCH_HOT_SIZE, settings.PRODUCT_SEARCH_REFRESH_S),
+    poll_s=settings.RECIPE_IMPORT_POLL_S,
+    stale_s=settings.RECIPE_IMPORT_STALE_S,
+)
+
+
+def main() -> int:
+    # worker dedicado: python -m app.services.recipe_import (com RECIPE_IMPORT_WORKER=false na API)
+    from app.db.session import SessionLocal
+
+    recipe_import_worker.run_forever(SessionLocal)
+    print(json.dumps(recipe_import_worker.stats()), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+from __future__ import annotations
+import threading
+import time
+import uuid
+from typing import Callable
+
+import numpy as np
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+
+from app.core.config import settings
+from app.core.units import DESCONHECIDA, to_canonical_array
+from app.db.models.product import Produto
+from app.db.models.recipe import Receita, IngredienteReceita
+
+# colunas da despensa: g, ml, un (dimensões de app.core.units) e "unidade desconhecida"
+PANTRY_COLUMNS = 4
+
+
+class RecipeMatrix:
+    """Ingredientes de todas as receitas em arrays, prontos para pontuar.
+
+    Os ingredientes ficam ordenados por receita (para listar o que falta) e há
+    um índice invertido produto -> ingredientes em formato CSR, então pontuar
+    uma despensa só toca nos ingredientes dos produtos que o usuário tem.
+    """
+
+    def __init__(self, rows: list[dict]):
+        rows = sorted(rows, key=lambda r: r["receita_id"])
+        recipe_pos: dict[uuid.UUID, int] = {}
+        self.recipe_ids: list[uuid.UUID] = []
+        self.titles: list[str] = []
+        owners: list[uuid.UUID] = []
+        shared: list[bool] = []
+        self.product_pos: dict[uuid.UUID, int] = {}
+        self.product_ids: list[uuid.UUID] = []
+        self.product_names: list[str] = []
+
+        ing_recipe, ing_product, all_recipe, mapped = [], [], [], []
+        self.ing_qty: list = []
+        self.ing_unit: list[str | None] = []
+        for r in rows:
+            rpos = recipe_pos.get(r["receita_id"])
+            if rpos is None:
+                rpos = recipe_pos[r["receita_id"]] = len(self.recipe_ids)
+                self.recipe_ids.append(r["receita_id"])
+                self.titles.append(r["titulo"])
+                owners.append(r["usuario_id"])
+                shared.append(bool(r["compartilhada"]))
+            all_recipe.append(rpos)
+            if r["produto_id"] is None:
+                continue  # texto livre sem produto: conta no total, nunca é coberto
+            mapped.append(r)
+            ppos = self.product_pos.get(r["produto_id"])
+            if ppos is None:
+                ppos = self.product_pos[r["produto_id"]] = len(self.product_ids)
+                self.product_ids.append(r["produto_id"])
+                self.product_names.append(r["produto"])
+            ing_recipe.append(rpos)
+            ing_product.append(ppos)
+            self.ing_qty.append(r["quantidade"])
+            self.ing_unit.append(r["unidade"])
+
+        self.ing_recipe = np.asarray(ing_recipe, dtype=np.int64)
+        self.ing_product = np.asarray(ing_product, dtype=np.int64)
+        # todas as quantidades convertidas de uma vez (com densidade/peso do produto)
+        self.ing_dim, self.ing_need = to_canonical_array(
+            self.ing_qty,
+            self.ing_unit,
+            [r.get("densidade_g_ml") for r in mapped],
+            [r.get("peso_unidade_g") for r in mapped],
+        )
+        n_recipes = len(self.recipe_ids)
+        # denominador da cobertura: todos os ingredientes da receita, com ou sem produto
+        self.n_ingredients = np.bincount(np.asarray(all_recipe, dtype=np.int64), minlength=n_recipes)
+        mapped_counts = np.bincount(self.ing_recipe, minlength=n_recipes)
+        self.recipe_offsets = np.concatenate([[0], np.cumsum(mapped_counts)])
+        self.shared = np.asarray(shared, dtype=bool)
+        owner_codes: dict[uuid.UUID, int] = {}
+        self.owner = np.asarray([owner_codes.setdefault(o, len(owner_codes)) for o in owners], dtype=np.int64)
+        self.owner_codes = owner_codes
+
+        # índice invertido produto -> posições dos ingredientes
+        self.by_product = np.argsort(self.ing_product, kind="stable")
+        counts = np.bincount(self.ing_product, minlength=len(self.product_ids))
+        self.product_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def __len__(self) -> int:
+        return len(self.recipe_ids)
+
+    def _have(self, pantry: dict[uuid.UUID, np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+        # produtos da despensa que aparecem em alguma receita: (códigos ordenados, quantidades [n, 4])
+        owned = sorted(self.product_pos[p] for p in pantry if p in self.product_pos)
+        have = np.zeros((len(owned), PANTRY_COLUMNS), dtype=np.float64)
+        for i, code in enumerate(owned):
+            have[i] = pantry[self.product_ids[code]]
+        return np.asarray(owned, dtype=np.int64), have
+
+    def score(self, user_id: uuid.UUID, pantry: dict[uuid.UUID, np.ndarray], limit: int = 20, min_score: float = 0.0):
+        """Cobertura (0..1) das receitas visíveis ao usuário; devolve os `limit` melhores."""
+        if not len(self):
+            return []
+        visible = self.shared.copy()
+        code = self.owner_codes.get(user_id)
+        if code is not None:
+            visible |= self.owner == code
+
+        owned, have = self._have(pantry)
+        coverage = np.zeros(len(self), dtype=np.float64)
+        if len(owned):
+            starts, ends = self.product_offsets[owned], self.product_offsets[owned + 1]
+            idx = np.concatenate([self.by_product[s:e] for s, e in zip(starts, ends)])
+            rows = np.searchsorted(owned, self.ing_product[idx])
+            dims, need = self.ing_dim[idx], self.ing_need[idx]
+            have_dim = have[rows, np.maximum(dims, 0)]
+            any_have = have[rows].sum(axis=1) > 0
+            # mesma dimensão: fração da quantidade pedida; sem como comparar: só presença
+            comparable = (dims >= 0) & (need > 0) & (have_dim > 0)
+            frac = np.where(comparable, np.minimum(1.0, have_dim / np.where(comparable, need, 1.0)), any_have)
+            coverage = np.bincount(self.ing_recipe[idx], weights=frac, minlength=len(self))
+
+        score = coverage / np.maximum(self.n_ingredients, 1)
+        candidates = np.flatnonzero(visible & (score > 0) & (score >= min_score))
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-score[candidates], limit - 1)[:limit]]
+        ranked = sorted(candidates.tolist(), key=lambda r: (-score[r], self.n_ingredients[r], self.titles[r]))
+        return [(r, float(score[r]), self._missing(r, owned, have)) for r in ranked]
+
+    def _missing(self, recipe: int, owned: np.ndarray, have: np.ndarray) -> list[dict]:
+        # só para as receitas devolvidas (poucas): o que falta e quanto
+        missing = []
+        for i in range(self.recipe_offsets[recipe], self.recipe_offsets[recipe + 1]):
+            code = self.ing_product[i]
+            row = np.searchsorted(owned, code)
+            owned_here = row < len(owned) and owned[row] == code
+            dim, need = self.ing_dim[i], self.ing_need[i]
+            amount = have[row] if owned_here else np.zeros(PANTRY_COLUMNS)
+            if dim >= 0 and need > 0 and amount[dim] > 0:
+                falta = need - amount[dim]
+                if falta <= 1e-9:
+                    continue
+            elif amount.sum() > 0:
+                continue
+            else:
+                falta = need if dim >= 0 else None
+            missing.append({
+                "produto_id": self.product_ids[code],
+                "nome": self.product_names[code],
+                "quantidade": self.ing_qty[i],
+                "unidade": self.ing_unit[i],
+                "falta": None if falta is None or np.isnan(falta) else round(float(falta), 3),
+            })
+        return missing
+
+
+def pantry_vectors(rows) -> dict[uuid.UUID, np.ndarray]:
+    """Linhas de pantry.stock_totals_stmt -> quantidades canônicas por produto."""
+    pantry: dict[uuid.UUID, np.ndarray] = {}
+    for produto_id, dimensao, _unidade, total in rows:
+        amounts = pantry.setdefault(produto_id, np.zeros(PANTRY_COLUMNS))
+        column = PANTRY_COLUMNS - 1 if dimensao is None or dimensao == DESCONHECIDA else dimensao
+        amounts[column] += float(total or 0)
+    return pantry
+
+
+def load_rows(db) -> list[dict]:
+    stmt = (
+        select(
+            IngredienteReceita.receita_id, IngredienteReceita.produto_id,
+            IngredienteReceita.quantidade, IngredienteReceita.unidade,
+            Receita.titulo, Receita.usuario_id, Receita.compartilhada,
+            Produto.nome.label("produto"), Produto.densidade_g_ml, Produto.peso_unidade_g,
+        )
+        .join(Receita, Receita.id == IngredienteReceita.receita_id)
+        .outerjoin(Produto, Produto.id == IngredienteReceita.produto_id)
+    )
+    return [dict(row._mapping) for row in db.execute(stmt)]
+
+
+class RecipeIndex:
+    """Mantém o RecipeMatrix atual; refaz quando receitas mudam ou pelo TTL.
+
+    Só a primeira montagem faz o request esperar. Depois, o rebuild roda numa
+    thread enquanto os requests seguem com a matriz anterior, e mudanças
+    seguidas (qualquer usuário salvando receitas) viram no máximo um rebuild a
+    cada `min_interval_s`.
+    """
+
+    def __init__(self, ttl_s: float = 300, min_interval_s: float = 5):
+        self.ttl_s = ttl_s
+        self.min_interval_s = min_interval_s
+        self._lock = threading.Lock()  # estado
+        self._build_lock = threading.Lock()  # um rebuild por vez
+        self._matrix: RecipeMatrix | None = None
+        self._built_at = 0.0
+        self._dirty = True
+        self._refreshing = False
+        self.builds = 0
+        self.load_error: str | None = None
+
+    def invalidate(self):
+        self._dirty = True
+
+    def _build(self, session_factory: Callable):
+        with self._lock:
+            self._dirty = False
+        try:
+            with session_factory() as db:
+                matrix = RecipeMatrix(load_rows(db))
+        except Exception:
+            self._dirty = True
+            raise
+        with self._lock:
+            self._matrix = matrix
+            self._built_at = time.time()
+            self.builds += 1
+
+    def _refresh(self, session_factory: Callable):
+        try:
+            with self._build_lock:
+                self._build(session_factory)
+            self.load_error = None
+        except Exception as e:
+            self.load_error = str(e)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def get(self, session_factory: Callable) -> RecipeMatrix:
+        # síncrono (chamar no threadpool)
+        with self._lock:
+            matrix = self._matrix
+            if matrix is not None:
+                age = time.time() - self._built_at
+                due = age > self.ttl_s or (self._dirty and age >= self.min_interval_s)
+                if due and not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(
+                        target=self._refresh, args=(session_factory,), name="recipe-index", daemon=True
+                    ).start()
+                return matrix
+        with self._build_lock:
+            if self._matrix is None:
+                self._build(session_factory)
+            return self._matrix
+
+    def stats(self) -> dict:
+        matrix = self._matrix
+        return {
+            "recipes": len(matrix) if matrix else 0,
+            "ingredients": len(matrix.ing_recipe) if matrix else 0,
+            "builds": self.builds,
+            "dirty": self._dirty,
+            "refreshing": self._refreshing,
+            "load_error": self.load_error,
+        }
+
+
+recipe_index = RecipeIndex(settings.RECIPE_INDEX_TTL_S, settings.RECIPE_INDEX_MIN_INTERVAL_S)
+
+
+@event.listens_for(Receita, "after_insert")
+@event.listens_for(Receita, "after_update")
+@event.listens_for(Receita, "after_delete")
+@event.listens_for(IngredienteReceita, "after_insert")
+@event.listens_for(IngredienteReceita, "after_update")
+@event.listens_for(IngredienteReceita, "after_delete")
+@event.listens_for(Produto, "after_update")  # densidade/peso mudam a conversão
+def _invalidate_recipes(_mapper, _connection, target):
+    recipe_index.invalidate()
+    # de novo no commit: um rebuild entre o flush e o commit leria dados antigos
+    session = object_session(target)
+    if session is not None:
+        session.info["recipes_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop("recipes_changed", False):
+        recipe_index.invalidate()
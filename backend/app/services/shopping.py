@@ -0,0 +1,139 @@
+from __future__ import annotations
+import math
+import uuid
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+
+from app.core.text import normalize
+from app.core.units import CONTAGEM, DESCONHECIDA, MASSA, from_canonical, to_canonical_array
+
+_MILESIMO = Decimal("0.001")
+
+
+def _quantize(value: float) -> Decimal:
+    return Decimal(str(value)).quantize(_MILESIMO, rounding=ROUND_HALF_UP)
+
+
+def plan_requirements(refeicoes, porcoes: int | None = None) -> tuple[dict[tuple, float], dict[str, str]]:
+    """Soma o que o cardápio pede, por produto e dimensão (g/ml/un).
+
+    Cada receita é escalada por porcoes / rendimento_porcoes (sem `porcoes`,
+    vale o rendimento da receita). Ingredientes com unidade desconhecida
+    somam separados, pela unidade original; os sem produto, pelo nome
+    normalizado (o segundo dict guarda o nome como foi escrito).
+    """
+    refs, quantidades, unidades, densidades, pesos, factors = [], [], [], [], [], []
+    labels: dict[str, str] = {}
+    for refeicao in refeicoes:
+        for receita in refeicao.receitas:
+            factor = (porcoes / receita.rendimento_porcoes) if porcoes and receita.rendimento_porcoes else 1.0
+            for ing in receita.ingredientes:
+                if ing.quantidade is None:
+                    continue
+                ref = ing.produto_id or normalize(ing.nome_livre)
+                if not ref:
+                    continue
+                if ing.produto_id is None:
+                    labels.setdefault(ref, ing.nome_livre.strip())
+                produto = getattr(ing, "produto", None)
+                refs.append(ref)
+                quantidades.append(ing.quantidade)
+                unidades.append(ing.unidade)
+                densidades.append(produto.densidade_g_ml if produto is not None else None)
+                pesos.append(produto.peso_unidade_g if produto is not None else None)
+                factors.append(factor)
+
+    # conversão de todas as linhas de uma vez; o laço abaixo só agrupa
+    dims, values = to_canonical_array(quantidades, unidades, densidades, pesos)
+    values = values * np.asarray(factors, dtype=np.float64)
+    need: dict[tuple, float] = {}
+    for ref, dim, value, quantidade, unidade, factor in zip(refs, dims.tolist(), values.tolist(), quantidades, unidades, factors):
+        if dim == DESCONHECIDA:
+            key, value = (ref, (unidade or "").strip().upper()), float(quantidade) * factor
+        else:
+            key = (ref, dim)
+        need[key] = need.get(key, 0.0) + value
+    return need, labels
+
+
+def stock_amounts(rows) -> dict[tuple, float]:
+    """Linhas de pantry.stock_totals_stmt -> mesma chave de plan_requirements."""
+    return {
+        (produto_id, dimensao if dimensao is not None else (unidade or "")): float(total)
+        for produto_id, dimensao, unidade, total in rows
+    }
+
+
+def shopping_items(
+    need: dict[tuple, float],
+    have: dict[tuple, float],
+    labels: dict[str, str] | None = None,
+    pesos: dict | None = None,
+) -> list[dict]:
+    """Linhas de ItemLista: o que falta depois de descontar o estoque.
+
+    Produtos com peso por unidade (`pesos`, em g) voltam a ser pedidos em UN.
+    """
+    labels = labels or {}
+    pesos = pesos or {}
+    items = []
+    for (ref, dim), amount in need.items():
+        missing = amount - have.get((ref, dim), 0.0)
+        if missing <= 1e-9:
+            continue
+        if isinstance(dim, int):
+            if dim == MASSA and pesos.get(ref):
+                dim, missing = CONTAGEM, missing / float(pesos[ref])
+            if dim == CONTAGEM:
+                missing = math.ceil(missing - 1e-9)  # não se compra meio ovo
+            quantidade, unidade = from_canonical(dim, missing)
+        else:
+            quantidade, unidade = missing, dim or None
+        items.append({
+            "produto_id": ref if isinstance(ref, uuid.UUID) else None,
+            "nome_livre": None if isinstance(ref, uuid.UUID) else labels.get(ref, ref),
+            "quantidade": _quantize(quantidade),
+            "unidade": unidade,
+        })
+    return items
+
+
+def compare_markets(rows) -> dict:
+    """Custo da lista por mercado, a partir das linhas (item, produto, mercado, nome, estimado).
+
+    Um item sem preço em nenhum mercado vem com mercado None. O mais barato é o
+    que tem preço para mais itens e, no empate, o menor total; cada item recebe
+    o preço desse mercado ou, se ele não vende o produto, o melhor que houver.
+    """
+    itens: dict[uuid.UUID, dict] = {}
+    mercados: dict[uuid.UUID, dict] = {}
+    for item_id, produto_id, mercado_id, nome, estimado in rows:
+        if item_id is None:
+            continue
+        item = itens.setdefault(item_id, {"item_id": item_id, "produto_id": produto_id, "precos": {}})
+        if mercado_id is None or estimado is None:
+            continue
+        item["precos"][mercado_id] = estimado
+        m = mercados.setdefault(mercado_id, {"mercado_id": mercado_id, "nome": nome, "total": Decimal(0), "itens_cobertos": 0})
+        m["total"] += estimado
+        m["itens_cobertos"] += 1
+
+    for m in mercados.values():
+        m["itens_sem_preco"] = len(itens) - m["itens_cobertos"]
+    ranking = sorted(mercados.values(), key=lambda m: (-m["itens_cobertos"], m["total"], m["nome"]))
+    best = ranking[0]["mercado_id"] if ranking else None
+
+    out = []
+    for item in itens.values():
+        precos = item.pop("precos")
+        melhor = min(precos.items(), key=lambda p: p[1]) if precos else (None, None)
+        mercado_id = best if best in precos else melhor[0]
+        out.append({
+            **item,
+            "mercado_id": mercado_id,
+            "preco_estimado": precos.get(mercado_id),
+            "melhor_mercado_id": melhor[0],
+            "melhor_preco": melhor[1],
+        })
+    return {"itens": out, "mercados": ranking, "mais_barato": ranking[0] if ranking else None}
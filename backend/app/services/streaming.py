@@ -0,0 +1,133 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+
+from app.services.audio import SAMPLE_RATE
+
+
+MAX_SPEECH_S = 30
+
+
+def detect_speech(audio: np.ndarray, min_silence_ms: int = 500) -> list[dict]:
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+    return get_speech_timestamps(audio, VadOptions(min_silence_duration_ms=min_silence_ms, max_speech_duration_s=MAX_SPEECH_S))
+
+
+def pcm16_to_float32(chunk: bytes) -> np.ndarray:
+    if len(chunk) % 2:
+        chunk = chunk[:-1]
+    return np.frombuffer(chunk, dtype="<i2").astype(np.float32) / 32768.0
+
+
+@dataclass
+class SpeechSegment:
+    audio: np.ndarray
+    start: float  # segundos desde o início do stream
+    end: float
+
+
+class StreamingSession:
+    """Acumula o áudio PCM recebido e corta segmentos de fala pelo VAD.
+
+    Um segmento é finalizado quando depois dele já existe `min_silence_ms` de
+    silêncio; o trecho de fala ainda aberto pode ser lido como parcial (só os
+    últimos `max_partial_s`, para a parcial não crescer com a fala).
+
+    O VAD roda só sobre o áudio novo mais `overlap_ms` do já visto; trechos de
+    fala que cruzam a emenda são unidos se o intervalo for menor que o silêncio
+    mínimo.
+    """
+
+    def __init__(
+        self,
+        vad: Callable[[np.ndarray], list[dict]] = detect_speech,
+        sample_rate: int = SAMPLE_RATE,
+        min_silence_ms: int = 500,
+        partial_interval_s: float = 1.0,
+        max_partial_s: float = 10.0,
+        overlap_ms: int = 1000,
+    ):
+        self.vad = vad
+        self.sample_rate = sample_rate
+        self.min_silence = int(sample_rate * min_silence_ms / 1000)
+        self.partial_interval = int(sample_rate * partial_interval_s)
+        self.max_partial = int(sample_rate * max_partial_s)
+        self.max_speech = int(sample_rate * MAX_SPEECH_S)
+        self.overlap = max(int(sample_rate * overlap_ms / 1000), self.min_silence)
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._offset = 0  # amostras já descartadas do início do buffer
+        self._last_partial = 0  # tamanho do buffer na última parcial
+        self._open_start: int | None = None  # início da fala ainda não finalizada
+        self._speech: list[dict] = []  # fala achada em buffer[:_scanned]
+        self._scanned = 0
+        self.total_samples = 0
+
+    def feed(self, chunk: bytes):
+        samples = pcm16_to_float32(chunk)
+        self._buffer = np.concatenate([self._buffer, samples])
+        self.total_samples += len(samples)
+
+    def _segment(self, start: int, end: int) -> SpeechSegment:
+        return SpeechSegment(
+            audio=self._buffer[start:end],
+            start=(self._offset + start) / self.sample_rate,
+            end=(self._offset + end) / self.sample_rate,
+        )
+
+    def _drop(self, upto: int):
+        self._buffer = self._buffer[upto:]
+        self._offset += upto
+        self._last_partial = max(0, self._last_partial - upto)
+        self._scanned = max(0, self._scanned - upto)
+        self._speech = [
+            {"start": s["start"] - upto, "end": s["end"] - upto} for s in self._speech if s["end"] > upto
+        ]
+
+    def _scan(self) -> list[dict]:
+        start = max(0, self._scanned - self.overlap)
+        kept = [s for s in self._speech if s["start"] < start]
+        fresh = [{"start": s["start"] + start, "end": s["end"] + start} for s in self.vad(self._buffer[start:])]
+        if kept and fresh:
+            last = kept[-1]
+            if fresh[0]["start"] - last["end"] < self.min_silence and fresh[0]["end"] - last["start"] <= self.max_speech:
+                fresh[0] = {"start": last["start"], "end": max(last["end"], fresh[0]["end"])}
+                kept.pop()
+        self._speech = kept + fresh
+        self._scanned = len(self._buffer)
+        return self._speech
+
+    def pop_finished(self) -> list[SpeechSegment]:
+        if not len(self._buffer):
+            return []
+        speech = self._scan()
+        done = [s for s in speech if len(self._buffer) - s["end"] >= self.min_silence]
+        segments = [self._segment(s["start"], s["end"]) for s in done]
+        cut = 0
+        if done:
+            cut = done[-1]["end"]
+        elif not speech and len(self._buffer) > self.min_silence:
+            # só silêncio: não precisa guardar mais que a janela do VAD
+            cut = len(self._buffer) - self.min_silence
+        self._open_start = speech[len(done)]["start"] - cut if len(speech) > len(done) else None
+        if cut:
+            self._drop(cut)
+        return segments
+
+    def take_partial(self) -> SpeechSegment | None:
+        if self._open_start is None:
+            return None
+        if len(self._buffer) - self._last_partial < self.partial_interval:
+            return None
+        self._last_partial = len(self._buffer)
+        return self._segment(max(self._open_start, len(self._buffer) - self.max_partial), len(self._buffer))
+
+    def flush(self) -> SpeechSegment | None:
+        if not len(self._buffer):
+            return None
+        speech = self._scan()
+        segment = self._segment(speech[0]["start"], speech[-1]["end"]) if speech else None
+        self._drop(len(self._buffer))
+        self._open_start = None
+        return segment
@@ -0,0 +1,452 @@
+from __future__ import annotations
+import asyncio
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+import numpy as np
+
+BEAM_SIZE = 5
+
+# Mesma decodificação com e sem batch: o BatchedInferencePipeline só usa uma
+# temperatura (sem fallback) e decodifica cada trecho isolado, então o caminho
+# individual segue as mesmas regras para o texto não depender do agrupamento.
+DECODE_OPTIONS = {
+    "beam_size": BEAM_SIZE,
+    "temperature": 0.0,
+    "condition_on_previous_text": False,
+    "without_timestamps": True,
+}
+# trechos de fala de no máximo uma janela do modelo (30 s), cortados em pausas curtas
+VAD_PARAMETERS = {"max_speech_duration_s": 30, "min_silence_duration_ms": 160}
+
+# modelo carregado dentro de cada processo worker (modo "process")
+_worker_model = None
+
+
+def load_model(size: str, compute_type: str):
+    from faster_whisper import WhisperModel
+    return WhisperModel(size, compute_type=compute_type)
+
+
+def run_transcription(model, audio: Any, language: str | None) -> str:
+    # o gerador de segmentos é consumido aqui, ainda dentro do worker
+    segments, _info = model.transcribe(
+        audio, language=language, vad_filter=True, vad_parameters=VAD_PARAMETERS, **DECODE_OPTIONS
+    )
+    return " ".join(s.text for s in segments).strip()
+
+
+def run_batched_transcription(model, audios: list, language: str) -> list[str]:
+    # Junta os trechos de fala (VAD) de vários áudios num único batch do
+    # BatchedInferencePipeline e devolve o texto de cada áudio na ordem recebida.
+    from faster_whisper import BatchedInferencePipeline, decode_audio
+    from faster_whisper.audio import pad_or_trim
+    from faster_whisper.tokenizer import Tokenizer
+    from faster_whisper.transcribe import TranscriptionOptions, get_suppressed_tokens
+    from faster_whisper.vad import VadOptions, collect_chunks, get_speech_timestamps
+
+    extractor = model.feature_extractor
+    chunk_length = extractor.chunk_length
+    vad = VadOptions(**VAD_PARAMETERS)
+
+    features, metadata, owners = [], [], []
+    for idx, audio in enumerate(audios):
+        if not isinstance(audio, np.ndarray):
+            audio = decode_audio(audio, sampling_rate=extractor.sampling_rate)
+        clips = get_speech_timestamps(audio, vad)
+        if not clips:
+            continue
+        chunks, chunks_metadata = collect_chunks(audio, clips, max_duration=chunk_length)
+        for chunk, meta in zip(chunks, chunks_metadata):
+            features.append(pad_or_trim(extractor(chunk)[..., :-1]))
+            metadata.append(meta)
+            owners.append(idx)
+
+    texts: list[list[str]] = [[] for _ in audios]
+    if not features:
+        return ["" for _ in audios]
+
+    tokenizer = Tokenizer(model.hf_tokenizer, model.model.is_multilingual, task="transcribe", language=language)
+    options = TranscriptionOptions(
+        beam_size=DECODE_OPTIONS["beam_size"],
+        best_of=5,
+        patience=1,
+        length_penalty=1,
+        repetition_penalty=1,
+        no_repeat_ngram_size=0,
+        log_prob_threshold=-1.0,
+        no_speech_threshold=0.6,
+        compression_ratio_threshold=2.4,
+        condition_on_previous_text=DECODE_OPTIONS["condition_on_previous_text"],
+        prompt_reset_on_temperature=0.5,
+        temperatures=[DECODE_OPTIONS["temperature"]],
+        initial_prompt=None,
+        prefix=None,
+        suppress_blank=True,
+        suppress_tokens=get_suppressed_tokens(tokenizer, [-1]),
+        without_timestamps=DECODE_OPTIONS["without_timestamps"],
+        max_initial_timestamp=1.0,
+        word_timestamps=False,
+        prepend_punctuations="\"'“¿([{-",
+        append_punctuations="\"'.。,，!！?？:：”)]}、",
+        multilingual=False,
+        max_new_tokens=None,
+        clip_timestamps=[],
+        hallucination_silence_threshold=None,
+        hotwords=None,
+    )
+    outputs = BatchedInferencePipeline(model).forward(np.stack(features), tokenizer, metadata, options)
+    for owner, segments in zip(owners, outputs):
+        texts[owner].extend(s["text"] for s in segments)
+    return [" ".join(t).strip() for t in texts]
+
+
+def warm_up(model):
+    # 1 s de silêncio sem VAD, para forçar encoder + decoder a rodarem uma vez
+    segments, _info = model.transcribe(np.zeros(16000, dtype=np.float32), language="pt", vad_filter=False, beam_size=BEAM_SIZE)
+    list(segments)
+
+
+def run_batch(model, audios: list, language: str | None) -> list[str]:
+    if len(audios) == 1 or language is None:
+        return [run_transcription(model, a, language) for a in audios]
+    return run_batched_transcription(model, audios, language)
+
+
+def _init_process_worker(size: str, compute_type: str):
+    global _worker_model
+    _worker_model = load_model(size, compute_type)
+
+
+def _warm_up_in_process(enabled: bool) -> bool:
+    if enabled:
+        warm_up(_worker_model)
+    return True
+
+
+def _run_batch_in_process(audios: list, language: str | None) -> list[str]:
+    return run_batch(_worker_model, audios, language)
+
+
+class EngineBusy(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Fila de transcrição cheia")
+        self.retry_after = retry_after
+
+
+class TranscriptionEngine:
+    """Executa a inferência do Whisper fora do event loop, com fila limitada.
+
+    O modelo só é carregado em `start()`, numa thread de fundo; até lá os
+    pedidos recebem EngineBusy. Pedidos que chegam dentro de `batch_window_ms` (até `max_batch_size`, mesmo
+    idioma) são agrupados e rodam numa única chamada batched do modelo.
+    """
+
+    def __init__(
+        self,
+        model_size: str,
+        compute_type: str,
+        workers: int = 1,
+        max_queue: int = 8,
+        mode: str = "thread",
+        retry_after: int = 5,
+        max_batch_size: int = 1,
+        batch_window_ms: int = 0,
+        model_loader: Callable[[str, str], Any] = load_model,
+        batch_runner: Callable[[Any, list, str | None], list[str]] = run_batch,
+    ):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Executor de transcrição inválido: {mode}")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_window = max(0, batch_window_ms) / 1000
+
+        self._lock = threading.Lock()
+        self._pending = 0  # na fila + em execução
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._batches = 0
+        self._batch_sizes: Counter[int] = Counter()
+
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self._model = None
+        self._model_loader = model_loader
+        self._batch_runner = batch_runner
+        self._ready = threading.Event()
+        self._loader: threading.Thread | None = None
+        self.load_error: str | None = None
+        self._executor: Executor
+        if mode == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_process_worker,
+                initargs=(model_size, compute_type),
+            )
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="whisper")
+
+        # um slot por worker: o dispatcher só monta um batch quando há worker livre,
+        # então sob carga os pedidos se acumulam e formam batches maiores
+        self._slots = threading.Semaphore(self.workers)
+        self._queue: queue.Queue = queue.Queue()
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="whisper-dispatch", daemon=True)
+        self._dispatcher.start()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def start(self, warm_up: bool = False) -> threading.Thread:
+        if self._loader is None:
+            self._loader = threading.Thread(target=self._load, args=(warm_up,), name="whisper-load", daemon=True)
+            self._loader.start()
+        return self._loader
+
+    def _load(self, do_warm_up: bool):
+        try:
+            if self.mode == "process":
+                # sobe os processos (o initializer carrega o modelo em cada um)
+                jobs = [self._executor.submit(_warm_up_in_process, do_warm_up) for _ in range(self.workers)]
+                for job in jobs:
+                    job.result()
+            else:
+                self._model = self._model_loader(self.model_size, self.compute_type)
+                if do_warm_up:
+                    warm_up(self._model)
+            self._ready.set()
+        except Exception as e:
+            self.load_error = str(e)
+
+    def _acquire(self):
+        if not self.ready:
+            raise EngineBusy(self.retry_after)
+        with self._lock:
+            if self._pending >= self.workers * self.max_batch_size + self.max_queue:
+                self._rejected += 1
+                raise EngineBusy(self.retry_after)
+            self._pending += 1
+
+    def _release(self, fut: Future):
+        # roda quando o pedido termina de fato, mesmo se o cliente já desconectou
+        with self._lock:
+            self._pending -= 1
+            if fut.cancelled() or fut.exception() is not None:
+                self._failed += 1
+            else:
+                self._completed += 1
+
+    def submit(self, audio: Any, language: str | None = None) -> Future:
+        self._acquire()
+        fut: Future = Future()
+        fut.add_done_callback(self._release)
+        self._queue.put((audio, language, fut))
+        return fut
+
+    async def transcribe(self, audio: Any, language: str | None = None) -> str:
+        return await asyncio.wrap_future(self.submit(audio, language))
+
+    def _collect(self, first) -> list:
+        # sem janela, ainda aproveita o que já estiver esperando na fila
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _dispatch_loop(self):
+        while True:
+            self._slots.acquire()
+            first = self._queue.get()
+            if first is None:
+                return
+            groups: dict[Any, list] = {}
+            for item in self._collect(first):
+                _audio, language, fut = item
+                if not fut.set_running_or_notify_cancel():
+                    continue  # cliente desistiu antes de entrar no batch
+                # idioma automático não dá para agrupar: cada áudio vai sozinho
+                key = language if language is not None else object()
+                groups.setdefault(key, []).append(item)
+            if not groups:
+                self._slots.release()
+                continue
+            for n, items in enumerate(groups.values()):
+                if n:
+                    self._slots.acquire()
+                self._run_group(items)
+
+    def _run_group(self, items: list):
+        audios = [audio for audio, _, _ in items]
+        language = items[0][1]
+        with self._lock:
+            self._in_flight += len(items)
+            self._batches += 1
+            self._batch_sizes[len(items)] += 1
+        try:
+            if self.mode == "process":
+                job = self._executor.submit(_run_batch_in_process, audios, language)
+            else:
+                job = self._executor.submit(self._batch_runner, self._model, audios, language)
+        except Exception as e:
+            job = Future()
+            job.set_exception(e)
+        job.add_done_callback(partial(self._finish_group, items))
+
+    def _finish_group(self, items: list, job: Future):
+        self._slots.release()
+        with self._lock:
+            self._in_flight -= len(items)
+        error = job.exception() if not job.cancelled() else RuntimeError("Transcrição cancelada")
+        if error is None:
+            texts = job.result()
+            if not isinstance(texts, list) or len(texts) != len(items):
+                # sem o texto de cada áudio não dá para saber de quem é cada resultado
+                got = len(texts) if isinstance(texts, list) else type(texts).__name__
+                error = RuntimeError(f"Batch devolveu {got} resultados para {len(items)} áudios")
+        for n, (_audio, _language, fut) in enumerate(items):
+            if error is not None:
+                fut.set_exception(error)
+            else:
+                fut.set_result(texts[n])
+
+    def stats(self) -> dict:
+        with self._lock:
+            batches = self._batches
+            return {
+                "mode": self.mode,
+                "ready": self.ready,
+                "model": self.model_size,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queue_depth": self._pending - self._in_flight,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "max_batch_size": self.max_batch_size,
+                "batch_window_ms": int(self.batch_window * 1000),
+                "batches": batches,
+                "avg_batch_size": (sum(k * v for k, v in self._batch_sizes.items()) / batches) if batches else 0.0,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+            }
+
+    def shutdown(self):
+        self._queue.put(None)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ModelTiers:
+    """Vários tamanhos de modelo (do mais rápido ao mais preciso) e a política de escolha.
+
+    Cada tier tem seu próprio engine, criado e carregado só no primeiro uso.
+    """
+
+    def __init__(
+        self,
+        sizes: list[str],
+        engine_factory: Callable[[str], TranscriptionEngine],
+        default: str,
+        short_s: float = 5,
+        long_s: float = 30,
+        warm_up: bool = False,
+    ):
+        self.sizes = list(sizes) or [default]
+        if default not in self.sizes:
+            self.sizes.append(default)
+        self.default = default
+        self.short_s = short_s
+        self.long_s = long_s
+        self.warm_up = warm_up
+        self._factory = engine_factory
+        self._lock = threading.Lock()
+        self._engines: dict[str, TranscriptionEngine] = {}
+        self._routed: Counter[str] = Counter()
+
+    def engine(self, size: str) -> TranscriptionEngine:
+        with self._lock:
+            engine = self._engines.get(size)
+            if engine is None:
+                engine = self._engines[size] = self._factory(size)
+                engine.start(warm_up=self.warm_up)
+            return engine
+
+    def start(self):
+        self.engine(self.default)
+
+    @property
+    def ready(self) -> bool:
+        engine = self._engines.get(self.default)
+        return engine is not None and engine.ready
+
+    @property
+    def load_error(self) -> str | None:
+        engine = self._engines.get(self.default)
+        return engine.load_error if engine else None
+
+    def _saturated(self, size: str) -> bool:
+        engine = self._engines.get(size)
+        if engine is None or not engine.ready:
+            return False
+        return engine.stats()["queue_depth"] >= engine.workers * engine.max_batch_size
+
+    def choose(self, duration_s: float, language: str | None, override: str | None = None) -> str:
+        if override:
+            if override not in self.sizes:
+                raise ValueError(f"Modelo inválido: {override}. Opções: {', '.join(self.sizes)}")
+            chosen = override
+        else:
+            last = len(self.sizes) - 1
+            if duration_s <= self.short_s:
+                idx = 0
+            elif duration_s <= self.long_s:
+                idx = last // 2
+            else:
+                idx = last
+            if language is None:
+                # detecção automática de idioma é fraca nos modelos menores
+                idx = min(idx + 1, last)
+            # fila cheia no tier escolhido: desce para um modelo mais rápido
+            while idx > 0 and self._saturated(self.sizes[idx]):
+                idx -= 1
+            chosen = self.sizes[idx]
+            if not self.engine(chosen).ready:
+                # ainda carregando: usa o tier pronto mais próximo, se houver
+                ready = [s for s in self.sizes if s in self._engines and self._engines[s].ready]
+                if ready:
+                    chosen = min(ready, key=lambda s: abs(self.sizes.index(s) - idx))
+        with self._lock:
+            self._routed[chosen] += 1
+        return chosen
+
+    def stats(self) -> dict:
+        with self._lock:
+            engines = dict(self._engines)
+            routed = dict(self._routed)
+        return {
+            "default": self.default,
+            "routed": routed,
+            "tiers": {s: engines[s].stats() if s in engines else {"loaded": False} for s in self.sizes},
+        }
+
+    def shutdown(self):
+        for engine in list(self._engines.values()):
+            engine.shutdown()
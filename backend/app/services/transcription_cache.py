@@ -0,0 +1,162 @@
+from __future__ import annotations
+import contextlib
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, BinaryIO
+
+
+def hash_upload(file: BinaryIO, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    file.seek(0)
+    for block in iter(lambda: file.read(block_size), b""):
+        h.update(block)
+    file.seek(0)
+    return h.hexdigest()
+
+
+def cache_key(audio_digest: str, language: str | None, model_size: str, **params) -> str:
+    # parâmetros de decodificação entram na chave: mudar beam_size invalida o cache
+    extra = ",".join(f"{k}={params[k]}" for k in sorted(params))
+    raw = f"{audio_digest}|{language or 'auto'}|{model_size}|{extra}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class TranscriptionCache:
+    """Cache de transcrições: LRU em memória + camada opcional em disco.
+
+    Também junta pedidos idênticos em andamento (retries do app), para que
+    o mesmo áudio não rode duas inferências ao mesmo tempo. O disco também é
+    um LRU (por entradas); get/put nele bloqueiam, então chame no threadpool.
+    """
+
+    def __init__(self, max_entries: int = 1024, disk_dir: str | None = None, max_disk_entries: int = 10000):
+        self.max_entries = max(0, max_entries)
+        self.max_disk_entries = max(0, max_disk_entries)
+        self.disk_dir = disk_dir
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, Any] = OrderedDict()
+        self._disk: OrderedDict[str, None] = OrderedDict()  # chaves em disco, da menos recente à mais
+        self._inflight: dict[str, Future] = {}
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.inflight_hits = 0
+        self.misses = 0
+        self.disk_evictions = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _load_disk_index(self):
+        # o que sobrou do processo anterior, pela data de uso
+        found = []
+        for sub in os.scandir(self.disk_dir):
+            if sub.is_dir():
+                for entry in os.scandir(sub.path):
+                    if entry.name.endswith(".json"):
+                        found.append((entry.stat().st_mtime, entry.name[:-5]))
+        for _mtime, key in sorted(found):
+            self._disk[key] = None
+        self._evict_disk()
+
+    def _evict_disk(self):
+        while len(self._disk) > self.max_disk_entries:
+            key, _ = self._disk.popitem(last=False)
+            self.disk_evictions += 1
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self._path(key))
+
+    def _remember(self, key: str, value: Any):
+        if not self.max_entries:
+            return
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return value
+        if self.disk_dir:
+            path = self._path(key)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    value = json.load(f)
+                os.utime(path)  # LRU sobrevive a restarts
+            except (FileNotFoundError, ValueError):
+                value = None
+            if value is not None:
+                with self._lock:
+                    self._remember(key, value)
+                    self._disk[key] = None
+                    self._disk.move_to_end(key)
+                    self.disk_hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._remember(key, value)
+        if self.disk_dir and self.max_disk_entries:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp, path)
+            with self._lock:
+                self._disk[key] = None
+                self._disk.move_to_end(key)
+                self._evict_disk()
+
+    def reserve(self, key: str) -> tuple[Future, bool]:
+        """Future da transcrição de `key` e se quem chamou deve produzi-la.
+
+        Verificar e registrar acontecem sob o mesmo lock: de dois pedidos
+        idênticos simultâneos, só um recebe True. O dono resolve o Future
+        (set_result/set_exception); o resultado vai para o cache e a chave
+        sai dos pendentes, com sucesso ou erro.
+        """
+        with self._lock:
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self.inflight_hits += 1
+                return fut, False
+            fut = Future()
+            self._inflight[key] = fut
+
+        def done(f: Future):
+            with self._lock:
+                self._inflight.pop(key, None)
+            if not f.cancelled() and f.exception() is None:
+                self.put(key, f.result())
+
+        fut.add_done_callback(done)
+        return fut, True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "disk": bool(self.disk_dir),
+                "disk_entries": len(self._disk),
+                "max_disk_entries": self.max_disk_entries,
+                "disk_evictions": self.disk_evictions,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "inflight_hits": self.inflight_hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,69 @@
+from __future__ import annotations
+import uuid
+
+from sqlalchemy import Table, select
+
+from app.db.models import (
+    User, Consentimento, ExportacaoDados, ExclusaoConta, RefreshToken,
+    LocalEstoque, ItemEstoque, SaldoEstoque, MovimentoEstoque,
+    Receita, IngredienteReceita, ImportacaoReceita, ImportacaoLote, Playlist, Cardapio, Refeicao,
+    ListaCompras, ItemLista, AnexoMidia, LeituraOCR,
+)
+from app.db.models.recipe import playlist_receita, refeicao_receita
+from app.db.models.settings import UserSettings
+
+# Tabelas com dados de um usuário, pais antes dos filhos. O segundo elemento é
+# o caminho até a tabela que tem a coluna do dono (ex.: movimento -> item).
+# MobileDevice fica de fora enquanto a rota de devices estiver desligada.
+OWNED_TABLES: tuple[tuple[Table, tuple[Table, ...]], ...] = tuple(
+    (t.__table__ if hasattr(t, "__table__") else t, tuple(v.__table__ for v in via))
+    for t, via in (
+        (User, ()),
+        (UserSettings, ()),
+        (Consentimento, ()),
+        (ExportacaoDados, ()),
+        (ExclusaoConta, ()),
+        (RefreshToken, ()),
+        (LocalEstoque, ()),
+        (ItemEstoque, ()),
+        (SaldoEstoque, (ItemEstoque,)),
+        (MovimentoEstoque, (ItemEstoque,)),
+        (Receita, ()),  # compartilhadas em uso por outros ficam sem autor antes (account_deletion)
+        (IngredienteReceita, (Receita,)),
+        (ImportacaoReceita, (Receita,)),
+        (ImportacaoLote, ()),
+        (Playlist, ()),
+        (playlist_receita, (Playlist,)),
+        (Cardapio, ()),
+        (Refeicao, (Cardapio,)),
+        (refeicao_receita, (Refeicao, Cardapio)),
+        (ListaCompras, ()),
+        (ItemLista, (ListaCompras,)),
+        (AnexoMidia, ()),
+        (LeituraOCR, (AnexoMidia,)),
+    )
+)
+
+
+def owner_column(table: Table):
+    if table.name == "users":
+        return table.c.id
+    return table.c.usuario_id if "usuario_id" in table.c else table.c.user_id
+
+
+def owned_filter(table: Table, via: tuple[Table, ...], user_id: uuid.UUID):
+    """Condição "linha de `table` pertence ao usuário", subindo pelo caminho `via`.
+
+    Cada passo vira um IN (SELECT ...) pela FK, então serve tanto para SELECT
+    quanto para DELETE.
+    """
+    path = (table, *via)
+    cond = owner_column(path[-1]) == user_id
+    for child, parent in reversed(list(zip(path, path[1:]))):
+        fk = next(fk for fk in child.foreign_keys if fk.column.table is parent)
+        cond = fk.parent.in_(select(fk.column).where(cond))
+    return cond
+
+
+def owned_rows_stmt(table: Table, via: tuple[Table, ...], user_id: uuid.UUID, exclude: frozenset[str] = frozenset()):
+    return select(*[c for c in table.c if c.name not in exclude]).where(owned_filter(table, via, user_id))
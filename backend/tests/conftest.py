@@ -0,0 +1,30 @@
+import os
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import app.db.models  # noqa: F401  registra as tabelas
+import app.db.models.settings  # noqa: F401
+from app.db.base import Base
+
+
+@pytest.fixture
+def pg():
+    """Engine num schema descartável de um Postgres de teste (TEST_DATABASE_URL)."""
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL não definido")
+    admin = create_engine(url)
+    schema = f"t_{uuid.uuid4().hex[:12]}"
+    with admin.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+    engine = create_engine(url, connect_args={"options": f"-c search_path={schema}"})
+    Base.metadata.create_all(engine)
+    try:
+        yield engine
+    finally:
+        engine.dispose()
+        with admin.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        admin.dispose()
@@ -0,0 +1,113 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace as NS
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models.recipe import playlist_receita
+from app.db.models import ExclusaoConta, Playlist, User
+from app.services.account_deletion import ACCOUNT_DELETION_DDL, DeletionWorker, delete_batch_stmt, deletion_plan, release_shared_recipes_stmt
+
+
+def test_plan_deletes_children_before_parents_and_keeps_the_request():
+    names = [t.name for t, _ in deletion_plan()]
+    assert "users" not in names and "exclusoes_conta" not in names
+    assert names.index("movimentos_estoque") < names.index("itens_estoque")
+    assert names.index("refeicao_receita") < names.index("refeicoes") < names.index("cardapios")
+    assert names.index("leituras_ocr") < names.index("anexos_midia")
+
+
+def test_batch_delete_is_bounded():
+    stmt = delete_batch_stmt(playlist_receita, (Playlist.__table__,), uuid.uuid4(), 500)
+    sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    assert "(playlist_receita.playlist_id, playlist_receita.receita_id) IN (SELECT" in sql
+    assert "LIMIT 500" in sql
+
+
+def test_lock_timeout_backs_off_and_retries():
+    worker = DeletionWorker(batch_rows=10, pause_s=0)
+    db = MagicMock()
+    db.__enter__.return_value = db
+    db.execute.return_value.scalar.return_value = "a@b.com"
+    lock = OperationalError("DELETE", {}, NS(pgcode="55P03"))
+    calls = iter([lock, 10, 3])
+    def batch(*_args):
+        n = next(calls, 0)
+        if isinstance(n, Exception):
+            raise n
+        return n
+    with patch.object(worker, "claim", return_value=(uuid.uuid4(), uuid.uuid4())), \
+            patch.object(worker, "_delete_batch", side_effect=batch), \
+            patch.object(worker, "pause") as pause:
+        assert worker.run_once(lambda: db) is True
+    assert worker.lock_retries == 1
+    pause.assert_any_call(1.0)
+    db.rollback.assert_called_once()
+    final = db.execute.call_args.args[0]
+    assert final.compile().params["status"] == "EFETIVADA"
+    assert worker.stats()["done"] == 1
+
+
+def test_stops_mid_way_without_finishing():
+    worker = DeletionWorker(batch_rows=10, pause_s=0)
+    worker.shutdown()
+    db = MagicMock()
+    db.__enter__.return_value = db
+    with patch.object(worker, "claim", return_value=(uuid.uuid4(), uuid.uuid4())), \
+            patch.object(worker, "_delete_batch") as batch:
+        assert worker.run_once(lambda: db) is True
+    batch.assert_not_called()
+    assert worker.stats()["done"] == 0
+
+
+def test_shared_recipe_linked_by_another_user_loses_author_before_deletion():
+    owner, other = uuid.uuid4(), uuid.uuid4()
+    sql = str(release_shared_recipes_stmt(owner).compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    assert "SET usuario_id=NULL" in sql
+    assert "receitas.compartilhada IS true" in sql
+    # só vínculos de outro usuário (cardápio ou playlist) seguram a receita
+    assert f"cardapios.usuario_id != '{owner}'" in sql and f"playlists.usuario_id != '{owner}'" in sql
+
+    worker = DeletionWorker(batch_rows=10, pause_s=0)
+    db = MagicMock()
+    db.__enter__.return_value = db
+    order = []
+    db.execute.side_effect = lambda stmt, *a: order.append(str(stmt).split()[0:2]) or MagicMock()
+    with patch.object(worker, "claim", return_value=(uuid.uuid4(), owner)), \
+            patch.object(worker, "_delete_batch", side_effect=lambda *a: order.append(["batch", a[2].name]) or 0):
+        worker.run_once(lambda: db)
+    assert order.index(["UPDATE", "receitas"]) < order.index(["batch", "receitas"])
+    assert order.index(["UPDATE", "receitas"]) < order.index(["batch", "refeicao_receita"])
+
+
+def test_request_survives_as_effective_after_upgrading_an_old_schema(pg):
+    with pg.begin() as conn:
+        # como o baseline criava: pedido preso ao usuário, apagado em cascata
+        conn.execute(text("ALTER TABLE exclusoes_conta DROP CONSTRAINT exclusoes_conta_usuario_id_fkey"))
+        conn.execute(text(
+            "ALTER TABLE exclusoes_conta ADD CONSTRAINT exclusoes_conta_usuario_id_fkey"
+            " FOREIGN KEY (usuario_id) REFERENCES users (id) ON DELETE CASCADE"
+        ))
+        conn.execute(text("ALTER TABLE exclusoes_conta ALTER COLUMN usuario_id SET NOT NULL"))
+        for ddl in ACCOUNT_DELETION_DDL:
+            conn.execute(text(ddl))
+    factory = sessionmaker(bind=pg)
+    with factory() as db:
+        user = User(email="x@y.com", senha_hash="x")
+        db.add(user)
+        db.flush()
+        pedido = ExclusaoConta(usuario_id=user.id, solicitado_em=datetime.now(timezone.utc) - timedelta(days=1))
+        db.add(pedido)
+        db.commit()
+        pedido_id = pedido.id
+
+    assert DeletionWorker(batch_rows=10, pause_s=0).run_once(factory) is True
+    with factory() as db:
+        row = db.get(ExclusaoConta, pedido_id)
+        assert (row.status, row.usuario_id) == ("EFETIVADA", None)
+        assert row.efetivado_em is not None
+        assert db.query(User).count() == 0
@@ -0,0 +1,45 @@
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from app.services.audio import AudioRejected, decode_audio
+
+
+def wav_bytes(seconds, rate=44100):
+    buf = io.BytesIO()
+    t = np.arange(int(seconds * rate)) / rate
+    samples = (np.sin(2 * np.pi * 440 * t) * 8000).astype("<i2")
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(np.repeat(samples, 2).tobytes())
+    buf.seek(0)
+    return buf
+
+
+def test_decodes_to_mono_16k_float32():
+    pcm = decode_audio(wav_bytes(1.5))
+    assert pcm.dtype == np.float32
+    assert abs(len(pcm) - 24000) < 200
+    assert 0.1 < np.abs(pcm).max() < 1.0
+
+
+def test_rejects_long_audio():
+    with pytest.raises(AudioRejected) as exc:
+        decode_audio(wav_bytes(3), max_duration_s=2)
+    assert exc.value.status_code == 413
+
+
+def test_rejects_large_upload():
+    with pytest.raises(AudioRejected) as exc:
+        decode_audio(wav_bytes(1), max_bytes=1024)
+    assert exc.value.status_code == 413
+
+
+def test_rejects_garbage():
+    with pytest.raises(AudioRejected) as exc:
+        decode_audio(io.BytesIO(b"nao sou audio" * 100))
+    assert exc.value.status_code == 400
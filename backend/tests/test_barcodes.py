@@ -0,0 +1,56 @@
+import uuid
+from unittest.mock import patch
+
+from app.db.models.product import CodigoBarras
+from app.services.barcodes import MISSING, BarcodeCache, _invalidate_code
+
+
+def product(**kw):
+    return {"id": uuid.uuid4(), "nome": "Leite", "marca": None, "categoria": None, "codigo": "789", "tipo": "EAN13", **kw}
+
+
+def test_positive_and_negative_entries():
+    cache = BarcodeCache(max_entries=10)
+    assert cache.get("789") is MISSING
+    cache.put("789", product())
+    cache.put("000", None)
+    assert cache.get("789")["nome"] == "Leite"
+    assert cache.get("000") is None
+    assert cache.stats()["negative_hits"] == 1
+
+
+def test_negative_entries_expire_sooner():
+    cache = BarcodeCache(max_entries=10, ttl_s=3600, negative_ttl_s=60)
+    with patch("app.services.barcodes.time.time", return_value=1000):
+        cache.put("789", product())
+        cache.put("000", None)
+    with patch("app.services.barcodes.time.time", return_value=1061):
+        assert cache.get("000") is MISSING
+        assert cache.get("789") is not MISSING
+
+
+def test_bounded_size_evicts_least_recent():
+    cache = BarcodeCache(max_entries=2)
+    cache.put("a", None)
+    cache.put("b", None)
+    cache.get("a")
+    cache.put("c", None)
+    assert cache.get("b") is MISSING
+    assert cache.get("a") is None
+
+
+def test_invalidate_product_drops_all_its_codes():
+    cache = BarcodeCache(max_entries=10)
+    p = product()
+    cache.put("789", p)
+    cache.put("790", dict(p, codigo="790"))
+    cache.invalidate_product(p["id"])
+    assert cache.get("789") is MISSING and cache.get("790") is MISSING
+
+
+def test_new_code_clears_negative_entry():
+    cache = BarcodeCache(max_entries=10)
+    cache.put("000", None)
+    with patch("app.services.barcodes.barcode_cache", cache):
+        _invalidate_code(None, None, CodigoBarras(valor="000"))
+    assert cache.get("000") is MISSING
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from passlib.context import CryptContext
+
+from app.api.routes.auth import login
+from app.db.models.user import User
+from app.schemas.auth import LoginInput
+from app.services.credentials import CredentialService, CredentialsBusy
+
+
+def test_hash_and_verify_are_timed():
+    service = CredentialService(workers=1, mode="thread")
+
+    async def run():
+        hashed = await service.hash("senha-forte")
+        return (await service.verify("senha-forte", hashed))[0], (await service.verify("errada", hashed))[0]
+
+    assert asyncio.run(run()) == (True, False)
+    ops = service.stats()["operations"]
+    assert ops["hash"]["count"] == 1
+    assert ops["verify"]["count"] == 2
+    service.shutdown()
+
+
+def test_rejects_when_concurrency_cap_is_reached():
+    gate = threading.Event()
+    service = CredentialService(workers=1, max_concurrency=1, mode="thread", wait_s=0.05)
+
+    async def run():
+        held = asyncio.ensure_future(service._run("hash", gate.wait, 5))
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(CredentialsBusy):
+                await service.hash("x" * 8)
+            # o event loop segue livre enquanto a vaga está ocupada
+            assert await asyncio.sleep(0, result="ok") == "ok"
+        finally:
+            gate.set()
+        await held
+
+    asyncio.run(run())
+    assert service.stats()["rejected"] == 1
+    service.shutdown()
+
+
+def test_cancelled_request_keeps_its_slot_until_the_job_finishes():
+    gate = threading.Event()
+    service = CredentialService(workers=1, max_concurrency=1, mode="thread", wait_s=0.05)
+
+    async def run():
+        held = asyncio.ensure_future(service._run("hash", gate.wait, 5))
+        await asyncio.sleep(0.01)
+        held.cancel()  # cliente desconectou; o pbkdf2 segue no pool
+        await asyncio.sleep(0.01)
+        try:
+            with pytest.raises(CredentialsBusy):
+                await service.hash("x" * 8)
+        finally:
+            gate.set()
+        assert await service._run("hash", len, "livre") == 5
+
+    asyncio.run(run())
+    service.shutdown()
+
+
+def test_login_rehashes_outdated_hash():
+    old = CryptContext(schemes=["pbkdf2_sha256"], pbkdf2_sha256__default_rounds=1000).hash("senha-forte")
+    user = User(email="ana@example.com", senha_hash=old, fl_ativo=True)
+    db = MagicMock(commit=AsyncMock())
+    db.execute = AsyncMock(return_value=MagicMock(scalars=lambda: MagicMock(first=lambda: user)))
+    current = CryptContext(schemes=["pbkdf2_sha256"], pbkdf2_sha256__default_rounds=2000, pbkdf2_sha256__min_rounds=2000)
+    service = CredentialService(mode="thread")
+    with patch("app.api.routes.auth.credentials", service), patch("app.core.security.pwd_context", current):
+        asyncio.run(login(LoginInput(email="ana@example.com", senha="senha-forte"), db=db))
+    assert user.senha_hash.startswith("$pbkdf2-sha256$2000$")
+    db.commit.assert_awaited_once()
+    service.shutdown()
@@ -0,0 +1,92 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_current_user, get_current_user_async
+from app.core.principal_cache import principal_cache, _bulk_user_change, _invalidate_user
+from app.core.security import create_access_token
+from app.db.models.user import User
+
+
+def make_db(user):
+    db = MagicMock()
+    db.query.return_value.filter.return_value.first.return_value = user
+    db.merge.side_effect = lambda obj, load: obj
+    return db
+
+
+def test_second_request_skips_db_lookup():
+    principal_cache.clear()
+    token = create_access_token(sub="ana@example.com")
+    db = make_db(User(id=1, email="ana@example.com", nome="Ana", fl_ativo=True))
+
+    first = get_current_user(token, db)
+    second = get_current_user(token, db)
+    assert db.query.call_count == 1
+    assert second.nome == "Ana"
+    assert second is not first
+    db.merge.assert_called_once()
+
+
+def test_user_update_invalidates_cached_tokens():
+    principal_cache.clear()
+    token = create_access_token(sub="bia@example.com")
+    user = User(id=2, email="bia@example.com", nome="Bia", fl_ativo=True)
+    db = make_db(user)
+    get_current_user(token, db)
+
+    _invalidate_user(None, None, user)
+    get_current_user(token, db)
+    assert db.query.call_count == 2
+
+
+def test_invalid_token_is_not_cached():
+    principal_cache.clear()
+    with pytest.raises(HTTPException) as exc:
+        get_current_user("nao-e-jwt", make_db(None))
+    assert exc.value.status_code == 401
+    assert principal_cache.stats()["entries"] == 0
+
+
+def test_async_dependency_shares_the_cache():
+    principal_cache.clear()
+    token = create_access_token(sub="caio@example.com")
+    db = AsyncMock()
+    result = MagicMock()
+    result.scalars.return_value.first.return_value = User(id=3, email="caio@example.com", nome="Caio")
+    db.execute.return_value = result
+    db.merge.side_effect = lambda obj, load: obj
+
+    asyncio.run(get_current_user_async(token, db))
+    user = asyncio.run(get_current_user_async(token, db))
+    assert db.execute.await_count == 1
+    assert user.nome == "Caio"
+
+
+def test_user_reread_between_flush_and_commit_is_dropped_on_commit():
+    principal_cache.clear()
+    token = create_access_token(sub="duda@example.com")
+    session = Session()
+    user = User(id=4, email="duda@example.com", nome="Duda Nova", fl_ativo=True)
+    session.add(user)
+    _invalidate_user(None, None, user)  # flush do UPDATE
+    # outro request lê a linha ainda não commitada (nome antigo) e guarda no cache
+    get_current_user(token, make_db(User(id=4, email="duda@example.com", nome="Duda", fl_ativo=True)))
+    assert principal_cache.stats()["entries"] == 1
+    session.expunge_all()
+    session.commit()
+    assert principal_cache.stats()["entries"] == 0
+
+
+def test_bulk_user_update_clears_cache_on_commit():
+    principal_cache.clear()
+    get_current_user(create_access_token(sub="eva@example.com"), make_db(User(id=5, email="eva@example.com")))
+    session = Session()
+    _bulk_user_change(MagicMock(is_update=True, is_delete=False, bind_mapper=inspect(User), session=session))
+    assert principal_cache.stats()["entries"] == 1
+    session.commit()
+    assert principal_cache.stats()["entries"] == 0
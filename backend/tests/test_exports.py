@@ -0,0 +1,135 @@
+import json
+import uuid
+import zipfile
+from types import SimpleNamespace as NS
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import MovimentoEstoque, ItemEstoque
+from app.db.models.lgpd import EXPORT_DDL
+from app.db.models.recipe import refeicao_receita
+from app.services.exports import ExportWorker, LeaseLost, write_export
+from app.services.user_data import OWNED_TABLES, owned_filter
+
+
+def test_owned_filter_walks_foreign_keys_up_to_owner():
+    user_id = uuid.uuid4()
+    sql = str(owned_filter(MovimentoEstoque.__table__, (ItemEstoque.__table__,), user_id).compile(dialect=postgresql.dialect()))
+    assert "movimentos_estoque.item_id IN (SELECT itens_estoque.id" in sql
+    assert "itens_estoque.usuario_id" in sql
+    via = dict(OWNED_TABLES)[refeicao_receita]
+    sql = str(owned_filter(refeicao_receita, via, user_id).compile(dialect=postgresql.dialect()))
+    assert "refeicao_receita.refeicao_id IN (SELECT refeicoes.id" in sql
+    assert "cardapios.usuario_id" in sql
+
+
+def test_owned_tables_list_parents_first():
+    names = [t.name for t, _ in OWNED_TABLES]
+    for table, via in OWNED_TABLES:
+        for parent in via:
+            assert names.index(parent.name) < names.index(table.name)
+
+
+def test_write_export_streams_one_ndjson_per_table(tmp_path):
+    conn = MagicMock()
+    row = NS(_mapping={"id": uuid.uuid4(), "nome": "Ovo"})
+    conn.execution_options.return_value.execute.side_effect = lambda stmt: iter([row, row])
+    path = tmp_path / "u" / "e.zip"
+    counts = write_export(conn, uuid.uuid4(), str(path), batch_rows=50)
+
+    conn.execution_options.assert_called_with(yield_per=50)
+    assert "refresh_tokens" not in counts
+    with zipfile.ZipFile(path) as zf:
+        assert json.loads(zf.read("manifesto.json"))["tabelas"] == counts
+        lines = zf.read("receitas.ndjson").decode().splitlines()
+    assert len(lines) == 2 and json.loads(lines[0])["nome"] == "Ovo"
+    assert [p.name for p in (tmp_path / "u").iterdir()] == ["e.zip"]
+
+
+def test_aborted_export_leaves_no_files(tmp_path):
+    conn = MagicMock()
+    conn.execution_options.return_value.execute.side_effect = lambda stmt: iter([])
+    seen = []
+
+    def on_table(name):
+        seen.append(name)
+        if len(seen) == 2:
+            raise LeaseLost("x")
+
+    with pytest.raises(LeaseLost):
+        write_export(conn, uuid.uuid4(), str(tmp_path / "u" / "e.zip"), on_table=on_table)
+    assert len(seen) == 2
+    assert list((tmp_path / "u").iterdir()) == []
+
+
+def test_failed_export_is_marked_as_error(tmp_path):
+    worker = ExportWorker(str(tmp_path))
+    db = MagicMock()
+    db.__enter__.return_value = db
+    with patch.object(worker, "claim", return_value=(uuid.uuid4(), uuid.uuid4(), datetime.now(timezone.utc))), \
+            patch("app.services.exports.write_export", side_effect=RuntimeError("disco cheio")):
+        assert worker.run_once(lambda: db) is True
+    stmt = db.execute.call_args.args[0]
+    assert stmt.compile().params["status"] == "ERRO"
+    assert worker.stats()["failed"] == 1
+    db.commit.assert_called()
+
+
+def test_worker_that_lost_the_lease_stops_without_touching_the_request(pg, tmp_path):
+    factory = sessionmaker(bind=pg)
+    with pg.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, email, senha_hash) VALUES (gen_random_uuid(), 'a@b.com', 'x')"))
+        conn.execute(text(
+            "INSERT INTO exportacoes_dados (id, usuario_id, formato, status, solicitado_em)"
+            " SELECT gen_random_uuid(), id, 'JSON', 'PENDENTE', now() FROM users"
+        ))
+    first, second = ExportWorker(str(tmp_path / "a"), stale_s=60), ExportWorker(str(tmp_path / "b"), stale_s=60)
+    with factory() as db:
+        export_id, _, lease = first.claim(db)
+        lease = first.renew(db, export_id, lease)
+        # o lease venceu e o segundo worker reassumiu
+        db.execute(text("UPDATE exportacoes_dados SET iniciado_em = now() - interval '2 minutes'"))
+        db.commit()
+        assert second.claim(db)[0] == export_id
+        with pytest.raises(LeaseLost):
+            first.renew(db, export_id, lease)
+
+    def taken_over(conn, usuario_id, path, batch_rows, on_table):
+        with factory() as db:
+            db.execute(text("UPDATE exportacoes_dados SET iniciado_em = now() + interval '1 second'"))
+            db.commit()
+        on_table("users")
+
+    with factory() as db:
+        db.execute(text("UPDATE exportacoes_dados SET status = 'PENDENTE', iniciado_em = NULL"))
+        db.commit()
+    with patch("app.services.exports.write_export", side_effect=taken_over):
+        assert first.run_once(factory) is True
+    with factory() as db:
+        status = db.execute(text("SELECT status, url_resultado FROM exportacoes_dados")).one()
+    assert tuple(status) == ("PROCESSANDO", None)
+    assert first.stats()["done"] == 0 and first.stats()["failed"] == 0
+
+
+def test_upgrade_queues_only_unfinished_exports(pg, tmp_path):
+    with pg.begin() as conn:
+        conn.execute(text("DROP INDEX ix_exportacoes_fila"))
+        conn.execute(text("ALTER TABLE exportacoes_dados DROP COLUMN status, DROP COLUMN iniciado_em, DROP COLUMN erro"))
+        conn.execute(text("INSERT INTO users (id, email, senha_hash) VALUES (gen_random_uuid(), 'a@b.com', 'x')"))
+        conn.execute(text(
+            "INSERT INTO exportacoes_dados (id, usuario_id, formato, solicitado_em, concluido_em)"
+            " SELECT gen_random_uuid(), id, 'JSON', now() - interval '1 day', now() FROM users"
+            " UNION ALL SELECT gen_random_uuid(), id, 'JSON', now(), NULL FROM users"
+        ))
+        for ddl in EXPORT_DDL * 2:  # idempotente
+            conn.execute(text(ddl))
+        rows = conn.execute(text("SELECT status FROM exportacoes_dados ORDER BY solicitado_em")).scalars().all()
+    assert rows == ["CONCLUIDA", "PENDENTE"]
+    with sessionmaker(bind=pg)() as db:
+        assert ExportWorker(str(tmp_path)).claim(db) is not None
+        assert ExportWorker(str(tmp_path)).claim(db) is None
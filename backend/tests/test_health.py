@@ -0,0 +1,50 @@
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+from app.main import _upgrade_schema, app
+
+
+def test_liveness_does_not_wait_for_model():
+    with patch("app.main.whisper_tiers") as engine, patch("app.main.product_index"), patch("app.main.export_worker"), patch("app.main.deletion_worker"), \
+            patch("app.main.recipe_import_worker"):
+        engine.ready = False
+        engine.load_error = None
+        with TestClient(app) as client:
+            engine.start.assert_called_once()
+            assert client.get("/").json() == {"ok": True}
+
+
+def test_ready_reports_model_and_db():
+    with patch("app.main.whisper_tiers") as engine, patch("app.main._db_ready", return_value=True), \
+            patch("app.main.product_index"), patch("app.main.export_worker"), patch("app.main.deletion_worker"), \
+            patch("app.main.recipe_import_worker"):
+        engine.ready = False
+        engine.load_error = None
+        with TestClient(app) as client:
+            r = client.get("/ready")
+            assert r.status_code == 503
+            assert r.json()["model"] is False
+            assert r.json()["db"] is True
+
+            engine.ready = True
+            r = client.get("/ready")
+            assert r.status_code == 200
+            assert r.json()["ready"] is True
+
+
+def _upgrade_statements() -> list[str]:
+    engine = MagicMock()
+    conn = engine.begin.return_value.__enter__.return_value
+    with patch("app.main.engine", engine), patch("app.main.backfill_busca"), patch("app.main.ensure_trigram_index"):
+        _upgrade_schema()
+    return [" ".join(str(c.args[0]).split()) for c in conn.execute.call_args_list]
+
+
+def test_upgrade_installs_price_triggers_before_backfill():
+    sql = _upgrade_statements()
+    trigger = sql.index("CREATE TRIGGER tg_precos_atuais AFTER INSERT ON precos_produto REFERENCING NEW TABLE AS novos "
+                        "FOR EACH STATEMENT EXECUTE FUNCTION atualiza_precos_atuais()")
+    backfill = next(i for i, s in enumerate(sql) if s.startswith("INSERT INTO precos_atuais"))
+    assert trigger < backfill
+    assert any("AFTER DELETE ON precos_produto" in s for s in sql)
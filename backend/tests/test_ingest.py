@@ -0,0 +1,132 @@
+import io
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy import text
+
+from app.db.models.market import LATEST_PRICE_DDL, MARKET_DDL
+from app.services.ingest import detect_format, ingest_feed, iter_records, parse_record
+
+AGORA = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+
+def test_csv_with_semicolons_and_ndjson():
+    csv_rows = list(iter_records(io.StringIO("codigo;nome;preco\n789;Arroz;25,90\n"), "csv"))
+    assert csv_rows == [{"codigo": "789", "nome": "Arroz", "preco": "25,90"}]
+    nd = list(iter_records(io.StringIO('{"codigo": "789", "preco": 2.5}\n\nnão é json\n'), "ndjson"))
+    assert nd == [{"codigo": "789", "preco": 2.5}, {}]
+
+
+def test_parse_record_normalizes_fields():
+    row = parse_record(
+        {"codigo": " 789 ", "nome": "Feijão Preto", "marca": "Camil", "mercado": "Mercado A", "uf": "pe", "preco": "1.234,56"},
+        7, AGORA,
+    )
+    linha, codigo, tipo, nome, marca, categoria, busca, mercado, cidade, uf, preco, coletado_em = row
+    assert (linha, codigo, busca, uf) == (7, "789", "feijao preto camil", "PE")
+    assert preco == Decimal("1234.56")
+    assert coletado_em == AGORA
+
+
+def test_parse_record_rejects_invalid_rows():
+    assert parse_record({"nome": "Sem código"}, 1, AGORA) is None
+    assert parse_record({"codigo": "789", "mercado": "A", "preco": "abc"}, 1, AGORA) is None
+    assert parse_record({"codigo": "789", "mercado": "A", "preco": "-1"}, 1, AGORA) is None
+    assert parse_record({"codigo": "789", "mercado": "A"}, 1, AGORA) is None
+    naive = parse_record({"codigo": "789", "mercado": "A", "preco": "2", "coletado_em": "2026-10-02T08:00:00"}, 1, AGORA)
+    assert naive[-1].tzinfo == timezone.utc
+
+
+def test_detect_format():
+    assert detect_format("precos.CSV") == "csv"
+    assert detect_format("feed.jsonl") == "ndjson"
+    assert detect_format("feed.txt") is None
+
+
+def test_ingest_feed_loads_in_batches_and_commits_each():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.rowcount = 0
+    cursor.fetchall.return_value = []
+    engine = MagicMock()
+    engine.raw_connection.return_value = conn
+    lines = "codigo,nome\n" + "".join(f"{i},Produto {i}\n" for i in range(5)) + ",sem codigo\n"
+    batches = []
+    with patch("app.services.ingest.barcode_cache") as cache:
+        report = ingest_feed(engine, io.StringIO(lines), "csv", batch_rows=2, on_batch=batches.append)
+    assert (report["linhas"], report["rejeitadas"], report["lotes"]) == (6, 1, 3)
+    assert cursor.copy_expert.call_count == 3
+    assert conn.commit.call_count == 3 + 2  # lotes + criar/remover a tabela temporária
+    assert [b["linhas"] for b in batches] == [2, 4, 6]
+    assert cache.invalidate.call_count == 5
+    conn.close.assert_called_once()
+
+
+def test_endpoint_requires_ingest_token():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    client = TestClient(app)
+    files = {"arquivo": ("f.csv", b"codigo,nome\n789,Arroz\n")}
+    with patch("app.api.routes.products.settings.INGEST_TOKEN", None):
+        assert client.post("/products/ingest", files=files, headers={"X-Ingest-Token": ""}).status_code == 403
+    with patch("app.api.routes.products.settings.INGEST_TOKEN", "segredo"), \
+            patch("app.api.routes.products.ingest_feed", return_value={"linhas": 1}) as feed:
+        assert client.post("/products/ingest", files=files, headers={"X-Ingest-Token": "outro"}).status_code == 403
+        r = client.post("/products/ingest", files=files, headers={"X-Ingest-Token": "segredo"})
+        assert r.json() == {"linhas": 1}
+        assert feed.call_args.args[2] == "csv"
+        assert client.post("/products/ingest", files={"arquivo": ("f.bin", b"x")}, headers={"X-Ingest-Token": "segredo"}).status_code == 400
+
+
+def test_catalog_is_locked_and_caches_invalidated_after_commit():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.rowcount = 1
+    cursor.fetchall.return_value = [("p1",)]
+    engine = MagicMock()
+    engine.raw_connection.return_value = conn
+    order = []
+    cursor.execute.side_effect = lambda sql: order.append(sql.split()[0] if "advisory" not in sql else "LOCK")
+    conn.commit.side_effect = lambda: order.append("COMMIT")
+    with patch("app.services.ingest.barcode_cache") as cache, patch("app.services.ingest.hot_index"), \
+            patch("app.services.ingest.recipe_index") as recipes:
+        cache.invalidate.side_effect = lambda valor: order.append(f"invalidate {valor}")
+        recipes.invalidate.side_effect = lambda: order.append("recipes")
+        ingest_feed(engine, io.StringIO("codigo,nome\n789,Arroz\n"), "csv")
+    lock, commit = order.index("LOCK"), order.index("COMMIT", order.index("LOCK"))
+    assert lock < order.index("WITH")  # antes do UPDATE/INSERT de produtos
+    assert order.index("invalidate 789") > commit
+    cache.invalidate_product.assert_called_once_with("p1")
+    assert order.index("recipes") > commit
+
+
+def test_upgrade_merges_duplicate_markets_so_ingest_can_upsert(pg):
+    with pg.begin() as conn:
+        # banco antigo: sem a chave natural e com o mesmo mercado duas vezes
+        conn.execute(text("DROP INDEX uq_mercado_local"))
+        conn.execute(text("INSERT INTO produtos (id, nome) VALUES ('00000000-0000-0000-0000-000000000001', 'Arroz')"))
+        conn.execute(text(
+            "INSERT INTO mercados (id, nome, cidade) VALUES"
+            " ('00000000-0000-0000-0000-00000000000a', 'Mercado A', NULL),"
+            " ('00000000-0000-0000-0000-00000000000b', 'Mercado A', '')"
+        ))
+        for ddl in LATEST_PRICE_DDL:
+            conn.execute(text(ddl))
+        for mercado, preco, dia in (("a", 10, 1), ("b", 11, 1), ("b", 12, 2)):
+            conn.execute(text(
+                "INSERT INTO precos_produto (id, produto_id, mercado_id, preco, coletado_em) VALUES"
+                " (gen_random_uuid(), '00000000-0000-0000-0000-000000000001',"
+                f" '00000000-0000-0000-0000-00000000000{mercado}', :preco, :dia)"
+            ), {"preco": preco, "dia": datetime(2026, 1, dia, tzinfo=timezone.utc)})
+        for ddl in MARKET_DDL * 2:  # idempotente
+            conn.execute(text(ddl))
+        assert conn.execute(text("SELECT count(*) FROM mercados")).scalar() == 1
+        # a coleta do dia 1 que o mercado mantido já tinha prevalece
+        assert conn.execute(text("SELECT preco FROM precos_produto ORDER BY coletado_em")).scalars().all() == [10, 12]
+        assert conn.execute(text("SELECT preco FROM precos_atuais")).scalar() == 12
+
+    with patch("app.services.ingest.barcode_cache"), patch("app.services.ingest.hot_index"):
+        report = ingest_feed(pg, io.StringIO("codigo,nome,mercado,preco\n789,Feijão,Mercado A,7\n"), "csv", coletado_em=AGORA)
+    assert report["mercados_novos"] == 0
@@ -0,0 +1,114 @@
+import io
+import os
+import struct
+
+import av
+import numpy as np
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.db.models.media import MEDIA_DDL
+from app.services.media import MediaRejected, MediaStore, etag_matches, exif_orientation, referenced, sniff_mime, sweep
+
+
+def _jpeg(width=400, height=300, orientation=None) -> bytes:
+    pixels = np.zeros((height, width, 3), dtype=np.uint8)
+    pixels[:, : width // 2] = 255  # metade esquerda branca
+    frame = av.VideoFrame.from_ndarray(pixels, format="rgb24").reformat(format="yuvj420p")
+    codec = av.CodecContext.create("mjpeg", "w")
+    codec.width, codec.height, codec.pix_fmt = width, height, "yuvj420p"
+    data = b"".join(bytes(p) for p in codec.encode(frame) + codec.encode(None))
+    if orientation is None:
+        return data
+    # APP1 mínimo: TIFF big-endian com uma entrada Orientation
+    tiff = b"MM\x00\x2a" + struct.pack(">I", 8) + struct.pack(">H", 1)
+    tiff += struct.pack(">HHIHH", 0x0112, 3, 1, orientation, 0) + struct.pack(">I", 0)
+    app1 = b"Exif\x00\x00" + tiff
+    return data[:2] + b"\xff\xe1" + struct.pack(">H", len(app1) + 2) + app1 + data[2:]
+
+
+def test_same_content_is_stored_once(tmp_path):
+    store = MediaStore(str(tmp_path))
+    data = _jpeg()
+    first = store.save(io.BytesIO(data))
+    second = store.save(io.BytesIO(data))
+    assert first.sha256 == second.sha256
+    assert (first.duplicado, second.duplicado) == (False, True)
+    assert (first.mime, first.largura, first.altura) == ("image/jpeg", 400, 300)
+    assert open(store.path(first.sha256), "rb").read() == data
+    assert store.stats()["stored"] == 1 and store.stats()["deduplicated"] == 1
+    assert not [f for _, _, files in os.walk(tmp_path) for f in files if f.endswith(".tmp")]
+
+
+def test_rejects_unknown_and_oversized_uploads(tmp_path):
+    store = MediaStore(str(tmp_path), max_bytes=1000)
+    with pytest.raises(MediaRejected) as e:
+        store.save(io.BytesIO(b"GIF89a" + b"\0" * 100))
+    assert e.value.status_code == 415
+    with pytest.raises(MediaRejected) as e:
+        store.save(io.BytesIO(b"%PDF-" + b"\0" * 2000))
+    assert e.value.status_code == 413
+    assert not os.listdir(tmp_path)
+
+
+def test_variant_is_built_once_and_follows_exif_orientation(tmp_path):
+    store = MediaStore(str(tmp_path), widths=(100, 200))
+    data = _jpeg(orientation=6)
+    assert exif_orientation(data) == 6
+    blob = store.save(io.BytesIO(data))
+    assert (blob.largura, blob.altura) == (300, 400)  # foto "em pé"
+
+    width = store.pick_width(90, blob.largura)
+    path = store.variant(blob.sha256, width)
+    assert store.variant(blob.sha256, width) == path
+    assert store.stats()["variants_built"] == 1 and store.stats()["variant_hits"] == 1
+    with av.open(path) as container:
+        pixels = next(container.decode(video=0)).to_ndarray(format="rgb24")
+    assert pixels.shape[:2] == (133, 100)
+    # girado 90° no sentido horário: a metade branca (esquerda) fica em cima
+    assert pixels[10, 50].mean() > 200 and pixels[120, 50].mean() < 50
+
+
+def test_pick_width_never_upscales():
+    store = MediaStore("unused", widths=(160, 320, 640))
+    assert store.pick_width(200, 4000) == 320
+    assert store.pick_width(5000, 4000) == 640
+    assert store.pick_width(320, 300) is None
+
+
+def test_discard_keeps_referenced_and_recent_files(tmp_path):
+    store = MediaStore(str(tmp_path), gc_grace_s=60)
+    kept, old, recent = (store.save(io.BytesIO(b"%PDF-" + bytes([i]))).sha256 for i in range(3))
+    for sha256 in (kept, old):
+        os.utime(store.path(sha256), (0, 0))
+    assert store.discard([kept, old, recent], referenced={kept}) == 1
+    assert sorted(store.digests()) == sorted([kept, recent])
+
+
+def test_etag_and_sniffing_helpers():
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert etag_matches("*", '"x"')
+    assert not etag_matches(None, '"x"')
+    assert sniff_mime(b"RIFF\0\0\0\0WEBPVP8 ") == "image/webp"
+
+
+def test_upgrade_adds_content_columns_to_existing_attachments(pg, tmp_path):
+    with pg.begin() as conn:
+        conn.execute(text("DROP INDEX ix_anexos_midia_sha256"))
+        conn.execute(text(
+            "ALTER TABLE anexos_midia DROP COLUMN sha256, DROP COLUMN mime, DROP COLUMN tamanho_bytes,"
+            " DROP COLUMN largura, DROP COLUMN altura"
+        ))
+        conn.execute(text("INSERT INTO users (id, email, senha_hash) VALUES (gen_random_uuid(), 'a@b.com', 'x')"))
+        conn.execute(text("INSERT INTO anexos_midia (id, usuario_id, url) SELECT gen_random_uuid(), id, '/antigo.jpg' FROM users"))
+        for ddl in MEDIA_DDL * 2:  # idempotente
+            conn.execute(text(ddl))
+        assert conn.execute(text("SELECT 1 FROM pg_indexes WHERE schemaname = current_schema() AND indexname = 'ix_anexos_midia_sha256'")).scalar() == 1
+
+    store = MediaStore(str(tmp_path))
+    orphan = store.save(io.BytesIO(b"%PDF-1")).sha256
+    os.utime(store.path(orphan), (0, 0))
+    with Session(pg) as db:
+        assert referenced(db, [orphan]) == set()
+        assert sweep(db, store) == 1
@@ -0,0 +1,91 @@
+import asyncio
+import uuid
+from types import SimpleNamespace as NS
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from sqlalchemy import text
+
+from app.api.routes.products import search_products
+from app.core.text import normalize, trigrams
+from app.db.models.product import PRODUTO_DDL
+from app.services.product_search import NgramIndex, backfill_busca, search_stmt
+
+
+def row(nome):
+    return {"id": uuid.uuid4(), "nome": nome, "busca": normalize(nome)}
+
+
+def test_normalize_strips_accents_and_punctuation():
+    assert normalize("Queijo Parmesão, RALADO!") == "queijo parmesao ralado"
+    assert normalize("Pão-de-forma") == "pao de forma"
+    assert normalize(None) == ""
+
+
+def test_trigrams_match_pg_trgm():
+    assert trigrams("cat") == {"  c", " ca", "cat", "at "}
+
+
+def test_ngram_index_ranks_prefix_and_fuzzy_matches():
+    index = NgramIndex()
+    index.build([row("Leite Integral"), row("Leite Desnatado"), row("Queijo Parmesão"), row("Pão de Forma")])
+    assert [r["nome"] for r in index.search("parmesao")] == ["Queijo Parmesão"]
+    assert [r["nome"] for r in index.search("leite int")][0] == "Leite Integral"
+    assert {r["nome"] for r in index.search("lei")} == {"Leite Integral", "Leite Desnatado"}
+    assert index.search("xyz") == []
+
+
+def test_ngram_index_skips_stale_products():
+    index = NgramIndex()
+    leite = row("Leite Integral")
+    index.build([leite])
+    index.mark_stale(leite["id"])
+    assert index.search("leite") == []
+
+
+def test_search_stmt_without_trigram_matches_all_words():
+    sql = str(search_stmt("leite int", 10, trigram=False))
+    assert sql.count("produtos.busca LIKE") == 3  # duas palavras + prefixo na ordenação
+    assert "word_similarity" not in sql
+
+
+def test_search_goes_to_db_when_hot_page_is_only_fuzzy():
+    index = NgramIndex(min_score=0.3)
+    index.build([row("Leite Integral"), row("Creme de Leite")])
+    db = MagicMock(execute=AsyncMock(return_value=[]))
+    with patch("app.api.routes.products.hot_index", index), \
+            patch("app.api.routes.products.trigram_available", AsyncMock(return_value=True)):
+        # "leite integral" é prefixo: página cheia, sem banco
+        assert len(asyncio.run(search_products(q="leite", limit=1, db=db, current_user=None))) == 1
+        db.execute.assert_not_awaited()
+        # "creme de leite" só casa por trigramas: o banco pode ter "Leite ..." fora da fatia
+        asyncio.run(search_products(q="leite", limit=2, db=db, current_user=None))
+        db.execute.assert_awaited_once()
+
+
+def test_backfill_busca_fills_empty_rows_in_batches():
+    first = [NS(id=1, nome="Parmesão", marca="Tirolez", categoria=None), NS(id=2, nome="Pão", marca=None, categoria="Padaria")]
+    conn = MagicMock()
+    conn.execute.side_effect = [MagicMock(all=lambda: first), None, MagicMock(all=lambda: [])]
+    assert backfill_busca(conn, batch=2) == 2
+    params = conn.execute.call_args_list[1].args[1]
+    assert params == [{"pid": 1, "novo": "parmesao tirolez"}, {"pid": 2, "novo": "pao padaria"}]
+    # o lote seguinte continua depois do último id
+    assert "produtos.id >" in str(conn.execute.call_args_list[2].args[0])
+
+
+def test_upgrade_adds_busca_and_backfill_fills_existing_rows(pg):
+    with pg.begin() as conn:
+        # produtos como no baseline: sem a coluna
+        conn.execute(text("DROP INDEX IF EXISTS ix_produtos_busca_trgm"))
+        conn.execute(text("ALTER TABLE produtos DROP COLUMN busca"))
+        for i, (nome, marca) in enumerate([("Parmesão", "Tirolez"), ("Pão", None), ("Açúcar", "União")]):
+            conn.execute(
+                text("INSERT INTO produtos (id, nome, marca) VALUES (:id, :nome, :marca)"),
+                {"id": uuid.UUID(int=i + 1), "nome": nome, "marca": marca},
+            )
+        for ddl in PRODUTO_DDL * 2:  # idempotente
+            conn.execute(text(ddl))
+        assert backfill_busca(conn, batch=2) == 3
+        assert backfill_busca(conn, batch=2) == 0
+        rows = conn.execute(text("SELECT busca FROM produtos ORDER BY id")).scalars().all()
+    assert rows == ["parmesao tirolez", "pao", "acucar uniao"]
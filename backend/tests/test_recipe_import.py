@@ -0,0 +1,255 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpcore
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.db.models.recipe import RECIPE_DDL, ImportacaoReceita
+from app.services.recipe_import import (
+    ProductNames, RecipeFetcher, RecipeImportError, RecipeImportWorker, import_recipes, normalize_url, parse_ingredient, parse_recipe,
+)
+
+
+def _page(titulo, ingredientes):
+    data = {"@context": "https://schema.org", "@graph": [
+        {"@type": "WebSite", "name": "Site"},
+        {"@type": ["Recipe"], "name": titulo, "recipeYield": "4 porções", "totalTime": "PT1H15M",
+         "recipeIngredient": ingredientes},
+    ]}
+    return f'<html><script type="application/ld+json">{json.dumps(data)}</script></html>'
+
+
+@pytest.fixture
+def site():
+    state = {"active": 0, "peak": 0, "hits": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                state["active"] += 1
+                state["hits"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+            time.sleep(0.02)
+            if self.path.startswith("/vazia"):
+                body, status = b"<html>sem receita</html>", 200
+            elif self.path.startswith("/velha"):
+                body, status = b"", 301
+            else:
+                body, status = _page(f"Bolo {self.path}", ["3 ovos", "2 xícaras (chá) de farinha de trigo"]).encode(), 200
+            self.send_response(status)
+            if status == 301:
+                self.send_header("Location", "/r/nova")
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            with lock:
+                state["active"] -= 1
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}", state
+    server.shutdown()
+
+
+def test_normalize_url_drops_tracking_and_cosmetic_differences():
+    key = "https://site.com/receita/bolo?porcoes=4"
+    assert normalize_url("HTTP://www.Site.com/receita/bolo/?utm_source=x&porcoes=4#passo-2") == key
+    assert normalize_url("https://site.com//receita/bolo?porcoes=4&fbclid=1") == key
+    with pytest.raises(RecipeImportError):
+        normalize_url("ftp://site.com/x")
+
+
+def test_parse_ingredient_lines():
+    assert parse_ingredient("2 xícaras (chá) de farinha de trigo, peneirada") == {
+        "nome": "farinha de trigo", "quantidade": Decimal("2.000"), "unidade": "xicaras",
+        "observacoes": "peneirada", "nome_livre": "2 xícaras (chá) de farinha de trigo, peneirada",
+    }
+    ing = parse_ingredient("1 ½ colher (sopa) de manteiga")
+    assert (ing["quantidade"], ing["unidade"], ing["nome"]) == (Decimal("1.500"), "colher sopa", "manteiga")
+    ing = parse_ingredient("Sal a gosto")
+    assert (ing["quantidade"], ing["unidade"], ing["nome"], ing["observacoes"]) == (None, None, "sal", "a gosto")
+
+
+def test_parse_recipe_reads_json_ld_graph():
+    recipe = parse_recipe(_page("Bolo &amp; calda", ["3 ovos"]), "https://www.site.com/bolo")
+    assert recipe["titulo"] == "Bolo & calda"
+    assert (recipe["rendimento_porcoes"], recipe["tempo_preparo_min"], recipe["fonte"]) == (4, 75, "site.com")
+    with pytest.raises(RecipeImportError):
+        parse_recipe("<html></html>", "https://site.com")
+
+
+def test_product_names_pick_longest_span():
+    farinha, trigo_integral, ovo = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    names = ProductNames([
+        {"id": farinha, "nome": "Farinha de Trigo Tipo 1"},
+        {"id": trigo_integral, "nome": "Farinha de Trigo Integral"},
+        {"id": ovo, "nome": "Ovo Branco"},
+    ])
+    assert names.match("farinha de trigo peneirada") == farinha
+    assert names.match("farinha de trigo integral") == trigo_integral
+    assert names.match("ovos") == ovo
+    assert names.match("fermento") is None
+
+
+def test_fetch_all_respects_per_host_limit(site):
+    base, state = site
+    fetcher = RecipeFetcher(concurrency=10, per_host=3, allow_private=True)
+
+    async def run():
+        try:
+            return await fetcher.fetch_all([f"{base}/r/{i}" for i in range(12)] + [f"{base}/vazia", f"{base}/velha"])
+        finally:
+            await fetcher.aclose()
+
+    results = asyncio.run(run())
+    assert [r["titulo"] for r in results[:2]] == ["Bolo /r/0", "Bolo /r/1"]
+    assert isinstance(results[12], RecipeImportError)
+    assert results[13]["titulo"] == "Bolo /r/nova"  # redirecionamento seguido
+    assert state["peak"] <= 3
+    assert fetcher.stats()["hosts_active"] == 0
+
+
+def test_private_addresses_are_refused(site):
+    base, state = site
+    fetcher = RecipeFetcher()
+
+    async def run():
+        try:
+            return await fetcher.fetch_all([f"{base}/r/1"])
+        finally:
+            await fetcher.aclose()
+
+    [result] = asyncio.run(run())
+    assert str(result) == "Endereço não permitido"
+    assert state["hits"] == 0
+
+
+def _resolve(*addrs):
+    return AsyncMock(return_value=[(2, 1, 6, "", (a, 443)) for a in addrs])
+
+
+def test_connection_goes_to_the_vetted_address():
+    # resolvido uma vez só, na conexão: um segundo lookup (rebinding) não acontece
+    resolver = _resolve("93.184.216.34")
+    connect = AsyncMock(side_effect=httpcore.ConnectError("recusado"))
+    fetcher = RecipeFetcher()
+
+    async def run():
+        try:
+            return await fetcher.fetch_all(["https://receitas.example/bolo"])
+        finally:
+            await fetcher.aclose()
+
+    with patch("asyncio.base_events.BaseEventLoop.getaddrinfo", resolver), \
+            patch("httpcore.AnyIOBackend.connect_tcp", connect):
+        [result] = asyncio.run(run())
+    assert str(result) == "Falha ao buscar a página (ConnectError)"
+    resolver.assert_awaited_once()
+    assert resolver.await_args.args[0] == "receitas.example"
+    assert connect.await_args.args[0] == "93.184.216.34"
+
+
+def test_host_with_any_private_address_is_refused():
+    connect = AsyncMock()
+    fetcher = RecipeFetcher()
+
+    async def run():
+        try:
+            return await fetcher.fetch_all(["https://receitas.example/bolo"])
+        finally:
+            await fetcher.aclose()
+
+    with patch("asyncio.base_events.BaseEventLoop.getaddrinfo", _resolve("93.184.216.34", "10.0.0.5")), \
+            patch("httpcore.AnyIOBackend.connect_tcp", connect):
+        [result] = asyncio.run(run())
+    assert str(result) == "Endereço não permitido"
+    connect.assert_not_awaited()
+
+
+def test_already_imported_urls_are_not_fetched():
+    receita_id = uuid.uuid4()
+    db = MagicMock()
+    db.execute.return_value.all.return_value = [("https://site.com/bolo", receita_id, "Bolo")]
+    fetcher = MagicMock(fetch_all=AsyncMock(return_value=[]))
+
+    results = import_recipes(
+        db, uuid.uuid4(), ["http://www.site.com/bolo/", "https://site.com/bolo", "nada"], fetcher, lambda: ProductNames([]),
+    )
+    assert [r["status"] for r in results] == ["EXISTENTE", "EXISTENTE", "ERRO"]
+    assert results[0]["receita_id"] == receita_id
+    fetcher.fetch_all.assert_not_awaited()
+    db.execute.assert_called_once()
+    db.commit.assert_not_called()
+
+
+def test_dedupe_transaction_is_closed_before_fetching():
+    db = MagicMock()
+    db.execute.return_value.all.return_value = []
+    seen = {}
+
+    async def fetch_all(urls):
+        seen["rolled_back"] = db.rollback.called
+        return [RecipeImportError("HTTP 404")]
+
+    fetcher = MagicMock(fetch_all=fetch_all, aclose=AsyncMock())
+    [result] = import_recipes(db, uuid.uuid4(), ["https://site.com/bolo"], fetcher, lambda: ProductNames([]))
+    assert seen["rolled_back"] is True
+    assert (result["status"], result["erro"]) == ("ERRO", "HTTP 404")
+    fetcher.aclose.assert_awaited_once()
+    db.commit.assert_not_called()
+
+
+def test_worker_stores_counts_and_json_safe_items():
+    receita_id = uuid.uuid4()
+    worker = RecipeImportWorker(MagicMock(), MagicMock())
+    db = MagicMock()
+    itens = [
+        {"url": "a", "status": "IMPORTADA", "receita_id": receita_id, "titulo": "Bolo", "erro": None},
+        {"url": "b", "status": "IMPORTADA", "receita_id": uuid.uuid4(), "titulo": "Pão", "erro": None},
+        {"url": "c", "status": "ERRO", "receita_id": None, "titulo": None, "erro": "HTTP 404"},
+    ]
+    with patch.object(worker, "claim", return_value=(uuid.uuid4(), uuid.uuid4(), ["a", "b", "c"])), \
+            patch("app.services.recipe_import.import_recipes", return_value=itens):
+        assert worker.run_once(lambda: MagicMock(__enter__=lambda s: db, __exit__=lambda *a: None)) is True
+    values = db.execute.call_args[0][0].compile().params
+    assert (values["status"], values["importadas"], values["existentes"], values["erros"]) == ("CONCLUIDA", 2, 0, 1)
+    assert values["itens"][0]["receita_id"] == str(receita_id)
+    assert worker.done == 1
+
+
+def test_upgrade_adds_dedupe_key_to_existing_imports(pg):
+    user_id = uuid.uuid4()
+    with pg.begin() as conn:
+        # importacoes_receita como no baseline
+        conn.execute(text("ALTER TABLE importacoes_receita DROP CONSTRAINT uq_importacao_url"))
+        conn.execute(text("ALTER TABLE importacoes_receita DROP COLUMN url_normalizada, DROP COLUMN usuario_id"))
+        conn.execute(text("INSERT INTO users (id, email, senha_hash) VALUES (:id, 'a@b.com', 'x')"), {"id": user_id})
+        receitas = [uuid.uuid4(), uuid.uuid4()]
+        for rid in receitas:
+            conn.execute(text(
+                "INSERT INTO receitas (id, usuario_id, titulo, rendimento_porcoes, tempo_preparo_min, compartilhada)"
+                " VALUES (:id, :u, 'Bolo', 1, 10, false)"
+            ), {"id": rid, "u": user_id})
+        for ddl in RECIPE_DDL * 2:  # idempotente
+            conn.execute(text(ddl))
+        stmt = (
+            pg_insert(ImportacaoReceita)
+            .on_conflict_do_nothing(constraint="uq_importacao_url")
+            .returning(ImportacaoReceita.receita_id)
+        )
+        values = {"usuario_id": user_id, "url": "https://site.com/bolo", "url_normalizada": "https://site.com/bolo"}
+        assert conn.execute(stmt.values(id=uuid.uuid4(), receita_id=receitas[0], **values)).scalars().all() == [receitas[0]]
+        assert conn.execute(stmt.values(id=uuid.uuid4(), receita_id=receitas[1], **values)).scalars().all() == []
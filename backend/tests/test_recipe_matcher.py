@@ -0,0 +1,139 @@
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.units import MASSA, VOLUME, to_canonical
+from app.db.models.recipe import RECIPE_DDL
+from app.services.recipe_matcher import RecipeIndex, RecipeMatrix, load_rows, pantry_vectors
+
+OVO, FARINHA, LEITE = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+NOMES = {OVO: "Ovo", FARINHA: "Farinha", LEITE: "Leite"}
+ANA, BETO = uuid.uuid4(), uuid.uuid4()
+
+
+def recipe(titulo, dono, ingredientes, compartilhada=False):
+    rid = uuid.uuid4()
+    return [
+        dict(receita_id=rid, titulo=titulo, usuario_id=dono, compartilhada=compartilhada,
+             produto_id=p, produto=NOMES.get(p), quantidade=q, unidade=u)
+        for p, q, u in ingredientes
+    ]
+
+
+def stock(*items):
+    # mesmo formato de pantry.stock_totals_stmt
+    rows = []
+    for produto_id, unidade, quantidade in items:
+        canonical = to_canonical(quantidade, unidade)
+        rows.append((produto_id, canonical[0], None, canonical[1]) if canonical else (produto_id, None, unidade.upper(), quantidade))
+    return pantry_vectors(rows)
+
+
+def matrix():
+    return RecipeMatrix(
+        recipe("Omelete", ANA, [(OVO, 3, "UN"), (LEITE, 50, "ML")])
+        + recipe("Bolo", BETO, [(OVO, 2, "UN"), (FARINHA, 0.5, "KG")], compartilhada=True)
+        + recipe("Pudim", BETO, [(OVO, 4, "UN"), (LEITE, 1, "L")])
+    )
+
+
+def test_to_canonical():
+    assert to_canonical(0.5, "kg") == (MASSA, 500.0)
+    assert to_canonical(1, "xícara") == (VOLUME, 240.0)
+    assert to_canonical(2, "UN", peso_unidade=50) == (MASSA, 100.0)
+    assert to_canonical(1, "bandeja") is None
+
+
+def test_scores_by_quantity_and_hides_private_recipes():
+    pantry = stock((OVO, "UN", 2), (FARINHA, "G", 250), (LEITE, "L", 1))
+    m = matrix()
+    results = m.score(ANA, pantry)
+    titles = [m.titles[r] for r, _, _ in results]
+    assert titles == ["Omelete", "Bolo"]  # Pudim é privado do Beto
+    scores = [s for _, s, _ in results]
+    assert round(scores[0], 3) == round((2 / 3 + 1) / 2, 3)
+    assert round(scores[1], 3) == 0.75
+
+
+def test_lists_missing_ingredients_with_amounts():
+    m = matrix()
+    pantry = stock((OVO, "UN", 3))
+    results = {m.titles[r]: missing for r, _, missing in m.score(ANA, pantry)}
+    assert [(i["nome"], i["falta"]) for i in results["Omelete"]] == [("Leite", 50.0)]
+    assert [(i["nome"], i["falta"]) for i in results["Bolo"]] == [("Farinha", 500.0)]
+
+
+def test_unknown_pantry_unit_counts_as_present():
+    m = matrix()
+    pantry = stock((OVO, "bandeja", 1), (LEITE, "ML", 50))
+    (r, score, missing), = [x for x in m.score(ANA, pantry) if m.titles[x[0]] == "Omelete"]
+    assert score == 1.0 and missing == []
+
+
+def test_ingredients_without_product_count_but_are_never_covered():
+    m = RecipeMatrix(
+        recipe("Ovo cozido", ANA, [(OVO, 2, "UN"), (None, None, None)])
+        + recipe("Só texto", ANA, [(None, None, None)])
+    )
+    [(r, score, missing)] = m.score(ANA, stock((OVO, "UN", 2)))
+    assert m.titles[r] == "Ovo cozido"
+    assert int(m.n_ingredients[r]) == 2
+    assert score == 0.5 and missing == []
+
+
+def wait_until(cond):
+    for _ in range(200):
+        if cond():
+            return
+        time.sleep(0.01)
+
+
+def test_index_rebuilds_in_background_at_most_once_per_interval():
+    release = threading.Event()
+    loads = []
+
+    @contextmanager
+    def session_factory():
+        loads.append(1)
+        if len(loads) > 1:
+            release.wait(5)
+        yield None
+
+    index = RecipeIndex(ttl_s=300, min_interval_s=0.05)
+    with patch("app.services.recipe_matcher.load_rows", return_value=recipe("Bolo", ANA, [(OVO, 2, "UN")])):
+        first = index.get(session_factory)
+        index.invalidate()
+        assert index.get(session_factory) is first  # dentro do intervalo: nem rebuild
+        time.sleep(0.06)
+        for _ in range(20):  # escritas seguidas: um rebuild só, sem travar quem lê
+            index.invalidate()
+            assert index.get(session_factory) is first
+        wait_until(lambda: len(loads) == 2)
+        assert index.stats()["refreshing"] and index.builds == 1
+        release.set()
+        wait_until(lambda: index.builds == 2)
+        assert index.get(session_factory) is not first
+    assert len(loads) == 2 and not index.stats()["dirty"]
+
+
+def test_upgrade_adds_compartilhada_for_the_matcher(pg):
+    with pg.begin() as conn:
+        conn.execute(text("ALTER TABLE receitas DROP COLUMN compartilhada"))
+        conn.execute(text("INSERT INTO users (id, email, senha_hash) VALUES (:id, 'a@b.com', 'x')"), {"id": ANA})
+        conn.execute(text(
+            "INSERT INTO receitas (id, usuario_id, titulo, rendimento_porcoes, tempo_preparo_min)"
+            " VALUES (gen_random_uuid(), :u, 'Omelete', 1, 10)"
+        ), {"u": ANA})
+        conn.execute(text(
+            "INSERT INTO ingredientes_receita (id, receita_id, nome_livre) SELECT gen_random_uuid(), id, 'ovo' FROM receitas"
+        ))
+        for ddl in RECIPE_DDL:
+            conn.execute(text(ddl))
+    with Session(pg) as db:
+        [row] = load_rows(db)
+    assert (row["titulo"], row["compartilhada"]) == ("Omelete", False)
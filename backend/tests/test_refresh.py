@@ -0,0 +1,56 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes.auth import refresh
+from app.db.models.token import RefreshToken
+from app.db.models.user import User
+from app.schemas.auth import RefreshInput
+
+
+def make_db(token, user):
+    db = MagicMock()
+    query = db.query.return_value.join.return_value.filter.return_value
+    query.with_for_update.return_value.first.return_value = (token, user) if token else None
+    return db
+
+
+def stored_token(**kwargs):
+    now = datetime.now(timezone.utc)
+    values = dict(familia_id=uuid.uuid4(), criado_em=now, expira_em=now + timedelta(days=1))
+    values.update(kwargs)
+    return RefreshToken(**values)
+
+
+def test_refresh_rotates_token():
+    token = stored_token()
+    user = User(id=uuid.uuid4(), email="ana@example.com", fl_ativo=True)
+    db = make_db(token, user)
+    out = refresh(RefreshInput(refresh_token="abc"), db=db)
+    assert out["access_token"] and out["refresh_token"]
+    assert token.usado_em is not None
+    novo = db.add.call_args.args[0]
+    assert novo.familia_id == token.familia_id
+    assert novo.token_hash != token.token_hash
+    db.commit.assert_called_once()
+
+
+def test_reused_token_revokes_family():
+    token = stored_token(usado_em=datetime.now(timezone.utc))
+    db = make_db(token, User(email="ana@example.com", fl_ativo=True))
+    with pytest.raises(HTTPException) as exc:
+        refresh(RefreshInput(refresh_token="abc"), db=db)
+    assert exc.value.status_code == 401
+    db.query.return_value.filter.return_value.update.assert_called_once()
+    db.add.assert_not_called()
+
+
+def test_expired_and_unknown_tokens_are_rejected():
+    expired = stored_token(expira_em=datetime.now(timezone.utc) - timedelta(seconds=1))
+    for db in (make_db(expired, User(fl_ativo=True)), make_db(None, None)):
+        with pytest.raises(HTTPException) as exc:
+            refresh(RefreshInput(refresh_token="abc"), db=db)
+        assert exc.value.status_code == 401
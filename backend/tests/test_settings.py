@@ -0,0 +1,74 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy import text
+
+from app.api.routes.settings import _reconcile_consents
+from app.db.models.lgpd import CONSENT_DDL
+
+
+def _db(active):
+    db = MagicMock()
+    result = MagicMock()
+    result.scalars.return_value = iter(active)
+    db.execute = AsyncMock(side_effect=[result, MagicMock(), MagicMock()])
+    return db
+
+
+def _sql(stmt):
+    return str(stmt)
+
+
+def test_reconcile_consents_bulk_statements():
+    db = _db(["camera", "memory"])
+    asyncio.run(_reconcile_consents(db, uuid.uuid4(), {
+        "location": True, "camera": False, "memory": True, "microphone": False,
+    }))
+    # SELECT dos ativos + um INSERT + um UPDATE
+    assert db.execute.await_count == 3
+    insert, update = (_sql(c.args[0]) for c in db.execute.await_args_list[1:])
+    assert insert.startswith("INSERT INTO consentimentos") and "ON CONFLICT" in insert
+    assert update.startswith("UPDATE consentimentos")
+    assert db.execute.await_args_list[1].args[0].compile().params["escopo_m0"] == "location"
+    assert db.execute.await_args_list[2].args[0].compile().params["escopo_1"] == ["camera"]
+
+
+def test_reconcile_consents_noop_when_already_in_sync():
+    db = _db(["camera"])
+    asyncio.run(_reconcile_consents(db, uuid.uuid4(), {"camera": True, "location": False}))
+    assert db.execute.await_count == 1
+
+
+def test_reconcile_consents_skips_empty_payload():
+    db = _db([])
+    asyncio.run(_reconcile_consents(db, uuid.uuid4(), {}))
+    db.execute.assert_not_awaited()
+
+
+def test_consent_upgrade_keeps_latest_grant_and_enables_on_conflict(pg):
+    user_id = uuid.uuid4()
+    now = datetime.now(timezone.utc)
+    with pg.begin() as conn:
+        # banco antigo: sem o índice parcial e com ativos repetidos
+        conn.execute(text("DROP INDEX uq_consentimento_ativo"))
+        conn.execute(text("INSERT INTO users (id, email, senha_hash) VALUES (:id, 'a@b.com', 'x')"), {"id": user_id})
+        for dias in (3, 1, 2):
+            conn.execute(
+                text("INSERT INTO consentimentos (id, usuario_id, escopo, concedido_em) VALUES (:id, :u, 'camera', :t)"),
+                {"id": uuid.uuid4(), "u": user_id, "t": now - timedelta(days=dias)},
+            )
+        for ddl in CONSENT_DDL * 2:  # idempotente
+            conn.execute(text(ddl))
+        active = conn.execute(
+            text("SELECT concedido_em FROM consentimentos WHERE revogado_em IS NULL")
+        ).scalars().all()
+        assert active == [now - timedelta(days=1)]
+
+    db = _db([])
+    asyncio.run(_reconcile_consents(db, user_id, {"camera": True}))
+    with pg.begin() as conn:
+        # o INSERT ... ON CONFLICT da rota agora encontra o índice
+        conn.execute(db.execute.await_args_list[1].args[0])
+        assert conn.execute(text("SELECT count(*) FROM consentimentos WHERE revogado_em IS NULL")).scalar() == 1
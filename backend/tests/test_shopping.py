@@ -0,0 +1,76 @@
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace as NS
+
+from app.core.units import CONTAGEM, MASSA
+from app.services.shopping import compare_markets, plan_requirements, shopping_items, stock_amounts
+
+OVO, FARINHA = uuid.uuid4(), uuid.uuid4()
+
+
+def ing(produto_id=None, quantidade=None, unidade=None, nome_livre=None):
+    return NS(produto_id=produto_id, quantidade=quantidade, unidade=unidade, nome_livre=nome_livre)
+
+
+def plan():
+    bolo = NS(rendimento_porcoes=8, ingredientes=[
+        ing(OVO, Decimal("4"), "UN"), ing(FARINHA, Decimal("0.5"), "KG"), ing(nome_livre="Sal", quantidade=Decimal("1"), unidade="pitada"),
+    ])
+    omelete = NS(rendimento_porcoes=1, ingredientes=[ing(OVO, Decimal("2"), "UN"), ing(nome_livre="sal", quantidade=Decimal("1"), unidade="PITADA")])
+    return [NS(receitas=[bolo]), NS(receitas=[omelete]), NS(receitas=[omelete])]
+
+
+def test_plan_scales_by_servings_and_aggregates_in_canonical_units():
+    need, labels = plan_requirements(plan(), porcoes=2)
+    assert need[(OVO, CONTAGEM)] == 4 * 2 / 8 + 2 * 2 * 2
+    assert need[(FARINHA, MASSA)] == 500 * 2 / 8
+    assert need[("sal", "PITADA")] == 0.25 + 4
+    assert labels == {"sal": "Sal"}
+
+
+def test_shopping_items_subtract_stock_and_round_units_up():
+    need, labels = plan_requirements(plan(), porcoes=2)
+    have = stock_amounts([(OVO, CONTAGEM, None, 3.0), (FARINHA, MASSA, None, 1000.0)])
+    items = {i["produto_id"] or i["nome_livre"]: (i["quantidade"], i["unidade"]) for i in shopping_items(need, have, labels)}
+    assert items == {OVO: (Decimal("6.000"), "UN"), "Sal": (Decimal("4.250"), "PITADA")}
+
+
+def test_without_servings_uses_recipe_yield():
+    need, _ = plan_requirements(plan())
+    assert need[(FARINHA, MASSA)] == 500
+
+
+def test_piece_weight_merges_units_and_grams():
+    ovo = NS(densidade_g_ml=None, peso_unidade_g=Decimal("50"))
+    receita = NS(rendimento_porcoes=1, ingredientes=[
+        NS(produto_id=OVO, produto=ovo, quantidade=Decimal("2"), unidade="un", nome_livre=None),
+        NS(produto_id=OVO, produto=ovo, quantidade=Decimal("120"), unidade="g", nome_livre=None),
+    ])
+    need, _ = plan_requirements([NS(receitas=[receita])])
+    assert need == {(OVO, MASSA): 220.0}
+    items = shopping_items(need, {}, pesos={OVO: Decimal("50")})
+    assert (items[0]["quantidade"], items[0]["unidade"]) == (Decimal("5.000"), "UN")
+
+
+def test_compare_markets_prefers_coverage_then_total():
+    a, b = uuid.uuid4(), uuid.uuid4()
+    i1, i2, i3 = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    rows = [
+        (i1, OVO, a, "A", Decimal("9.60")),
+        (i1, OVO, b, "B", Decimal("8.00")),
+        (i2, FARINHA, a, "A", Decimal("25.00")),
+        (i3, None, None, None, None),
+    ]
+    result = compare_markets(rows)
+    assert result["mais_barato"]["mercado_id"] == a
+    assert [(m["nome"], m["total"], m["itens_sem_preco"]) for m in result["mercados"]] == [
+        ("A", Decimal("34.60"), 1), ("B", Decimal("8.00"), 2),
+    ]
+    itens = {i["item_id"]: i for i in result["itens"]}
+    assert itens[i1]["preco_estimado"] == Decimal("9.60")
+    assert (itens[i1]["melhor_mercado_id"], itens[i1]["melhor_preco"]) == (b, Decimal("8.00"))
+    assert itens[i3]["preco_estimado"] is None
+
+
+def test_compare_markets_empty_list():
+    assert compare_markets([(None, None, None, None, None)]) == {"itens": [], "mercados": [], "mais_barato": None}
@@ -0,0 +1,114 @@
+import asyncio
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes.stock import _decode_cursor, _encode_cursor, list_expiring, stock_exit, stock_transfer
+from app.db.models.product import Produto
+from app.db.models.storage import ItemEstoque
+from app.db.models.user import User
+from app.schemas.stock import SaidaIn, TransferenciaIn
+
+
+def result(first=None, scalar=None):
+    r = MagicMock()
+    r.scalars.return_value.first.return_value = first
+    r.scalar_one_or_none.return_value = scalar
+    r.scalar_one.return_value = scalar
+    return r
+
+
+def make_db(*results):
+    db = MagicMock()
+    db.execute = AsyncMock(side_effect=list(results))
+    db.commit = AsyncMock()
+    return db
+
+
+def user():
+    return User(id=uuid.uuid4(), email="ana@example.com")
+
+
+def test_exit_updates_balance_and_item_total():
+    local = uuid.uuid4()
+    item = ItemEstoque(id=uuid.uuid4(), local_id=local, quantidade=Decimal("3"))
+    db = make_db(result(first=item), result(scalar=Decimal("1")))
+    out = asyncio.run(stock_exit(SaidaIn(item_id=item.id, quantidade=Decimal("2")), db=db, current_user=user()))
+    assert out.saldo_de == Decimal("1") and out.total_item == Decimal("1")
+    assert db.add.call_args.args[0].tipo == "SAIDA"
+    db.commit.assert_awaited_once()
+
+
+def test_exit_rejects_insufficient_balance():
+    item = ItemEstoque(id=uuid.uuid4(), local_id=uuid.uuid4(), quantidade=Decimal("1"))
+    db = make_db(result(first=item), result(scalar=None))
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(stock_exit(SaidaIn(item_id=item.id, quantidade=Decimal("5")), db=db, current_user=user()))
+    assert exc.value.status_code == 409
+    db.commit.assert_not_awaited()
+
+
+def test_transfer_debits_and_credits_in_one_transaction():
+    item = ItemEstoque(id=uuid.uuid4(), quantidade=Decimal("4"))
+    de, para = uuid.uuid4(), uuid.uuid4()
+    db = make_db(result(first=item), result(scalar=1), result(scalar=Decimal("1")), result(scalar=Decimal("3")))
+    body = TransferenciaIn(item_id=item.id, de_local_id=de, para_local_id=para, quantidade=Decimal("3"))
+    out = asyncio.run(stock_transfer(body, db=db, current_user=user()))
+    assert (out.saldo_de, out.saldo_para, out.total_item) == (Decimal("1"), Decimal("3"), Decimal("4"))
+    db.commit.assert_awaited_once()
+
+
+def test_transfer_same_location_is_rejected():
+    local = uuid.uuid4()
+    body = TransferenciaIn(item_id=uuid.uuid4(), de_local_id=local, para_local_id=local, quantidade=Decimal("1"))
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(stock_transfer(body, db=make_db(), current_user=user()))
+    assert exc.value.status_code == 400
+
+
+def test_cursor_roundtrip_and_invalid_cursor():
+    item_id = uuid.uuid4()
+    assert _decode_cursor(_encode_cursor(date(2026, 11, 1), item_id)) == (date(2026, 11, 1), item_id)
+    with pytest.raises(HTTPException) as exc:
+        _decode_cursor("nada")
+    assert exc.value.status_code == 400
+
+
+def test_expiring_uses_keyset_and_single_query():
+    today = date.today()
+    local = uuid.uuid4()
+    items = [
+        (ItemEstoque(id=uuid.uuid4(), produto_id=uuid.uuid4(), quantidade=Decimal("3"), unidade="UN",
+                     validade=today + timedelta(days=d), produto=Produto(nome=f"p{d}")), local, "Geladeira", Decimal("1"))
+        for d in range(3)
+    ]
+    db = make_db(MagicMock(all=lambda: items))
+    cursor = _encode_cursor(today, uuid.uuid4())
+    page = asyncio.run(list_expiring(limit=2, cursor=cursor, local_id=None, days=None, db=db, current_user=user()))
+    assert [i.dias_restantes for i in page.items] == [0, 1]
+    assert (page.items[0].local_id, page.items[0].local, page.items[0].quantidade) == (local, "Geladeira", Decimal("3"))
+    assert _decode_cursor(page.next_cursor) == (items[1][0].validade, items[1][0].id)
+    sql = str(db.execute.await_args.args[0])
+    assert "OFFSET" not in sql
+    assert "(itens_estoque.validade, itens_estoque.id) >" in sql
+    assert "JOIN produtos" in sql and "JOIN locais_estoque" in sql
+    assert db.execute.await_count == 1
+
+
+def test_expiring_filters_location_by_balance():
+    # item cadastrado na despensa e transferido inteiro para a geladeira
+    today = date.today()
+    despensa, geladeira = uuid.uuid4(), uuid.uuid4()
+    item = ItemEstoque(id=uuid.uuid4(), produto_id=uuid.uuid4(), local_id=despensa, quantidade=Decimal("3"), unidade="UN",
+                       validade=today, produto=Produto(nome="Leite"))
+    db = make_db(MagicMock(all=lambda: [(item, geladeira, "Geladeira", Decimal("2"))]))
+    page = asyncio.run(list_expiring(limit=10, cursor=None, local_id=geladeira, days=None, db=db, current_user=user()))
+    assert (page.items[0].local_id, page.items[0].quantidade) == (geladeira, Decimal("2"))
+    sql = str(db.execute.await_args.args[0])
+    assert "JOIN LATERAL" in sql
+    assert "saldos_estoque.local_id = :local_id_" in sql and "saldos_estoque.quantidade >" in sql
+    assert "itens_estoque.local_id =" not in sql
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+from functools import partial
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes.transcribe import router
+from app.services.streaming import StreamingSession
+
+
+def pcm(seconds, value=0):
+    return np.full(int(16000 * seconds), value, dtype="<i2").tobytes()
+
+
+def energy_vad(audio):
+    # VAD de teste: fala = amostras não nulas
+    voiced = np.flatnonzero(audio)
+    if not len(voiced):
+        return []
+    return [{"start": int(voiced[0]), "end": int(voiced[-1]) + 1}]
+
+
+def test_finalizes_segment_after_silence():
+    session = StreamingSession(vad=energy_vad, min_silence_ms=500)
+    session.feed(pcm(0.2) + pcm(1.0, 1000))
+    assert session.pop_finished() == []
+    assert session.take_partial() is not None
+
+    session.feed(pcm(0.6))
+    [seg] = session.pop_finished()
+    assert seg.start == 0.2
+    assert seg.end == 1.2
+    assert len(seg.audio) == 16000
+    assert session.take_partial() is None
+
+
+def test_flush_returns_open_speech():
+    session = StreamingSession(vad=energy_vad)
+    session.feed(pcm(3.0) + pcm(0.5, 1000))
+    assert session.pop_finished() == []
+    seg = session.flush()
+    assert (seg.start, seg.end) == (3.0, 3.5)
+    assert session.flush() is None
+
+
+def test_partial_is_capped_to_the_last_seconds():
+    session = StreamingSession(vad=energy_vad, max_partial_s=2)
+    session.feed(pcm(0.5) + pcm(6.0, 1000))
+    session.pop_finished()
+    seg = session.take_partial()
+    assert (seg.start, seg.end) == (4.5, 6.5)
+
+
+def test_vad_only_scans_new_audio_plus_overlap():
+    scanned = []
+
+    def vad(audio):
+        scanned.append(len(audio))
+        return energy_vad(audio)
+
+    session = StreamingSession(vad=vad, min_silence_ms=500, overlap_ms=1000)
+    session.feed(pcm(0.5))
+    session.pop_finished()
+    for _ in range(200):  # 20 s de fala em pedaços de 100 ms
+        session.feed(pcm(0.1, 1000))
+        assert session.pop_finished() == []
+    assert max(scanned) <= 16000 * 1.1
+    segments = []
+    for _ in range(6):
+        session.feed(pcm(0.1))
+        segments += session.pop_finished()
+    [seg] = segments
+    assert (seg.start, seg.end) == (0.5, 20.5)
+    assert len(seg.audio) == 16000 * 20
+
+
+def _stream_client(engine):
+    tiers = MagicMock()
+    tiers.choose.return_value = "tiny"
+    tiers.engine.return_value = engine
+    app = FastAPI()
+    app.include_router(router)
+    return tiers, app
+
+
+def test_stream_keeps_only_the_latest_partial_while_engine_is_busy():
+    fed = threading.Event()
+    calls = []
+
+    class Session(StreamingSession):
+        def feed(self, chunk):
+            super().feed(chunk)
+            if self.total_samples >= 16000 * 6:
+                fed.set()
+
+    class Engine:
+        async def transcribe(self, audio, language):
+            calls.append(len(audio))
+            if len(calls) == 1:
+                # a 1ª parcial ocupa o engine até o cliente mandar 6 s de fala
+                await asyncio.get_running_loop().run_in_executor(None, fed.wait, 5)
+            return f"{len(audio)}"
+
+    tiers, app = _stream_client(Engine())
+    with patch("app.api.routes.transcribe.tiers", tiers), \
+            patch("app.api.routes.transcribe.StreamingSession", partial(Session, vad=energy_vad)):
+        with TestClient(app).websocket_connect("/voice/stream") as ws:
+            for _ in range(6):
+                ws.send_bytes(pcm(1.0, 1000))  # fala contínua: uma parcial por segundo
+            ws.send_bytes(pcm(0.6))  # silêncio: fecha o segmento
+            ws.send_text('{"type": "stop"}')
+            messages = []
+            while not messages or messages[-1]["type"] != "done":
+                messages.append(ws.receive_json())
+    # as parciais que chegaram com o engine ocupado foram substituídas pela mais recente
+    assert calls[0] == 16000
+    assert not {32000, 48000, 64000} & set(calls)
+    assert [m["type"] for m in messages].count("final") == 1
+    assert messages[-1] == {"type": "done", "text": str(16000 * 6)}
+
+
+def test_stream_enforces_max_duration():
+    tiers, app = _stream_client(MagicMock())
+    with patch("app.api.routes.transcribe.tiers", tiers), \
+            patch("app.api.routes.transcribe.StreamingSession", partial(StreamingSession, vad=energy_vad)), \
+            patch("app.api.routes.transcribe.settings.TRANSCRIBE_MAX_DURATION_S", 2):
+        with TestClient(app).websocket_connect("/voice/stream") as ws:
+            ws.send_bytes(pcm(1.5))
+            ws.send_bytes(pcm(1.0))
+            assert ws.receive_json() == {"type": "error", "detail": "Áudio mais longo que 2 s."}
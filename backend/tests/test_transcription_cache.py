@@ -0,0 +1,136 @@
+import asyncio
+import io
+import os
+import time
+from concurrent.futures import Future
+from unittest.mock import MagicMock, patch
+
+import httpx
+import numpy as np
+from fastapi import FastAPI
+
+from app.api.routes.transcribe import _cache_key, router
+from app.services.audio import AudioRejected
+from app.services.transcription_cache import TranscriptionCache, cache_key, hash_upload
+
+
+def _done(value):
+    fut = Future()
+    fut.set_result(value)
+    return fut
+
+
+def test_key_depends_on_audio_language_and_params():
+    digest = hash_upload(io.BytesIO(b"audio"))
+    base = cache_key(digest, "pt", "small", beam_size=5)
+    assert base == cache_key(digest, "pt", "small", beam_size=5)
+    assert base != cache_key(digest, "en", "small", beam_size=5)
+    assert base != cache_key(digest, "pt", "small", beam_size=1)
+    assert base != cache_key(hash_upload(io.BytesIO(b"outro")), "pt", "small", beam_size=5)
+
+
+def test_lru_evicts_oldest():
+    cache = TranscriptionCache(max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["misses"]) == (2, 1)
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    TranscriptionCache(disk_dir=str(tmp_path)).put("abc", "arroz")
+    cache = TranscriptionCache(disk_dir=str(tmp_path))
+    assert cache.get("abc") == "arroz"
+    assert cache.get("abc") == "arroz"
+    assert (cache.stats()["disk_hits"], cache.stats()["memory_hits"]) == (1, 1)
+
+
+def test_reserve_gives_one_owner_per_key():
+    cache = TranscriptionCache()
+    job, owner = cache.reserve("k")
+    assert owner is True
+    assert cache.reserve("k") == (job, False)
+    job.set_result("feijão")
+    assert cache.get("k") == "feijão"
+    again, owner = cache.reserve("k")
+    assert owner is True and again is not job
+    again.set_exception(RuntimeError("falhou"))
+    # erro não vai para o cache e libera a chave
+    assert cache.reserve("k")[1] is True
+    assert cache.stats()["inflight_hits"] == 1
+
+
+def test_disk_tier_is_a_bounded_lru(tmp_path):
+    cache = TranscriptionCache(max_entries=0, disk_dir=str(tmp_path), max_disk_entries=2)
+    cache.put("aa1", "1")
+    cache.put("aa2", "2")
+    assert cache.get("aa1") == "1"  # aa1 passa a ser a mais recente
+    cache.put("aa3", "3")
+    assert cache.get("aa2") is None
+    assert sorted(os.listdir(tmp_path / "aa")) == ["aa1.json", "aa3.json"]
+    assert cache.stats()["disk_evictions"] == 1
+
+    os.utime(tmp_path / "aa" / "aa1.json", (0, 0))
+    restarted = TranscriptionCache(max_entries=0, disk_dir=str(tmp_path), max_disk_entries=1)
+    # no restart vale a data de uso: sai a menos recente
+    assert restarted.stats()["disk_entries"] == 1
+    assert os.listdir(tmp_path / "aa") == ["aa3.json"]
+
+
+def test_key_changes_with_decoding_configuration():
+    base = _cache_key("d", "pt", None)
+    with patch("app.api.routes.transcribe.settings.WHISPER_COMPUTE", "float32"):
+        assert _cache_key("d", "pt", None) != base
+    with patch.dict("app.api.routes.transcribe.DECODE_OPTIONS", beam_size=1):
+        assert _cache_key("d", "pt", None) != base
+
+
+def test_identical_uploads_arriving_together_run_one_inference():
+    engine = MagicMock()
+    engine.submit.side_effect = lambda pcm, lang: _done("arroz")
+    tiers = MagicMock()
+    tiers.choose.return_value = "tiny"
+    tiers.engine.return_value = engine
+
+    def slow_decode(file, **_kw):
+        time.sleep(0.2)  # o segundo pedido chega durante a decodificação
+        return np.zeros(16000, dtype=np.float32)
+
+    app = FastAPI()
+    app.include_router(router)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            files = {"audio": ("a.wav", b"RIFF-mesmo-audio", "audio/wav")}
+            return await asyncio.gather(*(client.post("/voice/transcribe", files=files) for _ in range(3)))
+
+    with patch("app.api.routes.transcribe.tiers", tiers), \
+            patch("app.api.routes.transcribe.cache", TranscriptionCache()) as cache, \
+            patch("app.api.routes.transcribe.decode_audio", side_effect=slow_decode) as decode:
+        responses = asyncio.run(run())
+    assert [r.json() for r in responses] == [{"text": "arroz", "model": "tiny"}] * 3
+    assert decode.call_count == 1
+    assert engine.submit.call_count == 1
+    assert cache.stats()["inflight_hits"] == 2
+
+
+def test_rejected_upload_releases_the_key():
+    app = FastAPI()
+    app.include_router(router)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            files = {"audio": ("a.wav", b"nao-e-audio", "audio/wav")}
+            return [await client.post("/voice/transcribe", files=files) for _ in range(2)]
+
+    with patch("app.api.routes.transcribe.cache", TranscriptionCache()), \
+            patch("app.api.routes.transcribe.decode_audio", side_effect=AudioRejected("formato", 415)) as decode:
+        responses = asyncio.run(run())
+    assert [r.status_code for r in responses] == [415, 415]
+    assert decode.call_count == 2
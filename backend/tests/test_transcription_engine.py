@@ -0,0 +1,195 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace as NS
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+from faster_whisper.feature_extractor import FeatureExtractor
+
+from app.services.transcription import (
+    DECODE_OPTIONS, VAD_PARAMETERS, TranscriptionEngine, ModelTiers, EngineBusy, run_batched_transcription,
+    run_transcription,
+)
+
+
+def wait_for(cond, timeout=5):
+    end = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < end
+        time.sleep(0.005)
+
+
+def make_engine(gate=None, calls=None, **kwargs):
+    def runner(_model, audios, language):
+        if calls is not None:
+            calls.append(list(audios))
+        if gate:
+            gate.wait(5)
+        return [f"{language}:{a}" for a in audios]
+    engine = TranscriptionEngine("tiny", "int8", model_loader=lambda *_: None, batch_runner=runner, **kwargs)
+    engine.start().join(5)
+    return engine
+
+
+def test_transcribe_runs_on_pool():
+    engine = make_engine()
+    text = asyncio.run(engine.transcribe("mundo", "pt"))
+    assert text == "pt:mundo"
+    assert engine.stats()["batches"] == 1
+    engine.shutdown()
+
+
+def test_rejects_when_queue_is_full():
+    gate = threading.Event()
+    engine = make_engine(gate, workers=1, max_queue=1, retry_after=7)
+    first = engine.submit("a")
+    wait_for(lambda: engine.stats()["in_flight"] == 1)
+    second = engine.submit("b")
+    assert engine.stats()["queue_depth"] == 1
+
+    with pytest.raises(EngineBusy) as exc:
+        engine.submit("c")
+    assert exc.value.retry_after == 7
+    assert engine.stats()["rejected"] == 1
+
+    gate.set()
+    assert first.result(5) == "None:a"
+    assert second.result(5) == "None:b"
+    engine.shutdown()
+
+
+def test_batches_requests_waiting_for_a_worker():
+    gate = threading.Event()
+    calls = []
+    engine = make_engine(gate, calls, workers=1, max_queue=10, max_batch_size=4)
+    first = engine.submit("a", "pt")
+    wait_for(lambda: engine.stats()["in_flight"] == 1)
+    rest = [engine.submit(x, "pt") for x in "bcdef"]
+
+    gate.set()
+    assert [f.result(5) for f in rest] == ["pt:b", "pt:c", "pt:d", "pt:e", "pt:f"]
+    assert first.result(5) == "pt:a"
+    assert calls == [["a"], ["b", "c", "d", "e"], ["f"]]
+    assert engine.stats()["batch_size_histogram"] == {1: 2, 4: 1}
+    engine.shutdown()
+
+
+def test_batches_only_same_language():
+    calls = []
+    engine = make_engine(calls=calls, max_batch_size=8, batch_window_ms=50)
+    futs = [engine.submit("a", "pt"), engine.submit("b", "en"), engine.submit("c", "pt")]
+    assert [f.result(5) for f in futs] == ["pt:a", "en:b", "pt:c"]
+    assert sorted(calls) == [["a", "c"], ["b"]]
+    engine.shutdown()
+
+
+def test_rejects_until_model_is_loaded():
+    loaded = threading.Event()
+
+    def loader(*_):
+        loaded.wait(5)
+
+    engine = TranscriptionEngine("tiny", "int8", model_loader=loader)
+    with pytest.raises(EngineBusy):
+        engine.submit("a")
+    engine.start()
+    assert not engine.stats()["ready"]
+    loaded.set()
+    wait_for(lambda: engine.ready)
+    engine.shutdown()
+
+
+def make_tiers(gate=None, **kwargs):
+    def loader(size, _compute):
+        if gate and size == "tiny":
+            gate.wait(5)
+
+    def factory(size):
+        return TranscriptionEngine(size, "int8", model_loader=loader, batch_runner=lambda m, a, l: [size] * len(a))
+    return ModelTiers(["tiny", "base", "small"], factory, default="small", short_s=5, long_s=30, **kwargs)
+
+
+def test_tiers_route_by_duration_and_language():
+    tiers = make_tiers()
+    for size in tiers.sizes:
+        tiers.engine(size).start().join(5)
+    assert tiers.choose(2, "pt") == "tiny"
+    assert tiers.choose(12, "pt") == "base"
+    assert tiers.choose(90, "pt") == "small"
+    assert tiers.choose(2, None) == "base"
+    assert tiers.choose(90, "pt", override="tiny") == "tiny"
+    with pytest.raises(ValueError):
+        tiers.choose(2, "pt", override="large")
+    assert tiers.stats()["routed"] == {"tiny": 2, "base": 2, "small": 1}
+    tiers.shutdown()
+
+
+def test_tiers_fall_back_to_loaded_model():
+    gate = threading.Event()
+    tiers = make_tiers(gate)
+    tiers.start()
+    wait_for(lambda: tiers.ready)
+    # tiny começa a carregar, mas enquanto isso o pedido vai pro small
+    assert tiers.choose(2, "pt") == "small"
+    gate.set()
+    wait_for(lambda: tiers.engine("tiny").ready)
+    assert tiers.choose(2, "pt") == "tiny"
+    tiers.shutdown()
+
+
+def test_batch_with_wrong_number_of_results_fails_every_request():
+    engine = TranscriptionEngine(
+        "tiny", "int8", model_loader=lambda *_: None, batch_runner=lambda _m, audios, _l: ["só um"],
+        workers=1, max_batch_size=2, batch_window_ms=200,
+    )
+    engine.start().join(5)
+    futures = [engine.submit("a", "pt"), engine.submit("b", "pt")]
+    for fut in futures:
+        with pytest.raises(RuntimeError, match="1 resultados para 2"):
+            fut.result(5)
+    assert engine.stats()["failed"] == 2
+    engine.shutdown()
+
+
+def test_batched_runner_uses_the_same_decoding_as_single_requests():
+    # modelo falso só no encoder/decoder: VAD, extração de features e
+    # agrupamento por áudio são os do faster-whisper
+    sr = 16000
+    model = NS(feature_extractor=FeatureExtractor(), hf_tokenizer=None, model=NS(is_multilingual=True))
+    speech = {0: [{"start": 0, "end": sr}], 1: [], 2: [{"start": 0, "end": sr}, {"start": 2 * sr, "end": 3 * sr}]}
+    audios = [np.full(3 * sr, i, dtype=np.float32) for i in range(3)]
+    seen = {}
+
+    class Pipeline:
+        def __init__(self, _model):
+            pass
+
+        def forward(self, features, _tokenizer, metadata, options):
+            seen["options"], seen["features"] = options, features.shape
+            return [[{"text": f"trecho{n}"}] for n in range(len(metadata))]
+
+    def vad(audio, options):
+        seen["vad"] = options
+        return speech[int(audio[0])]
+
+    with patch("faster_whisper.BatchedInferencePipeline", Pipeline), \
+            patch("faster_whisper.tokenizer.Tokenizer"), patch("faster_whisper.transcribe.get_suppressed_tokens"), \
+            patch("faster_whisper.vad.get_speech_timestamps", vad):
+        texts = run_batched_transcription(model, audios, "pt")
+    assert texts == ["trecho0", "", "trecho1"]  # os dois trechos do 3º áudio viram um chunk
+    assert seen["features"][0] == 2
+    options = seen["options"]
+    assert options.temperatures == [DECODE_OPTIONS["temperature"]]
+    assert (options.beam_size, options.condition_on_previous_text, options.without_timestamps) == (
+        DECODE_OPTIONS["beam_size"], DECODE_OPTIONS["condition_on_previous_text"], DECODE_OPTIONS["without_timestamps"],
+    )
+    assert seen["vad"].min_silence_duration_ms == VAD_PARAMETERS["min_silence_duration_ms"]
+
+    single = MagicMock()
+    single.transcribe.return_value = ([NS(text=" oi ")], None)
+    assert run_transcription(single, audios[0], "pt") == "oi"
+    kwargs = single.transcribe.call_args.kwargs
+    assert kwargs["vad_parameters"] == VAD_PARAMETERS
+    assert {k: kwargs[k] for k in DECODE_OPTIONS} == DECODE_OPTIONS
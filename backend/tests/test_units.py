@@ -0,0 +1,39 @@
+import numpy as np
+from sqlalchemy import text
+
+from app.core.units import CONTAGEM, DESCONHECIDA, MASSA, VOLUME, to_canonical, to_canonical_array
+from app.db.models.product import PRODUTO_DDL
+
+
+def test_aliases_and_accents():
+    assert to_canonical(2, "Colheres de Sopa") == (VOLUME, 30.0)
+    assert to_canonical(1, "dúzia") == (CONTAGEM, 12.0)
+    assert to_canonical(3, None) == (CONTAGEM, 3.0)
+
+
+def test_density_turns_volume_into_mass():
+    assert to_canonical(1, "xicara", densidade=0.5) == (MASSA, 120.0)
+
+
+def test_array_path_matches_scalar_path():
+    qty = [1, 0.5, 2, 3, None, 4]
+    units = ["kg", "L", "un", "bandeja", "g", "ml"]
+    dens = [None, None, None, None, None, 1.03]
+    pesos = [None, None, 60, None, None, None]
+    dims, values = to_canonical_array(qty, units, dens, pesos)
+    assert dims.tolist() == [MASSA, VOLUME, MASSA, DESCONHECIDA, DESCONHECIDA, MASSA]
+    for i in (0, 1, 2, 5):
+        assert (dims[i], values[i]) == to_canonical(qty[i], units[i], dens[i], pesos[i])
+    assert np.isnan(values[3]) and np.isnan(values[4])
+
+
+def test_upgrade_adds_conversion_columns(pg):
+    with pg.begin() as conn:
+        conn.execute(text("ALTER TABLE produtos DROP COLUMN densidade_g_ml, DROP COLUMN peso_unidade_g"))
+        for ddl in PRODUTO_DDL:
+            conn.execute(text(ddl))
+        conn.execute(text(
+            "INSERT INTO produtos (id, nome, densidade_g_ml, peso_unidade_g)"
+            " VALUES (gen_random_uuid(), 'Leite', 1.03, 50)"
+        ))
+        assert conn.execute(text("SELECT densidade_g_ml * 1000 FROM produtos")).scalar() == 1030
@@ -8,4 +8,15 @@ export async function register({ nome, email, senha }) {
 export async function login({ email, senha }) {
     const { data } = await api.post("/auth/login", { email, senha });
     return data;
-}
\ No newline at end of file
+}
+
+// Troca o refresh token por um novo par (access + refresh) sem pedir a senha.
+// O refresh token antigo deixa de valer: guarde sempre o que voltar aqui.
+export async function refresh({ refresh_token }) {
+    const { data } = await api.post("/auth/refresh", { refresh_token });
+    return data;
+}
+
+export async function logout({ refresh_token }) {
+    await api.post("/auth/logout", { refresh_token });
+}
@@ -0,0 +1,37 @@
+import api from "./client";
+
+const auth = (token) => ({ headers: { Authorization: `Bearer ${token}` } });
+
+// Pede a exportação dos dados (LGPD). Volta na hora com status PENDENTE;
+// acompanhe com getExport até CONCLUIDA e baixe pelo url_resultado.
+export async function requestExport({ token }) {
+    const { data } = await api.post("/me/exports", null, auth(token));
+    return data;
+}
+
+export async function listExports({ token }) {
+    const { data } = await api.get("/me/exports", auth(token));
+    return data;
+}
+
+export async function getExport({ token, exportId }) {
+    const { data } = await api.get(`/me/exports/${exportId}`, auth(token));
+    return data;
+}
+
+// Pede a exclusão da conta. Os dados são apagados em segundo plano; dá para
+// cancelar enquanto o pedido ainda não começou a ser executado.
+export async function requestDeletion({ token }) {
+    const { data } = await api.post("/me/deletion", null, auth(token));
+    return data;
+}
+
+export async function getDeletion({ token }) {
+    const { data } = await api.get("/me/deletion", auth(token));
+    return data;
+}
+
+export async function cancelDeletion({ token, exclusaoId }) {
+    const { data } = await api.post(`/me/deletion/${exclusaoId}/cancel`, null, auth(token));
+    return data;
+}
@@ -0,0 +1,28 @@
+import api, { BASE_URL } from "./client";
+
+const auth = (token) => ({ headers: { Authorization: `Bearer ${token}` } });
+
+// Foto de produto ou nota fiscal (JPEG/PNG/WebP/PDF). `duplicado` = o servidor já tinha esse conteúdo.
+export async function uploadMedia({ token, uri, name, type = "image/jpeg", tipo, itemEstoqueId }) {
+    const form = new FormData();
+    form.append("arquivo", { uri, name: name || uri.split("/").pop() || "foto.jpg", type });
+    const { data } = await api.post("/media", form, {
+        params: { tipo, item_estoque_id: itemEstoqueId },
+        headers: { ...auth(token).headers, "Content-Type": "multipart/form-data" },
+    });
+    return data;
+}
+
+// Source para <Image>: `url` vem do anexo (/media/<sha256>); `width` pede a versão reduzida.
+// O conteúdo de um hash nunca muda, então o cache do app pode guardá-lo para sempre.
+export function mediaSource({ token, url, width }) {
+    return {
+        uri: `${BASE_URL}${url}${width ? `?w=${Math.round(width)}` : ""}`,
+        headers: auth(token).headers,
+        cache: "force-cache",
+    };
+}
+
+export async function deleteAttachment({ token, id }) {
+    await api.delete(`/media/anexos/${id}`, auth(token));
+}
@@ -0,0 +1,26 @@
+import api from "./client";
+
+const auth = (token) => ({ headers: { Authorization: `Bearer ${token}` } });
+
+// Produto pelo código lido no scanner; null se o código não é conhecido.
+export async function lookupBarcode({ token, valor }) {
+    try {
+        const { data } = await api.get(`/products/barcode/${encodeURIComponent(valor)}`, auth(token));
+        return data;
+    } catch (e) {
+        if (e?.response?.status === 404) return null;
+        throw e;
+    }
+}
+
+// Vários códigos de uma vez (ex.: a sacola inteira): { encontrados, desconhecidos }.
+export async function lookupBarcodes({ token, valores }) {
+    const { data } = await api.post("/products/barcode/batch", { valores }, auth(token));
+    return data;
+}
+
+// Autocomplete do nome (ignora acentos/maiúsculas: "parmesao" acha "Parmesão").
+export async function searchProducts({ token, q, limit = 10 }) {
+    const { data } = await api.get("/products/search", { ...auth(token), params: { q, limit } });
+    return data;
+}
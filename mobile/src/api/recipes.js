@@ -0,0 +1,23 @@
+import api from "./client";
+
+const auth = (token) => ({ headers: { Authorization: `Bearer ${token}` } });
+
+// Receitas (suas e compartilhadas) ordenadas pelo quanto o estoque atual cobre;
+// cada uma traz `faltando` com os ingredientes que ainda precisam ser comprados.
+export async function cookableRecipes({ token, limit = 20, minScore = 0 }) {
+    const { data } = await api.get("/recipes/cookable", { ...auth(token), params: { limit, min_score: minScore } });
+    return data;
+}
+
+// Importa receitas de sites (JSON-LD schema.org/Recipe); até 500 URLs por chamada.
+// O pedido só é enfileirado: acompanhe com getImport até status CONCLUIDA ou ERRO.
+export async function importRecipes({ token, urls }) {
+    const { data } = await api.post("/recipes/import", { urls }, auth(token));
+    return data;
+}
+
+// Cada item volta com status IMPORTADA, EXISTENTE (já importada antes) ou ERRO.
+export async function getImport({ token, id }) {
+    const { data } = await api.get(`/recipes/import/${id}`, auth(token));
+    return data;
+}
@@ -0,0 +1,22 @@
+import api from "./client";
+
+const auth = (token) => ({ headers: { Authorization: `Bearer ${token}` } });
+
+// Gera a lista de compras do cardápio inteiro, já descontando o estoque.
+// porcoes = pessoas por refeição (sem ele, vale o rendimento de cada receita).
+export async function listFromMenu({ token, cardapioId, porcoes, nome }) {
+    const { data } = await api.post(`/shopping-lists/from-menu/${cardapioId}`, { porcoes, nome }, auth(token));
+    return data;
+}
+
+export async function getShoppingList({ token, listaId }) {
+    const { data } = await api.get(`/shopping-lists/${listaId}`, auth(token));
+    return data;
+}
+
+// Compara o custo da lista entre mercados (últimos preços coletados) e
+// grava o preço estimado de cada item no mercado mais barato.
+export async function estimateShoppingList({ token, listaId }) {
+    const { data } = await api.post(`/shopping-lists/${listaId}/estimate`, null, auth(token));
+    return data;
+}
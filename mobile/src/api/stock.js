@@ -0,0 +1,53 @@
+import api from "./client";
+
+const auth = (token) => ({ headers: { Authorization: `Bearer ${token}` } });
+
+// Saldos atuais por item e local (já materializados no backend).
+export async function listStock({ token, localId } = {}) {
+    const { data } = await api.get("/stock", { ...auth(token), params: localId ? { local_id: localId } : {} });
+    return data;
+}
+
+export async function listLocations({ token }) {
+    const { data } = await api.get("/stock/locations", auth(token));
+    return data;
+}
+
+export async function createLocation({ token, nome, descricao }) {
+    const { data } = await api.post("/stock/locations", { nome, descricao }, auth(token));
+    return data;
+}
+
+// Informe itemId (item existente) ou produtoId (cria o item no local).
+export async function addStock({ token, itemId, produtoId, localId, quantidade, unidade, validade, motivo }) {
+    const { data } = await api.post("/stock/entries", {
+        item_id: itemId, produto_id: produtoId, local_id: localId,
+        quantidade, unidade, validade, motivo,
+    }, auth(token));
+    return data;
+}
+
+export async function removeStock({ token, itemId, localId, quantidade, motivo }) {
+    const { data } = await api.post("/stock/exits", {
+        item_id: itemId, local_id: localId, quantidade, motivo,
+    }, auth(token));
+    return data;
+}
+
+export async function transferStock({ token, itemId, deLocalId, paraLocalId, quantidade, motivo }) {
+    const { data } = await api.post("/stock/transfers", {
+        item_id: itemId, de_local_id: deLocalId, para_local_id: paraLocalId, quantidade, motivo,
+    }, auth(token));
+    return data;
+}
+
+// Itens por validade (mais próximos primeiro). Passe o nextCursor da
+// resposta anterior para a próxima página; null indica o fim.
+export async function listExpiring({ token, cursor, localId, days, limit = 50 }) {
+    const params = { limit };
+    if (cursor) params.cursor = cursor;
+    if (localId) params.local_id = localId;
+    if (days != null) params.days = days;
+    const { data } = await api.get("/stock/expiring", { ...auth(token), params });
+    return { items: data.items, nextCursor: data.next_cursor };
+}
@@ -1,4 +1,4 @@
-import api from "./client";
+import api, { BASE_URL } from "./client";
 
 export async function transcribeAudio({ uri, language = "pt", filename, mime }) {
   const name = filename || (uri.split("/").pop() || "speech.m4a");
@@ -22,4 +22,28 @@ export async function transcribeAudio({ uri, language = "pt", filename, mime })
     headers: { "Content-Type": "multipart/form-data" },
   });
   return res.data;
-}
\ No newline at end of file
+}
+
+// Streaming via WebSocket: envie frames PCM 16-bit mono 16 kHz com send(),
+// chame stop() ao parar de gravar. onPartial/onFinal recebem {text, start, end};
+// onDone recebe o texto completo. O POST /voice/transcribe continua como fallback.
+export function openVoiceStream({ language = "pt", onPartial, onFinal, onDone, onError } = {}) {
+  const url = BASE_URL.replace(/^http/, "ws") + `/voice/stream?language=${encodeURIComponent(language)}`;
+  const ws = new WebSocket(url);
+  ws.binaryType = "arraybuffer";
+
+  ws.onmessage = (event) => {
+    const msg = JSON.parse(event.data);
+    if (msg.type === "partial") onPartial?.(msg);
+    else if (msg.type === "final") onFinal?.(msg);
+    else if (msg.type === "done") onDone?.(msg.text);
+    else if (msg.type === "error") onError?.(msg);
+  };
+  ws.onerror = (e) => onError?.(e);
+
+  return {
+    send: (pcmChunk) => ws.readyState === WebSocket.OPEN && ws.send(pcmChunk),
+    stop: () => ws.readyState === WebSocket.OPEN && ws.send(JSON.stringify({ type: "stop" })),
+    close: () => ws.close(),
+  };
+}